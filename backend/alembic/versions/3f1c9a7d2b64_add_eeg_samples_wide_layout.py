@@ -0,0 +1,35 @@
+"""add eeg_samples wide layout
+
+Revision ID: 3f1c9a7d2b64
+Revises: 65c6c10568d7
+Create Date: 2026-01-12 10:04:51.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2b64'
+down_revision: Union[str, Sequence[str], None] = '65c6c10568d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('eeg_samples',
+    sa.Column('time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('channel_data', postgresql.ARRAY(postgresql.REAL()), nullable=False),
+    sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ),
+    sa.PrimaryKeyConstraint('time', 'patient_id')
+    )
+    op.execute("SELECT create_hypertable('eeg_samples', 'time');")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('eeg_samples')
@@ -0,0 +1,53 @@
+"""eeg hypertable chunking and compression
+
+Revision ID: 8d2e5b0f4a17
+Revises: 3f1c9a7d2b64
+Create Date: 2026-01-19 14:22:07.551930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e5b0f4a17'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Defaults mirror app.core.config; use `python -m app.db.timescale configure` to re-apply
+# per-deployment values (including retention) after upgrading.
+HYPERTABLES = {
+    'eeg_data': 'patient_id, channel_id',
+    'eeg_samples': 'patient_id',
+}
+CHUNK_INTERVAL = '6 hours'
+COMPRESS_AFTER = '1 day'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, segmentby in HYPERTABLES.items():
+        op.execute(f"SELECT create_hypertable('{table}', 'time', if_not_exists => TRUE, migrate_data => TRUE);")
+        op.execute(f"SELECT set_chunk_time_interval('{table}', INTERVAL '{CHUNK_INTERVAL}');")
+        op.execute(
+            f"ALTER TABLE {table} SET ("
+            f"timescaledb.compress, "
+            f"timescaledb.compress_segmentby = '{segmentby}', "
+            f"timescaledb.compress_orderby = 'time DESC');"
+        )
+        op.execute(f"SELECT add_compression_policy('{table}', INTERVAL '{COMPRESS_AFTER}', if_not_exists => TRUE);")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in HYPERTABLES:
+        op.execute(f"SELECT remove_retention_policy('{table}', if_exists => TRUE);")
+        op.execute(f"SELECT remove_compression_policy('{table}', if_exists => TRUE);")
+        op.execute(
+            f"SELECT decompress_chunk(c, if_compressed => TRUE) FROM show_chunks('{table}') c;"
+        )
+        op.execute(f"ALTER TABLE {table} SET (timescaledb.compress = false);")
+        op.execute(f"SELECT set_chunk_time_interval('{table}', INTERVAL '7 days');")
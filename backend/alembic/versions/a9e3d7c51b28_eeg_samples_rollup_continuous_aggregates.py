@@ -0,0 +1,78 @@
+"""eeg_samples rollup continuous aggregates
+
+Revision ID: a9e3d7c51b28
+Revises: c47a1e93d5f2
+Create Date: 2026-10-18 10:12:40.118354
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e3d7c51b28'
+down_revision: Union[str, Sequence[str], None] = 'c47a1e93d5f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Continuous aggregates cannot unnest channel_data, so each channel gets its own columns
+# (min_<i>, max_<i>, sum_<i>, sumsq_<i>, n_<i>). Must match WIDE_ROLLUP_CHANNELS in
+# app/services/eeg_history.py. `channels` records the widest row in each bucket so history
+# queries know when to aggregate the remaining channels from eeg_samples instead.
+CHANNELS = 8
+
+# (view, bucket width, source, refresh start_offset, end_offset, schedule_interval), as for eeg_data
+ROLLUPS = [
+    ('eeg_samples_rollup_1s', '1 second', 'eeg_samples', '10 minutes', '2 seconds', '30 seconds'),
+    ('eeg_samples_rollup_10s', '10 seconds', 'eeg_samples_rollup_1s', '1 hour', '20 seconds', '1 minute'),
+    ('eeg_samples_rollup_1m', '1 minute', 'eeg_samples_rollup_10s', '6 hours', '2 minutes', '5 minutes'),
+]
+
+
+def _columns(source: str) -> str:
+    if source == 'eeg_samples':
+        columns = ["max(cardinality(channel_data)) AS channels"]
+    else:
+        columns = ["max(channels) AS channels"]
+    for i in range(CHANNELS):
+        if source == 'eeg_samples':
+            v = f"CAST(channel_data[{i + 1}] AS DOUBLE PRECISION)"
+            columns += [
+                f"min({v}) AS min_{i}", f"max({v}) AS max_{i}", f"sum({v}) AS sum_{i}",
+                f"sum({v} * {v}) AS sumsq_{i}", f"count({v}) AS n_{i}",
+            ]
+        else:
+            columns += [
+                f"min(min_{i}) AS min_{i}", f"max(max_{i}) AS max_{i}", f"sum(sum_{i}) AS sum_{i}",
+                f"sum(sumsq_{i}) AS sumsq_{i}", f"sum(n_{i})::bigint AS n_{i}",
+            ]
+    return ", ".join(columns)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for view, width, source, start_offset, end_offset, schedule in ROLLUPS:
+        time_column = 'time' if source == 'eeg_samples' else 'bucket'
+        select = (
+            f"SELECT time_bucket(INTERVAL '{width}', {time_column}) AS bucket, patient_id, {_columns(source)} "
+            f"FROM {source} GROUP BY 1, patient_id"
+        )
+        op.execute(
+            f"CREATE MATERIALIZED VIEW {view} "
+            "WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS "
+            f"{select} WITH NO DATA;"
+        )
+        op.execute(
+            f"SELECT add_continuous_aggregate_policy('{view}', "
+            f"start_offset => INTERVAL '{start_offset}', "
+            f"end_offset => INTERVAL '{end_offset}', "
+            f"schedule_interval => INTERVAL '{schedule}');"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for view, *_ in reversed(ROLLUPS):
+        op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view};")
@@ -0,0 +1,62 @@
+"""eeg rollup continuous aggregates
+
+Revision ID: c47a1e93d5f2
+Revises: 8d2e5b0f4a17
+Create Date: 2026-01-26 09:41:33.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a1e93d5f2'
+down_revision: Union[str, Sequence[str], None] = '8d2e5b0f4a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (view, bucket width, source, refresh start_offset, end_offset, schedule_interval)
+# 10s and 1m are hierarchical aggregates built on the next finer rollup.
+ROLLUPS = [
+    ('eeg_rollup_1s', '1 second', 'eeg_data', '10 minutes', '2 seconds', '30 seconds'),
+    ('eeg_rollup_10s', '10 seconds', 'eeg_rollup_1s', '1 hour', '20 seconds', '1 minute'),
+    ('eeg_rollup_1m', '1 minute', 'eeg_rollup_10s', '6 hours', '2 minutes', '5 minutes'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for view, width, source, start_offset, end_offset, schedule in ROLLUPS:
+        if source == 'eeg_data':
+            select = (
+                f"SELECT time_bucket(INTERVAL '{width}', time) AS bucket, patient_id, channel_id, "
+                "min(voltage_mv) AS min_mv, max(voltage_mv) AS max_mv, "
+                "sum(voltage_mv) AS sum_mv, sum(voltage_mv * voltage_mv) AS sumsq_mv, count(*) AS n "
+                "FROM eeg_data GROUP BY 1, patient_id, channel_id"
+            )
+        else:
+            select = (
+                f"SELECT time_bucket(INTERVAL '{width}', bucket) AS bucket, patient_id, channel_id, "
+                "min(min_mv) AS min_mv, max(max_mv) AS max_mv, "
+                "sum(sum_mv) AS sum_mv, sum(sumsq_mv) AS sumsq_mv, sum(n)::bigint AS n "
+                f"FROM {source} GROUP BY 1, patient_id, channel_id"
+            )
+        op.execute(
+            f"CREATE MATERIALIZED VIEW {view} "
+            "WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS "
+            f"{select} WITH NO DATA;"
+        )
+        op.execute(
+            f"SELECT add_continuous_aggregate_policy('{view}', "
+            f"start_offset => INTERVAL '{start_offset}', "
+            f"end_offset => INTERVAL '{end_offset}', "
+            f"schedule_interval => INTERVAL '{schedule}');"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for view, *_ in reversed(ROLLUPS):
+        op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view};")
@@ -1,5 +1,9 @@
-from typing import Generator
+import hmac
+from typing import Generator, Optional
 
+from fastapi import Header, HTTPException
+
+from app.core.config import settings
 from app.db.session import SessionLocal
 
 def get_db() -> Generator:
@@ -8,3 +12,14 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Guard for admin endpoints (model uploads are unpickled, i.e. run as code): the
+    X-Admin-Token header must match ADMIN_TOKEN. Without ADMIN_TOKEN they are disabled.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if not hmac.compare_digest(x_admin_token or "", settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
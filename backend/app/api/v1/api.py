@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import doctor, patient, ws, appointment, session
+from app.api.v1.endpoints import doctor, patient, ws, appointment, session, eeg_history, models
 from app.api.v1.endpoints.sample import arouter
 
 api_router = APIRouter()
@@ -8,5 +8,7 @@ api_router.include_router(doctor.router, prefix="/doctors", tags=["doctors"])
 api_router.include_router(patient.router, prefix="/patients", tags=["patients"])
 api_router.include_router(appointment.router, prefix="/appointments", tags=["appointments"])
 api_router.include_router(session.router, prefix="/sessions", tags=["sessions"])
+api_router.include_router(eeg_history.router, prefix="/eeg", tags=["eeg"])
+api_router.include_router(models.router, prefix="/models", tags=["models"])
 api_router.include_router(ws.router, prefix="/ws", tags=["websockets"])
 api_router.include_router(arouter, prefix="/sample", tags=["sample"])
@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.services.eeg_history import get_history
+
+router = APIRouter()
+
+
+@router.get("/history/{patient_id}")
+def read_eeg_history(
+    patient_id: int,
+    start: datetime,
+    end: datetime,
+    width: int = Query(1000, ge=10, le=10000),
+    channels: Optional[List[int]] = Query(None),
+    db: Session = Depends(deps.get_db),
+):
+    """
+    Historical EEG for a patient between start and end.
+    The resolution (1m/10s/1s rollups or raw) is the coarsest one that still gives
+    at least `width` points, i.e. one per pixel of the requested chart width.
+    """
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return get_history(db, patient_id=patient_id, start=start, end=end, width=width, channels=channels)
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.api import deps
+from app.services.model_registry import model_manager
+
+router = APIRouter(dependencies=[Depends(deps.require_admin)])
+
+
+def _registry_error(e: Exception) -> HTTPException:
+    if isinstance(e, KeyError):
+        return HTTPException(status_code=404, detail=str(e).strip("'\""))
+    if isinstance(e, FileExistsError):
+        return HTTPException(status_code=409, detail=str(e))
+    return HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/")
+def list_models():
+    """Registered seizure-model versions, the active one and the shadow one, if any."""
+    return {
+        "active": model_manager.active_version,
+        "shadow": model_manager.shadow.version if model_manager.shadow is not None else None,
+        "versions": model_manager.registry.list_versions(),
+    }
+
+
+@router.post("/", status_code=201)
+async def register_model(
+    file: UploadFile = File(...),
+    version: Optional[str] = Form(None),
+    description: str = Form(""),
+    activate: bool = Form(False),
+):
+    """Register a pickled sklearn model as a new version, optionally hot-swapping to it."""
+    with tempfile.NamedTemporaryFile(suffix=".pkl") as tmp:
+        await run_in_threadpool(shutil.copyfileobj, file.file, tmp)
+        tmp.flush()
+        try:
+            info = await run_in_threadpool(
+                model_manager.registry.register_pickle, tmp.name, version, description, os.path.basename(file.filename or "")
+            )
+        except Exception as e:
+            raise _registry_error(e)
+    if activate:
+        info["activation"] = await activate_model(info["version"])
+    return info
+
+
+@router.post("/{version}/activate")
+async def activate_model(version: str):
+    """Load, warm up and hot-swap to `version`; live streams keep the old model until it is ready."""
+    try:
+        return await run_in_threadpool(model_manager.activate, version)
+    except Exception as e:
+        raise _registry_error(e)
+
+
+@router.get("/shadow")
+def shadow_stats():
+    """Agreement and latency of the shadow model against the active one."""
+    return model_manager.shadow_stats()
+
+
+@router.post("/{version}/shadow")
+async def start_shadow(version: str):
+    """Score `version` on every live batch alongside the active model, without affecting detections."""
+    try:
+        return await run_in_threadpool(model_manager.set_shadow, version)
+    except Exception as e:
+        raise _registry_error(e)
+
+
+@router.delete("/shadow")
+def stop_shadow():
+    """Stop shadow scoring; returns the final comparison."""
+    return model_manager.clear_shadow()
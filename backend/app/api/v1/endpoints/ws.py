@@ -1,10 +1,17 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
 
+from app.api import deps
 from app.websockets.manager import manager
 
 router = APIRouter()
 
 
+@router.get("/stats", dependencies=[Depends(deps.require_admin)])
+def websocket_stats():
+    """Fan-out counters and the send queue depth, drops and lag of every open connection."""
+    return {"manager": manager.stats(), "connections": manager.connection_stats()}
+
+
 @router.websocket("/ws/seizure_alerts")
 async def websocket_seizure_alerts(websocket: WebSocket):
     await manager.connect_alert(websocket)
@@ -12,7 +19,10 @@ async def websocket_seizure_alerts(websocket: WebSocket):
         while True:
             # This connection is for receiving alerts, not for sending data from client
             await websocket.receive_text()
-    except WebSocketDisconnect:
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the manager closed the socket after evicting it
+        pass
+    finally:
         manager.disconnect_alert(websocket)
 
 
@@ -23,5 +33,8 @@ async def websocket_live_eeg(websocket: WebSocket, patient_id: int):
         while True:
             # This connection is for receiving data, not for sending it from the client
             await websocket.receive_text()
-    except WebSocketDisconnect:
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the manager closed the socket after evicting it
+        pass
+    finally:
         manager.disconnect_patient(websocket, patient_id)
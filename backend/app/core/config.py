@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
 
@@ -13,8 +15,97 @@ class Settings(BaseSettings):
 
     # Final assembled URL (fallback default if env not set)
     DATABASE_URL: str | None = None
+    # SQLAlchemy connection pool (app/db/session.py), shared by requests and the ingest stages
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10  # extra connections under bursts, closed when returned
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
     API_V1_STR: str = "/api/v1"
 
+    # EEG storage layout: "narrow" = one eeg_data row per channel per sample,
+    # "wide" = one eeg_samples row per sample with channels packed in a REAL[]
+    EEG_STORAGE_LAYOUT: str = "narrow"
+
+    # TimescaleDB policies for the raw EEG hypertables (Postgres interval strings)
+    EEG_CHUNK_INTERVAL: str = "6 hours"
+    EEG_COMPRESS_AFTER: str = "1 day"
+    EEG_RETENTION: str | None = None  # e.g. "365 days"; None keeps raw data forever
+    EEG_TIER_AFTER: str | None = None  # object-storage tiering, only on Timescale Cloud
+
+    # EEG ingest (MQTT -> eeg_data) batching
+    EEG_INGEST_QUEUE_SIZE: int = 50000  # sample blocks (MQTT frames) buffered before backpressure
+    EEG_INGEST_BATCH_SIZE: int = 2000  # samples per bulk insert
+    EEG_INGEST_FLUSH_INTERVAL: float = 1.0  # seconds, max age of a buffered sample
+    EEG_INGEST_PUT_TIMEOUT: float = 0.05  # seconds the MQTT thread may block before dropping
+    MQTT_INGEST_QUEUE_SIZE: int = 10000  # messages between the MQTT network thread and the ingest thread
+
+    # Seizure detection: device sample rate and the sliding window inference runs on
+    EEG_SAMPLE_RATE: float = 250.0  # Hz, the firmware's ADS1299 data rate (CONFIG1 0x96)
+    SEIZURE_WINDOW_SECONDS: float = 2.0
+    SEIZURE_HOP_SECONDS: float = 0.5  # one inference per patient per hop
+    # Pickled sklearn model; a memory-mapped "<name>.forest" artifact next to it is preferred
+    SEIZURE_MODEL_PATH: str = "random_forest_model.pkl"
+    # "auto" (numpy for small batches, sklearn for large), "sklearn", "numpy" (flattened forest) or "onnx"
+    SEIZURE_INFERENCE_BACKEND: str = "auto"
+    SEIZURE_INFERENCE_AUTO_ROWS: int = 256  # batch rows from which "auto" uses sklearn (benchmark_inference_backends.py)
+    # Cross-patient micro-batching: run the model once enough rows are pending or the oldest waited this long
+    SEIZURE_BATCH_MAX_ROWS: int = 4096
+    SEIZURE_BATCH_MAX_DELAY: float = 0.01  # seconds
+    SEIZURE_BATCH_QUEUE_SIZE: int = 10000  # pending requests before submit() blocks, then drops
+    # Seizure events from window decisions (seizure_events.py): onset/offset hysteresis in windows,
+    # minimum event length, gap that still merges two detections, and stream silence that ends an event
+    SEIZURE_EVENT_ON_WINDOWS: int = 2
+    SEIZURE_EVENT_OFF_WINDOWS: int = 4
+    SEIZURE_EVENT_MIN_SECONDS: float = 5.0
+    SEIZURE_EVENT_MERGE_GAP_SECONDS: float = 5.0
+    SEIZURE_EVENT_IDLE_SECONDS: float = 30.0
+    # Versioned model registry (see model_registry.py); workers poll its ACTIVE file, 0 disables
+    SEIZURE_MODEL_REGISTRY_DIR: str = "models"
+    SEIZURE_MODEL_WATCH_INTERVAL: float = 5.0  # seconds
+    # Shared secret for admin endpoints (X-Admin-Token header); unset disables them
+    ADMIN_TOKEN: Optional[str] = None
+    # Live EEG WebSocket fan-out (websockets/manager.py): samples are coalesced per patient and sent
+    # this many times a second, at once on a seizure state change; a stalled flush keeps the latest seconds only
+    LIVE_EEG_FLUSH_HZ: float = 20.0
+    LIVE_EEG_MAX_PENDING_SECONDS: float = 5.0
+    # MQTT broker and the EEG topic (devices may also publish to "<topic>/<patient_id>")
+    MQTT_HOST: str = "localhost"
+    MQTT_PORT: int = 1883
+    MQTT_TOPIC: str = "eeg/data"
+    # Standalone ingest service (python -m app.ingest): processes, each owning patient_id % N
+    INGEST_WORKERS: int = 1
+    # How live samples and alerts reach every API worker's viewers (websockets/broadcast.py): "inprocess"
+    # (single worker) or "postgres" (LISTEN/NOTIFY on BROADCAST_CHANNEL, for uvicorn --workers N)
+    BROADCAST_BACKEND: str = "inprocess"
+    BROADCAST_CHANNEL: str = "insmos_live"
+    # Run MQTT ingest inside the API; with the postgres backend only the worker holding the ingest lock does
+    MQTT_INGEST_IN_API: bool = True
+    # Per-connection send queues: past this many messages the oldest live frame is dropped (alerts never are),
+    # and a viewer whose oldest unsent message is older than the lag budget is disconnected
+    LIVE_EEG_SEND_QUEUE_SIZE: int = 64
+    LIVE_EEG_MAX_LAG_SECONDS: float = 5.0
+    # Offline re-scoring of stored EEG (python -m app.services.rescoring): resumable progress files
+    RESCORE_CHECKPOINT_DIR: str = ".rescore_checkpoints"
+
+    # Uploaded-file analysis: CSVs at least this large are analysed in chunks
+    ANALYSIS_STREAMING_MIN_BYTES: int = 32 * 1024 * 1024
+    ANALYSIS_CHUNK_ROWS: int = 100_000
+    # Process pool for CPU-heavy upload analysis
+    ANALYSIS_WORKERS: int = 2
+    ANALYSIS_MAX_QUEUE: int = 8  # jobs waiting beyond the running ones before 503
+    ANALYSIS_MAX_PER_CLIENT: int = 2  # concurrent jobs per client address before 429
+    ANALYSIS_TIMEOUT: float = 300.0  # seconds
+    # Background analysis jobs (SQLite job store + uploads under ANALYSIS_JOBS_DIR)
+    ANALYSIS_JOBS_DIR: str = ".analysis_jobs"
+    ANALYSIS_JOB_CONCURRENCY: int = 1  # pool slots jobs may hold, the rest stay free for live requests
+    ANALYSIS_JOB_MAX_PENDING: int = 32  # queued + running jobs before 503
+    ANALYSIS_JOB_MAX_PER_CLIENT: int = 4  # queued + running jobs per client address before 429
+    ANALYSIS_JOB_TIMEOUT: float = 3600.0  # seconds
+    ANALYSIS_JOB_TTL: float = 24 * 3600.0  # seconds finished jobs and their results are kept
+    # Content-addressed cache of parsed uploads and results; 0 disables it
+    ANALYSIS_CACHE_DIR: str = ".analysis_cache"
+    ANALYSIS_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True,
@@ -1,4 +1,10 @@
+from app.core.config import settings
+
 from .crud_doctor import doctor
 from .crud_patient import patient
 from .crud_eeg_data import eeg_data
+from .crud_eeg_sample import eeg_sample
 from .crud_appointment import crud_appointment
+
+# CRUD object for the EEG storage layout this deployment writes to and reads from
+eeg_store = eeg_sample if settings.EEG_STORAGE_LAYOUT == "wide" else eeg_data
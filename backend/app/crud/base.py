@@ -1,7 +1,9 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import IO, Any, Dict, Generic, List, Optional, Sequence, Type, TypeVar, Union
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from app.db.base import Base
@@ -62,3 +64,37 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db.delete(obj)
         db.commit()
         return obj
+
+    def _copy_ignoring_duplicates(self, db: Session, *, columns: Sequence[str], buf: IO[str]) -> int:
+        """
+        COPY tab-separated rows into a per-connection staging table, then move them into the
+        model's table skipping rows whose primary key already exists (a re-sent block must not
+        abort the whole COPY). Runs in the caller's transaction; returns the number of rows inserted.
+        """
+        table = self.model.__tablename__
+        staging = f"{table}_staging"
+        column_list = ", ".join(columns)
+        with db.connection().connection.dbapi_connection.cursor() as cur:
+            cur.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+            cur.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN", buf)
+            cur.execute(
+                f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} ON CONFLICT DO NOTHING"
+            )
+            inserted = cur.rowcount
+            cur.execute(f"TRUNCATE {staging}")
+        return inserted
+
+    def _insert_ignoring_duplicates(self, db: Session, values: List[Dict[str, Any]]) -> int:
+        """Multi-row insert that skips rows whose primary key already exists. Returns the rows inserted."""
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            stmt = postgresql.insert(self.model).on_conflict_do_nothing()
+        elif dialect == "sqlite":
+            stmt = sqlite.insert(self.model).on_conflict_do_nothing()
+        else:
+            stmt = insert(self.model)
+        # Core execution on the session's connection: the ORM bulk path does not report rowcount
+        result = db.connection().execute(stmt, values)
+        return result.rowcount if result.rowcount >= 0 else len(values)
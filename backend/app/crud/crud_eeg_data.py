@@ -1,6 +1,13 @@
+import io
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+import numpy as np
+
 from app.crud.base import CRUDBase
 from app.models.models import EEGData
-from app.schemas.eeg_data import EEGDataCreate, EEGDataUpdate
+from app.schemas.eeg_data import EEGBlockCreate, EEGDataCreate, EEGDataUpdate
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 class CRUDEEGData(CRUDBase[EEGData, EEGDataCreate, EEGDataUpdate]):
@@ -18,5 +25,72 @@ class CRUDEEGData(CRUDBase[EEGData, EEGDataCreate, EEGDataUpdate]):
         db.commit()
         return db_objs[0]
 
+    def create_blocks(self, db: Session, *, blocks: Iterable[EEGBlockCreate]) -> int:
+        """
+        Insert sample blocks in a single transaction, one row per sample and channel, with
+        timestamps derived from each block's start and rate. Rows already stored (a re-sent
+        block) are skipped. Returns the number of rows written.
+        """
+        blocks = [b for b in blocks if len(b)]
+        if not blocks:
+            return 0
+        if db.get_bind().dialect.driver == "psycopg2":
+            buf = io.StringIO()
+            for block in blocks:
+                stamps = np.datetime_as_string(block.timestamps(), unit="us", timezone="UTC")
+                for stamp, row in zip(stamps, block.samples.tolist()):
+                    prefix = f"{stamp}\t{block.patient_id}\t"
+                    buf.write("".join(f"{prefix}{c}\t{v!r}\n" for c, v in enumerate(row)))
+            buf.seek(0)
+            rows = self._copy_ignoring_duplicates(
+                db, columns=("time", "patient_id", "channel_id", "voltage_mv"), buf=buf
+            )
+        else:
+            rows = self._insert_ignoring_duplicates(
+                db,
+                [
+                    {"time": t, "patient_id": block.patient_id, "channel_id": c, "voltage_mv": v}
+                    for block in blocks
+                    for t, row in zip(block.datetimes(), block.samples.tolist())
+                    for c, v in enumerate(row)
+                ],
+            )
+        db.commit()
+        return rows
+
+    def get_range(
+        self,
+        db: Session,
+        *,
+        patient_id: int,
+        start: datetime,
+        end: datetime,
+        limit: Optional[int] = None,
+    ) -> List[EEGDataCreate]:
+        """Samples for a patient in [start, end), regrouped into one item per timestamp."""
+        stmt = (
+            select(self.model.time, self.model.channel_id, self.model.voltage_mv)
+            .where(
+                self.model.patient_id == patient_id,
+                self.model.time >= start,
+                self.model.time < end,
+            )
+            .order_by(self.model.time, self.model.channel_id)
+        )
+        out: List[EEGDataCreate] = []
+        current_time = None
+        channels: List[float] = []
+        for t, _, voltage in db.execute(stmt):
+            if t != current_time:
+                if current_time is not None:
+                    out.append(EEGDataCreate(patient_id=patient_id, timestamp=current_time, channel_data=channels))
+                    if limit is not None and len(out) >= limit:
+                        return out
+                current_time, channels = t, []
+            channels.append(voltage)
+        if current_time is not None:
+            out.append(EEGDataCreate(patient_id=patient_id, timestamp=current_time, channel_data=channels))
+        return out
+
 
 eeg_data = CRUDEEGData(EEGData)
@@ -0,0 +1,83 @@
+import io
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from app.crud.base import CRUDBase
+from app.models.models import EEGSample
+from app.schemas.eeg_data import EEGBlockCreate, EEGDataCreate, EEGDataUpdate
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+
+class CRUDEEGSample(CRUDBase[EEGSample, EEGDataCreate, EEGDataUpdate]):
+    """CRUD for the wide EEG layout (`eeg_samples`, one row per sample)."""
+
+    def create(self, db: Session, *, obj_in: EEGDataCreate) -> EEGSample:
+        db_obj = self.model(
+            time=obj_in.timestamp,
+            patient_id=obj_in.patient_id,
+            channel_data=list(obj_in.channel_data),
+        )
+        db.add(db_obj)
+        db.commit()
+        return db_obj
+
+    def create_blocks(self, db: Session, *, blocks: Iterable[EEGBlockCreate]) -> int:
+        """
+        Insert sample blocks in a single transaction, one row per sample, with timestamps
+        derived from each block's start and rate. Samples already stored (a re-sent block)
+        are skipped. Returns the number of rows written.
+        """
+        blocks = [b for b in blocks if len(b)]
+        if not blocks:
+            return 0
+        if db.get_bind().dialect.driver == "psycopg2":
+            buf = io.StringIO()
+            for block in blocks:
+                stamps = np.datetime_as_string(block.timestamps(), unit="us", timezone="UTC")
+                for stamp, row in zip(stamps, block.samples.tolist()):
+                    buf.write(f"{stamp}\t{block.patient_id}\t{{{','.join(map(repr, row))}}}\n")
+            buf.seek(0)
+            rows = self._copy_ignoring_duplicates(db, columns=("time", "patient_id", "channel_data"), buf=buf)
+        else:
+            rows = self._insert_ignoring_duplicates(
+                db,
+                [
+                    {"time": t, "patient_id": block.patient_id, "channel_data": row}
+                    for block in blocks
+                    for t, row in zip(block.datetimes(), block.samples.tolist())
+                ],
+            )
+        db.commit()
+        return rows
+
+    def get_range(
+        self,
+        db: Session,
+        *,
+        patient_id: int,
+        start: datetime,
+        end: datetime,
+        limit: Optional[int] = None,
+    ) -> List[EEGDataCreate]:
+        """Samples for a patient in [start, end), in the same shape as the narrow layout."""
+        stmt = (
+            select(self.model.time, self.model.channel_data)
+            .where(
+                self.model.patient_id == patient_id,
+                self.model.time >= start,
+                self.model.time < end,
+            )
+            .order_by(self.model.time)
+        )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return [
+            EEGDataCreate(patient_id=patient_id, timestamp=t, channel_data=channels)
+            for t, channels in db.execute(stmt)
+        ]
+
+
+eeg_sample = CRUDEEGSample(EEGSample)
@@ -0,0 +1,107 @@
+"""
+Backfill / convert EEG data between the narrow (`eeg_data`) and wide (`eeg_samples`) layouts.
+
+Usage:
+    python -m app.db.convert_eeg_layout to-wide [--patient-id 1] [--start ISO] [--end ISO] [--step-minutes 60]
+    python -m app.db.convert_eeg_layout to-narrow ...
+
+The conversion runs entirely inside Postgres, one time window per transaction,
+and is idempotent (ON CONFLICT DO NOTHING), so an interrupted run can simply be
+restarted with the same arguments.
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TO_WIDE_SQL = """
+INSERT INTO eeg_samples (time, patient_id, channel_data)
+SELECT time, patient_id, array_agg(voltage_mv::real ORDER BY channel_id)
+FROM eeg_data
+WHERE time >= :start AND time < :end {patient_filter}
+GROUP BY time, patient_id
+ON CONFLICT DO NOTHING
+"""
+
+TO_NARROW_SQL = """
+INSERT INTO eeg_data (time, patient_id, channel_id, voltage_mv)
+SELECT s.time, s.patient_id, c.ord - 1, c.voltage
+FROM eeg_samples s, unnest(s.channel_data) WITH ORDINALITY AS c(voltage, ord)
+WHERE s.time >= :start AND s.time < :end {patient_filter}
+ON CONFLICT DO NOTHING
+"""
+
+SOURCE_TABLE = {"to-wide": "eeg_data", "to-narrow": "eeg_samples"}
+
+
+def convert(
+    direction: str,
+    patient_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    step: timedelta = timedelta(hours=1),
+    db_url: Optional[str] = None,
+) -> int:
+    """Copy rows between layouts in `step`-sized windows. Returns rows inserted."""
+    engine = create_engine(db_url or settings.DATABASE_URL, pool_pre_ping=True)
+    source = SOURCE_TABLE[direction]
+    sql = TO_WIDE_SQL if direction == "to-wide" else TO_NARROW_SQL
+    patient_filter = ""
+    params = {}
+    if patient_id is not None:
+        patient_filter = "AND patient_id = :patient_id" if direction == "to-wide" else "AND s.patient_id = :patient_id"
+        params["patient_id"] = patient_id
+    stmt = text(sql.format(patient_filter=patient_filter))
+
+    with engine.connect() as conn:
+        bounds = conn.execute(text(f"SELECT min(time), max(time) FROM {source}")).one()
+    if bounds[0] is None:
+        logger.info(f"{source} is empty, nothing to convert")
+        return 0
+    start = start or bounds[0]
+    end = end or bounds[1] + timedelta(microseconds=1)
+
+    total = 0
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + step, end)
+        with engine.begin() as conn:
+            result = conn.execute(stmt, {**params, "start": window_start, "end": window_end})
+        total += result.rowcount or 0
+        logger.info(f"{direction}: {window_start.isoformat()} -> {window_end.isoformat()} ({result.rowcount} rows)")
+        window_start = window_end
+    logger.info(f"{direction}: inserted {total} rows")
+    return total
+
+
+def _parse_time(value: str) -> datetime:
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert EEG data between storage layouts")
+    parser.add_argument("direction", choices=sorted(SOURCE_TABLE))
+    parser.add_argument("--patient-id", type=int)
+    parser.add_argument("--start", type=_parse_time)
+    parser.add_argument("--end", type=_parse_time)
+    parser.add_argument("--step-minutes", type=int, default=60)
+    args = parser.parse_args()
+    convert(
+        args.direction,
+        patient_id=args.patient_id,
+        start=args.start,
+        end=args.end,
+        step=timedelta(minutes=args.step_minutes),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,5 +3,12 @@ from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+# SQLite (tests, scripts) uses its own pool classes, which take no sizing
+pool_options = {} if (settings.DATABASE_URL or "").startswith("sqlite") else {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+}
+engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, **pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
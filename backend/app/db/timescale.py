@@ -0,0 +1,210 @@
+"""
+TimescaleDB administration for the raw EEG hypertables.
+
+Usage:
+    python -m app.db.timescale configure   # apply chunking/compression/retention from settings
+    python -m app.db.timescale report      # print chunk, compression and policy status
+    python -m app.db.timescale refresh-rollups  # materialize EEG rollups over all existing data
+"""
+import argparse
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Hypertable -> compression segmentby columns
+EEG_HYPERTABLES: Dict[str, str] = {
+    "eeg_data": "patient_id, channel_id",
+    "eeg_samples": "patient_id",
+}
+
+
+def _engine(db_url: Optional[str] = None) -> Engine:
+    return create_engine(db_url or settings.DATABASE_URL, pool_pre_ping=True)
+
+
+def _table_exists(conn: Connection, table: str) -> bool:
+    return bool(conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": table}).scalar())
+
+
+def _has_function(conn: Connection, name: str) -> bool:
+    return bool(conn.execute(text("SELECT EXISTS (SELECT 1 FROM pg_proc WHERE proname = :n)"), {"n": name}).scalar())
+
+
+def _column_list(value: Optional[str]) -> List[str]:
+    return [c.strip().strip('"') for c in (value or "").split(",") if c.strip()]
+
+
+def _order_list(value: Optional[str]) -> List[Tuple[str, bool]]:
+    # "time DESC, channel_id" -> [("time", True), ("channel_id", False)]
+    return [(item.split()[0].strip('"'), "desc" in item.lower().split()) for item in _column_list(value)]
+
+
+def _compression_settings(conn: Connection, table: str) -> Optional[Tuple[List[str], List[Tuple[str, bool]]]]:
+    """(segmentby columns, [(orderby column, descending)]) set on `table`, or None if compression is off."""
+    enabled = conn.execute(text(
+        "SELECT compression_enabled FROM timescaledb_information.hypertables WHERE hypertable_name = :t"
+    ), {"t": table}).scalar()
+    if not enabled:
+        return None
+    if _table_exists(conn, "timescaledb_information.hypertable_compression_settings"):  # TimescaleDB >= 2.14
+        row = conn.execute(text(
+            "SELECT segmentby, orderby FROM timescaledb_information.hypertable_compression_settings "
+            "WHERE hypertable = CAST(:t AS regclass)"
+        ), {"t": table}).first()
+        return (_column_list(row[0]), _order_list(row[1])) if row else ([], [])
+    rows = conn.execute(text(
+        "SELECT attname, segmentby_column_index, orderby_column_index, orderby_asc "
+        "FROM timescaledb_information.compression_settings WHERE hypertable_name = :t"
+    ), {"t": table}).all()
+    segmentby = [r[0] for r in sorted((r for r in rows if r[1] is not None), key=lambda r: r[1])]
+    orderby = [(r[0], not r[3]) for r in sorted((r for r in rows if r[2] is not None), key=lambda r: r[2])]
+    return segmentby, orderby
+
+
+def configure_table(
+    conn: Connection,
+    table: str,
+    segmentby: str,
+    chunk_interval: str = settings.EEG_CHUNK_INTERVAL,
+    compress_after: str = settings.EEG_COMPRESS_AFTER,
+    retention: Optional[str] = settings.EEG_RETENTION,
+    tier_after: Optional[str] = settings.EEG_TIER_AFTER,
+) -> None:
+    """Make `table` a hypertable and (re)apply chunk, compression, retention and tiering policies."""
+    conn.execute(text(
+        f"SELECT create_hypertable('{table}', 'time', if_not_exists => TRUE, migrate_data => TRUE)"
+    ))
+    # Only affects chunks created from now on
+    conn.execute(text(f"SELECT set_chunk_time_interval('{table}', CAST(:i AS INTERVAL))"), {"i": chunk_interval})
+    # TimescaleDB refuses to change these once compressed chunks exist, so only set them when they differ
+    orderby = "time DESC"
+    if _compression_settings(conn, table) != (_column_list(segmentby), _order_list(orderby)):
+        conn.execute(text(
+            f"ALTER TABLE {table} SET (timescaledb.compress, "
+            f"timescaledb.compress_segmentby = '{segmentby}', "
+            f"timescaledb.compress_orderby = '{orderby}')"
+        ))
+    else:
+        logger.info(f"{table}: compression settings unchanged")
+    conn.execute(text(f"SELECT remove_compression_policy('{table}', if_exists => TRUE)"))
+    conn.execute(
+        text(f"SELECT add_compression_policy('{table}', CAST(:i AS INTERVAL))"), {"i": compress_after}
+    )
+
+    conn.execute(text(f"SELECT remove_retention_policy('{table}', if_exists => TRUE)"))
+    if retention:
+        conn.execute(text(f"SELECT add_retention_policy('{table}', CAST(:i AS INTERVAL))"), {"i": retention})
+
+    if tier_after:
+        if _has_function(conn, "add_tiering_policy"):
+            conn.execute(text(f"SELECT remove_tiering_policy('{table}', if_exists => TRUE)"))
+            conn.execute(text(f"SELECT add_tiering_policy('{table}', CAST(:i AS INTERVAL))"), {"i": tier_after})
+        else:
+            logger.warning("EEG_TIER_AFTER is set but this TimescaleDB has no tiered storage; skipping")
+
+    logger.info(
+        f"{table}: chunk={chunk_interval}, compress_after={compress_after}, "
+        f"retention={retention or 'off'}, tier_after={tier_after or 'off'}"
+    )
+
+
+def configure(db_url: Optional[str] = None) -> None:
+    """Apply settings to every EEG hypertable that exists in the database."""
+    with _engine(db_url).begin() as conn:
+        for table, segmentby in EEG_HYPERTABLES.items():
+            if _table_exists(conn, table):
+                configure_table(conn, table, segmentby)
+            else:
+                logger.info(f"{table} does not exist, skipping")
+
+
+# Continuous aggregates in dependency order (each one is built on the previous)
+EEG_ROLLUPS: List[str] = [
+    "eeg_rollup_1s", "eeg_rollup_10s", "eeg_rollup_1m",
+    "eeg_samples_rollup_1s", "eeg_samples_rollup_10s", "eeg_samples_rollup_1m",
+]
+
+
+def refresh_rollups(db_url: Optional[str] = None) -> None:
+    """
+    Fully refresh the EEG continuous aggregates. Needed once after creating them on a
+    table with existing data; the refresh policies only cover recent windows.
+    """
+    engine = _engine(db_url).execution_options(isolation_level="AUTOCOMMIT")
+    with engine.connect() as conn:
+        for view in EEG_ROLLUPS:
+            if not _table_exists(conn, view):
+                logger.info(f"{view} does not exist, skipping")
+                continue
+            conn.execute(text(f"CALL refresh_continuous_aggregate('{view}', NULL, NULL)"))
+            logger.info(f"{view} refreshed")
+
+
+def _rows(conn: Connection, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [dict(r._mapping) for r in conn.execute(text(sql), params)]
+
+
+def report(db_url: Optional[str] = None) -> Dict[str, Any]:
+    """Chunk interval, chunk counts, compression savings and policy jobs per EEG hypertable."""
+    out: Dict[str, Any] = {}
+    with _engine(db_url).connect() as conn:
+        for table in EEG_HYPERTABLES:
+            if not _table_exists(conn, table):
+                continue
+            params = {"t": table}
+            dimension = _rows(conn, """
+                SELECT time_interval::text AS chunk_interval
+                FROM timescaledb_information.dimensions
+                WHERE hypertable_name = :t AND column_name = 'time'
+            """, params)
+            chunks = _rows(conn, """
+                SELECT count(*) AS total,
+                       count(*) FILTER (WHERE is_compressed) AS compressed,
+                       min(range_start) AS oldest,
+                       max(range_end) AS newest
+                FROM timescaledb_information.chunks
+                WHERE hypertable_name = :t
+            """, params)
+            compression = _rows(conn, """
+                SELECT before_compression_total_bytes AS before_bytes,
+                       after_compression_total_bytes AS after_bytes
+                FROM hypertable_compression_stats(CAST(:t AS regclass))
+            """, params)
+            jobs = _rows(conn, """
+                SELECT j.proc_name, j.schedule_interval::text, j.config::text, s.last_run_status, s.next_start
+                FROM timescaledb_information.jobs j
+                LEFT JOIN timescaledb_information.job_stats s USING (job_id)
+                WHERE j.hypertable_name = :t
+            """, params)
+            size = conn.execute(text("SELECT hypertable_size(CAST(:t AS regclass))"), params).scalar()
+            out[table] = {
+                "chunk_interval": dimension[0]["chunk_interval"] if dimension else None,
+                "chunks": chunks[0] if chunks else {},
+                "compression": compression[0] if compression else {},
+                "total_bytes": size,
+                "jobs": jobs,
+            }
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage TimescaleDB policies for EEG tables")
+    parser.add_argument("command", choices=["configure", "report", "refresh-rollups"])
+    args = parser.parse_args()
+    if args.command == "configure":
+        configure()
+    elif args.command == "refresh-rollups":
+        refresh_rollups()
+    print(json.dumps(report(), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Standalone ingest service: MQTT consumption, decoding, seizure detection,
+persistence and event segmentation, outside the API server.
+
+    python -m app.ingest --workers 4
+
+Runs `--workers` processes. Each subscribes to the EEG topic and handles only the
+patients with `patient_id % workers == index`, so a patient's windows, detection
+state and events stay in one process. Devices publishing to "<topic>/<patient_id>"
+let the other workers skip a message from its topic alone; on the shared topic
+they read the patient id from the frame header (or, for JSON, parse the payload).
+A worker that dies is restarted.
+
+Live samples and alerts reach the API workers' viewers through the broadcast
+backend, so run it with BROADCAST_BACKEND=postgres and start the API with
+MQTT_INGEST_IN_API=false.
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from typing import Dict, List
+
+from app.core.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_shard(index: int, count: int, host: str, port: int, topic: str) -> None:
+    """One ingest worker process, until SIGTERM / SIGINT."""
+    from app.services.model_registry import model_manager
+    from app.services.mqtt_client import MQTTClient
+    from app.websockets.broadcast import broadcast
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    detector = model_manager.start()
+    broadcast.start()  # publish only: this process has no viewers
+    client = MQTTClient(host=host, port=port, topic=topic, shard=(index, count))
+    try:
+        client.start()
+        logger.info(f"Ingest shard {index}/{count} running model {detector.version or settings.SEIZURE_MODEL_PATH}")
+        stop.wait()
+    except OSError as e:
+        logger.error(f"Ingest shard {index}/{count} cannot reach the MQTT broker at {host}:{port}: {e}")
+        raise SystemExit(1)
+    finally:
+        client.stop()
+        broadcast.stop()
+        model_manager.stop()
+        logger.info(f"Ingest shard {index}/{count} stopped, {client.skipped} messages for other shards skipped")
+
+
+class IngestService:
+    """Starts the shard processes and restarts any that exit unexpectedly."""
+
+    def __init__(self, workers: int, host: str, port: int, topic: str, restart_delay: float = 2.0):
+        self.workers = max(1, workers)
+        self.host = host
+        self.port = port
+        self.topic = topic
+        self.restart_delay = restart_delay
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._stop = threading.Event()
+
+    def _spawn(self, index: int) -> None:
+        process = self._context.Process(
+            target=run_shard,
+            args=(index, self.workers, self.host, self.port, self.topic),
+            name=f"ingest-{index}",
+        )
+        process.start()
+        self._processes[index] = process
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+        signal.signal(signal.SIGINT, lambda *_: self._stop.set())
+        if settings.BROADCAST_BACKEND == "inprocess":
+            logger.warning("BROADCAST_BACKEND is inprocess: live viewers will not see this service's streams")
+        logger.info(f"Starting {self.workers} ingest worker(s) on {self.host}:{self.port} topic {self.topic}")
+        for index in range(self.workers):
+            self._spawn(index)
+        while not self._stop.wait(1.0):
+            for index, process in list(self._processes.items()):
+                if not process.is_alive():
+                    logger.error(f"Ingest worker {index} exited with code {process.exitcode}, restarting")
+                    time.sleep(self.restart_delay)
+                    self._spawn(index)
+        self.stop()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        processes: List[multiprocessing.Process] = list(self._processes.values())
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.kill()
+        logger.info("Ingest service stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run MQTT ingest and seizure detection outside the API")
+    parser.add_argument("--workers", type=int, default=settings.INGEST_WORKERS, help="processes, sharded by patient_id")
+    parser.add_argument("--host", default=settings.MQTT_HOST)
+    parser.add_argument("--port", type=int, default=settings.MQTT_PORT)
+    parser.add_argument("--topic", default=settings.MQTT_TOPIC)
+    args = parser.parse_args()
+    IngestService(args.workers, args.host, args.port, args.topic).run()
+
+
+if __name__ == "__main__":
+    main()
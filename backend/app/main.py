@@ -1,26 +1,48 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.api import api_router
 from app.core.config import settings
 from contextlib import asynccontextmanager
-from app.api.deps import get_db
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from app.core.config import settings as app_settings
+from app.db.session import engine
+from app.services.ingest_leader import IngestLeader
 from app.services.mqtt_client import MQTTClient
-from app.services.analysis_service import run_analysis, extract_eeg_line_series
-import tempfile, shutil, os
+from app.services.model_registry import model_manager
+from app.services.analysis_cache import analysis_cache
+from app.services.analysis_executor import analysis_executor
+from app.services.analysis_jobs import TERMINAL, analysis_jobs, paginate_result
+from app.services.analysis_service import run_analysis_cached, extract_eeg_line_series_cached
+from app.websockets.broadcast import broadcast
+from typing import Optional, Tuple
+import asyncio, tempfile, os, hashlib, time
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    mqtt_client = None
+    ingest = None
+    # Load (or map) the seizure model now rather than on the first MQTT message:
+    # the registry's active version if there is one, else SEIZURE_MODEL_PATH
+    started = time.perf_counter()
+    detector = model_manager.start()
+    backend = detector.backend.name if detector.backend is not None else "fallback"
+    print(
+        f"[INFO] Seizure model {detector.version or settings.SEIZURE_MODEL_PATH} ready in "
+        f"{(time.perf_counter() - started) * 1000:.0f} ms ({backend} backend)"
+    )
+    analysis_executor.start()
+    await analysis_jobs.start()
+    # Live samples and alerts reach this worker's viewers through the broadcast backend
+    broadcast.start(asyncio.get_running_loop())
     try:
-        db = next(get_db())
-        mqtt_client = MQTTClient(host="localhost", port=1883, db=db)
-        mqtt_client.start()
+        if app_settings.MQTT_INGEST_IN_API:
+            mqtt_client = MQTTClient(host=app_settings.MQTT_HOST, port=app_settings.MQTT_PORT, topic=app_settings.MQTT_TOPIC)
+            # With the postgres backend only one worker ingests and publishes to all of them
+            ingest = IngestLeader(mqtt_client.start, mqtt_client.stop, elect=broadcast.name == "postgres")
+            ingest.start()
         # DB connectivity check
         try:
-            engine = create_engine(app_settings.DATABASE_URL, pool_pre_ping=True)
             with engine.connect() as conn:
                 conn.execute(text("SELECT 1"))
             print("[INFO] Database connection successful")
@@ -29,11 +51,12 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"[WARN] MQTT not started: {e}")
     yield
-    if mqtt_client:
-        try:
-            mqtt_client.stop()
-        except Exception:
-            pass
+    await analysis_jobs.stop()
+    analysis_executor.stop()
+    model_manager.stop()
+    if ingest:
+        ingest.stop()
+    broadcast.stop()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -54,41 +77,140 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 def read_root():
     return {"Hello": "World"}
 
-@app.post("/analyze-excel")
-async def analyze_excel(file: UploadFile = File(...)):
-    # Save uploaded file to a temp path
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+async def save_upload(file: UploadFile, directory: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Stream an upload to a temp file (in `directory` if given) chunk by chunk without blocking
+    the event loop. Returns the path and the SHA-256 of the content, used as the analysis cache key.
+    """
     suffix = os.path.splitext(file.filename or "upload")[1]
+    digest = hashlib.sha256()
+    tmp = await run_in_threadpool(tempfile.NamedTemporaryFile, delete=False, suffix=suffix, dir=directory)
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-        result = run_analysis(tmp_path)
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            digest.update(chunk)
+            await run_in_threadpool(tmp.write, chunk)
+    finally:
+        await run_in_threadpool(tmp.close)
+    return tmp.name, digest.hexdigest()
+
+
+@app.post("/analyze-excel")
+async def analyze_excel(request: Request, file: UploadFile = File(...)):
+    tmp_path = None
+    try:
+        tmp_path, digest = await save_upload(file)
+        # Parsing and statistics are CPU-bound; run them in the analysis process pool
+        result = await analysis_executor.run(run_analysis_cached, tmp_path, digest, request=request)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        try:
-            file.file.close()
-        except:
-            pass
-        if 'tmp_path' in locals() and os.path.exists(tmp_path):
+        await file.close()
+        if tmp_path and os.path.exists(tmp_path):
             os.remove(tmp_path)
 
 @app.post("/analyze-eeg-lines")
-async def analyze_eeg_lines(file: UploadFile = File(...), prefix: str = Query("eeg_"), max_points: int = Query(1000, ge=100, le=10000)):
-    suffix = os.path.splitext(file.filename or "upload")[1]
+async def analyze_eeg_lines(
+    request: Request,
+    file: UploadFile = File(...),
+    prefix: str = Query("eeg_"),
+    max_points: int = Query(1000, ge=100, le=10000),
+    method: str = Query("m4", pattern="^(m4|minmax|lttb)$"),
+):
+    tmp_path = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-        result = extract_eeg_line_series(tmp_path, prefix=prefix, max_points=max_points)
+        tmp_path, digest = await save_upload(file)
+        result = await analysis_executor.run(
+            extract_eeg_line_series_cached, tmp_path, digest,
+            prefix=prefix, max_points=max_points, method=method, request=request,
+        )
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        try:
-            file.file.close()
-        except:
-            pass
-        if 'tmp_path' in locals() and os.path.exists(tmp_path):
+        await file.close()
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+@app.get("/analysis-cache/stats")
+def analysis_cache_stats():
+    return analysis_cache.stats()
+
+@app.get("/analysis-executor/stats")
+def analysis_executor_stats():
+    return analysis_executor.stats()
+
+
+async def submit_job(request: Request, file: UploadFile, op: str, params: dict) -> dict:
+    tmp_path = None
+    try:
+        tmp_path, digest = await save_upload(file, directory=analysis_jobs.uploads_dir)
+        client = request.client.host if request.client else None
+        job = await analysis_jobs.submit(op, tmp_path, digest, params, client=client)
+        tmp_path = None  # owned by the job from here on
+        return job
+    finally:
+        await file.close()
+        if tmp_path and os.path.exists(tmp_path):
             os.remove(tmp_path)
+
+@app.post("/analysis-jobs/analyze-excel", status_code=202)
+async def submit_analyze_excel(request: Request, file: UploadFile = File(...)):
+    return await submit_job(request, file, "analyze", {})
+
+@app.post("/analysis-jobs/analyze-eeg-lines", status_code=202)
+async def submit_analyze_eeg_lines(
+    request: Request,
+    file: UploadFile = File(...),
+    prefix: str = Query("eeg_"),
+    max_points: int = Query(1000, ge=100, le=10000),
+    method: str = Query("m4", pattern="^(m4|minmax|lttb)$"),
+):
+    params = {"prefix": prefix, "max_points": max_points, "method": method}
+    return await submit_job(request, file, "eeg-lines", params)
+
+@app.get("/analysis-jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    return await analysis_jobs.get(job_id)
+
+@app.get("/analysis-jobs/{job_id}/result")
+async def get_analysis_job_result(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, description="Channels per page for eeg-lines results"),
+):
+    return paginate_result(await analysis_jobs.result(job_id), offset=offset, limit=limit)
+
+@app.delete("/analysis-jobs/{job_id}")
+async def cancel_analysis_job(job_id: str):
+    return await analysis_jobs.cancel(job_id)
+
+@app.websocket("/analysis-jobs/{job_id}/ws")
+async def analysis_job_updates(websocket: WebSocket, job_id: str):
+    """Pushes the job whenever its status or progress changes, then closes once it has finished."""
+    await websocket.accept()
+    last = None
+    try:
+        while True:
+            try:
+                job = await analysis_jobs.get(job_id)
+            except HTTPException as e:
+                await websocket.send_json({"error": e.detail})
+                break
+            state = (job["status"], job["phase"], job["rows_processed"])
+            if state != last:
+                await websocket.send_json(job)
+                last = state
+            if job["status"] in TERMINAL:
+                break
+            await asyncio.sleep(analysis_jobs.poll_interval)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Date, Time, Text, Boolean
+from sqlalchemy.dialects.postgresql import ARRAY, REAL
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -51,6 +52,14 @@ class EEGData(Base):
     channel_id = Column(Integer, primary_key=True)
     voltage_mv = Column(Float, nullable=False)
 
+class EEGSample(Base):
+    """Wide EEG layout: one row per sample, channel voltages packed by channel_id order."""
+    __tablename__ = "eeg_samples"
+
+    time = Column(DateTime(timezone=True), primary_key=True)
+    patient_id = Column(Integer, ForeignKey("patients.id"), primary_key=True)
+    channel_data = Column(ARRAY(REAL), nullable=False)
+
 class Appointment(Base):
     __tablename__ = "appointments"
 
@@ -1,4 +1,4 @@
 from .doctor import Doctor, DoctorCreate, DoctorUpdate
 from .patient import Patient, PatientCreate, PatientUpdate
-from .eeg_data import EEGData, EEGDataCreate, EEGDataUpdate
+from .eeg_data import EEGBlockCreate, EEGData, EEGDataCreate, EEGDataUpdate
 from .appointment import Appointment, AppointmentCreate, AppointmentUpdate
\ No newline at end of file
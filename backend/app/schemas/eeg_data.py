@@ -1,7 +1,14 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from datetime import datetime, timedelta, timezone
 from typing import List
 
+import numpy as np
+
+from app.core.config import settings
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
 class EEGDataBase(BaseModel):
     channel_data: List[float]
     timestamp: datetime
@@ -15,3 +22,60 @@ class EEGData(EEGDataBase):
 
 class EEGDataUpdate(EEGDataBase):
     pass
+
+
+class EEGBlockCreate(BaseModel):
+    """
+    A block of consecutive samples from one patient: the first sample's timestamp, the
+    sample rate and a (n_samples, n_channels) matrix. Per-sample timestamps are derived,
+    not sent. `samples` is validated as one NumPy array instead of per value.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    patient_id: int
+    timestamp: datetime
+    sample_rate: float = Field(settings.EEG_SAMPLE_RATE, gt=0)
+    samples: np.ndarray
+
+    @field_validator("samples", mode="before")
+    @classmethod
+    def _as_matrix(cls, value):
+        samples = np.asarray(value, dtype=np.float64)
+        if samples.ndim == 1:
+            samples = samples[None]
+        if samples.ndim != 2 or samples.shape[1] == 0:
+            raise ValueError("samples must be a non-empty (n_samples, n_channels) matrix")
+        if not np.isfinite(samples).all():
+            raise ValueError("samples must be finite")
+        return samples
+
+    @classmethod
+    def from_sample(cls, obj_in: EEGDataCreate, sample_rate: float = settings.EEG_SAMPLE_RATE) -> "EEGBlockCreate":
+        """A one-sample block from a legacy single-sample message (already validated)."""
+        return cls.model_construct(
+            patient_id=obj_in.patient_id,
+            timestamp=obj_in.timestamp,
+            sample_rate=sample_rate,
+            samples=np.asarray(obj_in.channel_data, dtype=np.float64)[None],
+        )
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def _start_us(self) -> int:
+        timestamp = self.timestamp if self.timestamp.tzinfo else self.timestamp.replace(tzinfo=timezone.utc)
+        return (timestamp - _EPOCH) // timedelta(microseconds=1)
+
+    def timestamps(self) -> np.ndarray:
+        """Per-sample times as UTC datetime64[us]."""
+        offsets = np.round(np.arange(len(self.samples)) * (1e6 / self.sample_rate)).astype("timedelta64[us]")
+        return np.datetime64(self._start_us(), "us") + offsets
+
+    def datetimes(self) -> List[datetime]:
+        """Per-sample times as timezone-aware datetimes."""
+        return [t.replace(tzinfo=timezone.utc) for t in self.timestamps().tolist()]
+
+    @property
+    def end_timestamp(self) -> datetime:
+        """Timestamp of the last sample."""
+        return self.timestamp + timedelta(seconds=(len(self.samples) - 1) / self.sample_rate)
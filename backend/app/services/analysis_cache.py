@@ -0,0 +1,257 @@
+"""
+Content-addressed cache for uploaded-file analysis.
+
+Entries are keyed by the SHA-256 of the uploaded bytes and live under
+`ANALYSIS_CACHE_DIR/<digest>/`:
+
+    columns.json          column names of the parsed table
+    chunk-00000.parquet   parsed data, one file per parse chunk (.pkl without pyarrow)
+    results/<key>.json    results of previous analyses, keyed by operation + parameters
+
+Parsed chunks are written while the first analysis streams through the file, so
+a repeat upload of the same bytes skips parsing entirely, and a repeat analysis
+with the same parameters skips computation too. The directory is the source of
+truth, so every worker process shares the cache; entries are evicted least
+recently used first once the total size exceeds `ANALYSIS_CACHE_MAX_BYTES`.
+Hit/miss counters are kept in `metrics.json` so they cover all processes.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from app.core.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow  # noqa: F401
+    CHUNK_FORMAT = "parquet"
+except ImportError:
+    CHUNK_FORMAT = "pkl"
+
+METRICS = ("frame_hits", "frame_misses", "result_hits", "result_misses", "evictions")
+
+
+def result_key(op: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps({"op": op, **params}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _entry(self, digest: str) -> str:
+        return os.path.join(self.root, digest)
+
+    @contextmanager
+    def _locked(self):
+        """Cross-process lock around index-wide operations (metrics, eviction)."""
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(os.path.join(self.root, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _count(self, metric: str) -> None:
+        if not self.enabled:
+            return
+        with self._locked():
+            path = os.path.join(self.root, "metrics.json")
+            try:
+                with open(path) as f:
+                    metrics = json.load(f)
+            except (OSError, ValueError):
+                metrics = {}
+            metrics[metric] = metrics.get(metric, 0) + 1
+            with open(path, "w") as f:
+                json.dump(metrics, f)
+
+    def _touch(self, digest: str) -> None:
+        try:
+            os.utime(self._entry(digest))
+        except OSError:
+            pass
+
+    # Results
+
+    def get_result(self, digest: str, op: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        path = os.path.join(self._entry(digest), "results", f"{result_key(op, params)}.json")
+        try:
+            with open(path) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self._count("result_misses")
+            return None
+        self._touch(digest)
+        self._count("result_hits")
+        return result
+
+    def put_result(self, digest: str, op: str, params: Dict[str, Any], result: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        results_dir = os.path.join(self._entry(digest), "results")
+        os.makedirs(results_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=results_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp, os.path.join(results_dir, f"{result_key(op, params)}.json"))
+        self._evict()
+
+    # Parsed data
+
+    def has_frame(self, digest: str) -> bool:
+        return self.enabled and os.path.exists(os.path.join(self._entry(digest), "columns.json"))
+
+    def iter_frame(self, digest: str, columns: Optional[Callable[[str], bool]] = None) -> Iterator[pd.DataFrame]:
+        """Cached chunks, reading only the columns accepted by `columns` where the format allows."""
+        entry = self._entry(digest)
+        with open(os.path.join(entry, "columns.json")) as f:
+            names: List[str] = json.load(f)
+        selected = [c for c in names if columns is None or columns(c)]
+        self._touch(digest)
+        for name in sorted(os.listdir(entry)):
+            if not name.startswith("chunk-"):
+                continue
+            path = os.path.join(entry, name)
+            if name.endswith(".parquet"):
+                yield pd.read_parquet(path, columns=selected)
+            else:
+                yield pd.read_pickle(path)[selected]
+
+    def chunks(
+        self,
+        digest: str,
+        source: Callable[[], Iterable[pd.DataFrame]],
+        columns: Optional[Callable[[str], bool]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Parsed chunks for `digest`: from the cache on a hit, otherwise from `source()`,
+        writing them to the cache as they are consumed. The entry only becomes visible
+        once the source is exhausted, so partial parses are never served.
+        """
+        if self.has_frame(digest):
+            self._count("frame_hits")
+            yield from self.iter_frame(digest, columns)
+            return
+        if self.enabled:
+            self._count("frame_misses")
+        yield from self._fill(digest, source(), columns)
+
+    def _fill(
+        self, digest: str, chunks: Iterable[pd.DataFrame], columns: Optional[Callable[[str], bool]]
+    ) -> Iterator[pd.DataFrame]:
+        tmp_dir = None
+        if self.enabled:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(dir=self.root, prefix=".fill-")
+        names: Optional[List[str]] = None
+        try:
+            for i, chunk in enumerate(chunks):
+                if tmp_dir is not None:
+                    try:
+                        names = names or [str(c) for c in chunk.columns]
+                        path = os.path.join(tmp_dir, f"chunk-{i:05d}.{CHUNK_FORMAT}")
+                        if CHUNK_FORMAT == "parquet":
+                            chunk.to_parquet(path, index=False)
+                        else:
+                            chunk.to_pickle(path)
+                    except Exception as e:
+                        logger.warning(f"Not caching {digest[:12]}: {e}")
+                        shutil.rmtree(tmp_dir, ignore_errors=True)
+                        tmp_dir = None
+                yield chunk if columns is None else chunk[[c for c in chunk.columns if columns(c)]]
+            if tmp_dir is not None:
+                with open(os.path.join(tmp_dir, "columns.json"), "w") as f:
+                    json.dump(names or [], f)
+                self._commit(digest, tmp_dir)
+                tmp_dir = None
+        finally:
+            if tmp_dir is not None:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _commit(self, digest: str, tmp_dir: str) -> None:
+        entry = self._entry(digest)
+        try:
+            os.rename(tmp_dir, entry)  # atomic when the entry does not exist yet
+        except OSError:
+            # The entry exists (e.g. results/ from another process): move the chunks in first and
+            # columns.json, which marks the frame complete for has_frame(), last
+            os.makedirs(entry, exist_ok=True)
+            for name in sorted(os.listdir(tmp_dir), key=lambda n: n == "columns.json"):
+                os.replace(os.path.join(tmp_dir, name), os.path.join(entry, name))
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._evict(keep=digest)
+
+    # Eviction and metrics
+
+    def _entries(self) -> List[Dict[str, Any]]:
+        out = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            size = 0
+            for dirpath, _, files in os.walk(path):
+                for f in files:
+                    try:
+                        size += os.path.getsize(os.path.join(dirpath, f))
+                    except OSError:
+                        pass
+            out.append({"digest": name, "bytes": size, "last_used": os.path.getmtime(path)})
+        return out
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        with self._locked():
+            entries = sorted(self._entries(), key=lambda e: e["last_used"])
+            total = sum(e["bytes"] for e in entries)
+            evicted = 0
+            for e in entries:
+                if total <= self.max_bytes:
+                    break
+                if e["digest"] == keep:
+                    continue
+                shutil.rmtree(self._entry(e["digest"]), ignore_errors=True)
+                total -= e["bytes"]
+                evicted += 1
+        for _ in range(evicted):
+            self._count("evictions")
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {m: 0 for m in METRICS}
+        out.update({"enabled": self.enabled, "entries": 0, "bytes": 0, "max_bytes": self.max_bytes})
+        if not self.enabled or not os.path.isdir(self.root):
+            return out
+        with self._locked():
+            try:
+                with open(os.path.join(self.root, "metrics.json")) as f:
+                    out.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+            entries = self._entries()
+        out["entries"] = len(entries)
+        out["bytes"] = sum(e["bytes"] for e in entries)
+        return out
+
+
+analysis_cache = AnalysisCache(settings.ANALYSIS_CACHE_DIR, settings.ANALYSIS_CACHE_MAX_BYTES)
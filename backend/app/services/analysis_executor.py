@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CancelToken:
+    """
+    Picklable cross-process cancellation flag backed by a marker file.
+    Analysis functions poll it between chunks (see analysis_service._watch).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self) -> bool:
+        return os.path.exists(self.path)
+
+    def set(self) -> None:
+        open(self.path, "a").close()
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class JobStopped(Exception):
+    """Raised by `AnalysisExecutor.wait` when its `stopped` check asked to give up on the job."""
+
+
+class AnalysisExecutor:
+    """
+    Process pool for blocking pandas/NumPy analysis, so the event loop (and every
+    WebSocket stream on this worker) keeps running while uploads are analysed.
+
+    Admission control: more than `max_per_client` in-flight jobs from one client
+    gives 429, and more than `max_workers + max_queue` jobs overall gives 503.
+    Jobs that exceed `timeout` (504) or whose client disconnects are cancelled:
+    queued jobs never start, running ones stop at their next chunk.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = settings.ANALYSIS_WORKERS,
+        max_queue: int = settings.ANALYSIS_MAX_QUEUE,
+        max_per_client: int = settings.ANALYSIS_MAX_PER_CLIENT,
+        timeout: float = settings.ANALYSIS_TIMEOUT,
+        poll_interval: float = 0.5,
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cancel_dir: Optional[str] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._per_client: Counter = Counter()
+        self._counters: Dict[str, int] = {
+            "completed": 0, "failed": 0, "rejected_busy": 0, "rejected_client": 0,
+            "timed_out": 0, "disconnected": 0,
+        }
+
+    def start(self) -> None:
+        if self._pool is not None:
+            return
+        # spawn: never fork a process that is running MQTT/writer threads
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._cancel_dir = tempfile.mkdtemp(prefix="analysis-cancel-")
+        logger.info(f"Analysis executor started with {self.max_workers} worker processes")
+
+    def stop(self) -> None:
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        shutil.rmtree(self._cancel_dir, ignore_errors=True)
+        logger.info("Analysis executor stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "in_flight": self._in_flight,
+                "workers": self.max_workers,
+                "capacity": self.max_workers + self.max_queue,
+            }
+
+    def _admit(self, client: Optional[str]) -> None:
+        with self._lock:
+            if client is not None and self._per_client[client] >= self.max_per_client:
+                self._counters["rejected_client"] += 1
+                raise HTTPException(status_code=429, detail="Too many analyses in progress for this client")
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._counters["rejected_busy"] += 1
+                raise HTTPException(
+                    status_code=503, detail="Analysis queue is full, try again later", headers={"Retry-After": "5"}
+                )
+            self._in_flight += 1
+            if client is not None:
+                self._per_client[client] += 1
+
+    def _release(self, client: Optional[str], token: CancelToken, future: Future) -> None:
+        cancelled = future.cancelled() or token()
+        token.clear()
+        with self._lock:
+            self._in_flight -= 1
+            if client is not None:
+                self._per_client[client] -= 1
+                if self._per_client[client] <= 0:
+                    del self._per_client[client]
+            if not cancelled:
+                self._counters["completed" if future.exception() is None else "failed"] += 1
+
+    def submit(
+        self, fn: Callable[..., Any], *args, client: Optional[str] = None, **kwargs
+    ) -> Tuple[Future, CancelToken]:
+        """
+        Admit and submit `fn(*args, cancel=token, **kwargs)` to the pool.
+        `fn` must be a picklable module-level function accepting a `cancel` callable.
+        """
+        if self._pool is None:
+            raise HTTPException(status_code=503, detail="Analysis executor is not running")
+        self._admit(client)
+        token = CancelToken(os.path.join(self._cancel_dir, uuid.uuid4().hex))
+        try:
+            future = self._pool.submit(partial(fn, *args, cancel=token, **kwargs))
+        except Exception:
+            self._release(client, token, Future())
+            raise
+        # Slots are held until the worker actually finishes, not just until we give up
+        future.add_done_callback(lambda f: self._release(client, token, f))
+        return future, token
+
+    async def wait(
+        self,
+        future: Future,
+        token: CancelToken,
+        timeout: float,
+        stopped: Optional[Callable[[], Awaitable[bool]]] = None,
+        reason: str = "disconnected",
+    ) -> Any:
+        """
+        Await a submitted job's result. Every `poll_interval` seconds the job is cancelled
+        and `asyncio.TimeoutError` raised once `timeout` has passed, or, if `stopped()`
+        returns True, cancelled (counted under `reason`) and `JobStopped` raised. If the
+        awaiting task itself is cancelled, the job is cancelled too.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        waiter = asyncio.wrap_future(future)
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                done, _ = await asyncio.wait({waiter}, timeout=max(0.0, min(self.poll_interval, remaining)))
+                if done:
+                    return waiter.result()
+                if loop.time() >= deadline:
+                    self._abandon(waiter, future, token, "timed_out")
+                    raise asyncio.TimeoutError()
+                if stopped is not None and await stopped():
+                    self._abandon(waiter, future, token, reason)
+                    raise JobStopped()
+        except asyncio.CancelledError:
+            self._abandon(waiter, future, token, "shutdown")
+            raise
+
+    def _abandon(self, waiter: asyncio.Future, future: Future, token: CancelToken, reason: str) -> None:
+        # Nobody reads the result any more; retrieve it so asyncio does not log it
+        waiter.add_done_callback(lambda w: w.cancelled() or w.exception())
+        self.cancel(future, token, reason)
+
+    async def run(self, fn: Callable[..., Any], *args, request: Optional[Request] = None, **kwargs) -> Any:
+        """Run `fn` in the pool (see `submit`) and await its result within `timeout`."""
+        client = request.client.host if request is not None and request.client else None
+        future, token = self.submit(fn, *args, client=client, **kwargs)
+        stopped = request.is_disconnected if request is not None else None
+        try:
+            return await self.wait(future, token, self.timeout, stopped)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"Analysis exceeded {self.timeout:.0f}s")
+        except JobStopped:
+            raise HTTPException(status_code=499, detail="Client disconnected")
+
+    def cancel(self, future: Future, token: CancelToken, reason: str) -> None:
+        """Cancel a queued job, or ask a running one to stop at its next chunk."""
+        if not future.cancel():
+            token.set()
+        with self._lock:
+            self._counters[reason] = self._counters.get(reason, 0) + 1
+
+
+analysis_executor = AnalysisExecutor()
@@ -0,0 +1,412 @@
+"""
+Background analysis jobs.
+
+A job is an upload plus an operation ("analyze" or "eeg-lines") recorded in a
+SQLite store under `ANALYSIS_JOBS_DIR`, so queued and interrupted jobs survive a
+worker restart and every Uvicorn worker sees the same jobs. Each worker runs a
+dispatcher that claims queued jobs and runs at most `ANALYSIS_JOB_CONCURRENCY`
+of them on the analysis process pool, leaving the remaining pool slots for
+interactive requests. Workers write their progress straight to the store.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.analysis_executor import AnalysisExecutor, JobStopped, analysis_executor
+from app.services.analysis_service import AnalysisCancelled, extract_eeg_line_series_cached, run_analysis_cached
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OPERATIONS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "analyze": run_analysis_cached,
+    "eeg-lines": extract_eeg_line_series_cached,
+}
+TERMINAL = ("completed", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    op TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    rows_processed INTEGER NOT NULL DEFAULT 0,
+    client TEXT,
+    upload_path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    owner TEXT,
+    error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+JOB_FIELDS = (
+    "id, op, params, status, phase, rows_processed, client, upload_path, digest, owner, error, "
+    "created_at, started_at, finished_at"
+)
+
+
+def _job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    return job
+
+
+class JobStore:
+    """SQLite-backed job table; safe to share between threads and processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def create(self, op: str, params: Dict[str, Any], upload_path: str, digest: str,
+               client: Optional[str]) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO jobs (id, op, params, status, phase, client, upload_path, digest, created_at) "
+                "VALUES (?, ?, ?, 'queued', 'queued', ?, ?, ?, ?)",
+                (job_id, op, json.dumps(params), client, upload_path, digest, time.time()),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(f"SELECT {JOB_FIELDS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["result"]) if row and row["result"] is not None else None
+
+    def pending_counts(self, client: Optional[str]) -> Tuple[int, int]:
+        """(queued + running jobs overall, queued + running jobs of `client`)."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT count(*), coalesce(sum(client IS ?), 0) FROM jobs WHERE status IN ('queued', 'running')",
+                (client,),
+            ).fetchone()
+        return row[0], row[1]
+
+    def claim_next(self, owner: str) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running and assign it to `owner`."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                f"SELECT {JOB_FIELDS} FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', phase = 'reading', owner = ?, started_at = ? WHERE id = ?",
+                (owner, time.time(), row["id"]),
+            )
+            conn.commit()
+        return self.get(row["id"])
+
+    def progress(self, job_id: str, phase: str, rows_processed: int) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE jobs SET phase = ?, rows_processed = ? WHERE id = ? AND status = 'running'",
+                (phase, rows_processed, job_id),
+            )
+
+    def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None) -> bool:
+        """Record the outcome of a running job; False if it was cancelled meanwhile."""
+        with closing(self._connect()) as conn, conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, phase = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (status, status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+        return cur.rowcount == 1
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a queued or running job. Returns the status it had, or None if unknown."""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] not in TERMINAL:
+                conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', phase = 'cancelled', finished_at = ? WHERE id = ?",
+                    (time.time(), job_id),
+                )
+        return row["status"]
+
+    def requeue(self, job_ids: Optional[List[str]] = None, owner: Optional[str] = None) -> int:
+        """Put running jobs (by id, or all of `owner`'s) back in the queue."""
+        where, args = ("owner = ?", [owner]) if job_ids is None else (
+            f"id IN ({','.join('?' * len(job_ids))})", list(job_ids)
+        )
+        with closing(self._connect()) as conn, conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'queued', phase = 'queued', owner = NULL, rows_processed = 0 "
+                f"WHERE status = 'running' AND {where}",
+                args,
+            )
+        return cur.rowcount
+
+    def running_owners(self) -> List[str]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT DISTINCT owner FROM jobs WHERE status = 'running'").fetchall()
+        return [row[0] for row in rows if row[0]]
+
+    def purge(self, finished_before: float) -> List[str]:
+        """Delete finished jobs older than `finished_before`; returns their upload paths."""
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                "SELECT upload_path FROM jobs WHERE status IN ('completed', 'failed', 'cancelled') "
+                "AND finished_at < ?",
+                (finished_before,),
+            ).fetchall()
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('completed', 'failed', 'cancelled') AND finished_at < ?",
+                (finished_before,),
+            )
+        return [row[0] for row in rows]
+
+
+class JobProgress:
+    """
+    Picklable progress callback that writes a job's phase and row count to the store:
+    on every phase change, otherwise at most every `min_interval` seconds.
+    """
+
+    def __init__(self, store_path: str, job_id: str, min_interval: float = 0.5):
+        self.store_path = store_path
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self._last = 0.0
+        self._phase: Optional[str] = None
+
+    def __call__(self, phase: str, rows_processed: int) -> None:
+        now = time.monotonic()
+        if phase == self._phase and now - self._last < self.min_interval:
+            return
+        self._last, self._phase = now, phase
+        try:
+            JobStore(self.store_path).progress(self.job_id, phase, rows_processed)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not record progress of job {self.job_id}: {e}")
+
+
+def paginate_result(result: Dict[str, Any], offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Slice the per-channel `series` of an eeg-lines result; other results are returned whole."""
+    if "series" not in result:
+        return result
+    series = result["series"]
+    end = len(series) if limit is None else offset + limit
+    return {**result, "series": series[offset:end], "total": len(series), "offset": offset, "limit": limit}
+
+
+def _remove(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AnalysisJobs:
+    """Submits jobs to the store and runs them from this worker's dispatcher."""
+
+    def __init__(
+        self,
+        root: str = settings.ANALYSIS_JOBS_DIR,
+        executor: AnalysisExecutor = analysis_executor,
+        max_concurrent: int = settings.ANALYSIS_JOB_CONCURRENCY,
+        max_pending: int = settings.ANALYSIS_JOB_MAX_PENDING,
+        max_per_client: int = settings.ANALYSIS_JOB_MAX_PER_CLIENT,
+        timeout: float = settings.ANALYSIS_JOB_TIMEOUT,
+        ttl: float = settings.ANALYSIS_JOB_TTL,
+        poll_interval: float = 0.5,
+    ):
+        self.root = root
+        self.uploads_dir = os.path.join(root, "uploads")
+        self.executor = executor
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.max_per_client = max_per_client
+        self.timeout = timeout
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.store: Optional[JobStore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._last_purge = 0.0
+
+    async def start(self) -> None:
+        if self._dispatcher is not None:
+            return
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self.store = await asyncio.to_thread(JobStore, os.path.join(self.root, "jobs.sqlite3"))
+        recovered = await asyncio.to_thread(self._recover)
+        if recovered:
+            logger.info(f"Requeued {recovered} analysis jobs interrupted by a restart")
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        logger.info(f"Analysis jobs started, running up to {self.max_concurrent} at a time")
+
+    async def stop(self) -> None:
+        if self._dispatcher is None:
+            return
+        self._dispatcher.cancel()
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(self._dispatcher, *tasks, return_exceptions=True)
+        self._dispatcher = None
+        # Jobs cut short by the shutdown run again on the next start
+        requeued = await asyncio.to_thread(self.store.requeue, owner=self.owner)
+        logger.info(f"Analysis jobs stopped, {requeued} requeued")
+
+    def _recover(self) -> int:
+        """Requeue running jobs whose owning process on this host has died."""
+        host = socket.gethostname()
+        requeued = 0
+        for owner in self.store.running_owners():
+            owner_host, _, pid = owner.rpartition(":")
+            if owner_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                requeued += self.store.requeue(owner=owner)
+        return requeued
+
+    def _require_store(self) -> JobStore:
+        if self.store is None:
+            raise HTTPException(status_code=503, detail="Analysis jobs are not running")
+        return self.store
+
+    async def submit(self, op: str, upload_path: str, digest: str, params: Dict[str, Any],
+                     client: Optional[str] = None) -> Dict[str, Any]:
+        store = self._require_store()
+        total, mine = await asyncio.to_thread(store.pending_counts, client)
+        if client is not None and mine >= self.max_per_client:
+            raise HTTPException(status_code=429, detail="Too many analysis jobs pending for this client")
+        if total >= self.max_pending:
+            raise HTTPException(
+                status_code=503, detail="Analysis job queue is full, try again later", headers={"Retry-After": "30"}
+            )
+        job = await asyncio.to_thread(store.create, op, params, upload_path, digest, client)
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Dict[str, Any]:
+        job = await asyncio.to_thread(self._require_store().get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    async def result(self, job_id: str) -> Dict[str, Any]:
+        job = await self.get(job_id)
+        if job["status"] != "completed":
+            raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+        return await asyncio.to_thread(self.store.result, job_id)
+
+    async def cancel(self, job_id: str) -> Dict[str, Any]:
+        job = await self.get(job_id)
+        previous = await asyncio.to_thread(self.store.cancel, job_id)
+        # A running job is stopped by whichever worker runs it, which also removes the upload
+        if previous == "queued":
+            _remove(job["upload_path"])
+        return await self.get(job_id)
+
+    async def _dispatch(self) -> None:
+        while True:
+            try:
+                while len(self._tasks) < self.max_concurrent:
+                    job = await asyncio.to_thread(self.store.claim_next, self.owner)
+                    if job is None:
+                        break
+                    task = asyncio.create_task(self._run(job))
+                    self._tasks[job["id"]] = task
+                    task.add_done_callback(lambda _, job_id=job["id"]: self._done(job_id))
+                if time.time() - self._last_purge > 600:
+                    self._last_purge = time.time()
+                    for path in await asyncio.to_thread(self.store.purge, time.time() - self.ttl):
+                        _remove(path)
+            except Exception as e:
+                logger.error(f"Analysis job dispatcher error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _done(self, job_id: str) -> None:
+        self._tasks.pop(job_id, None)
+        self._wakeup.set()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        progress = JobProgress(self.store.path, job_id)
+        try:
+            future, token = self.executor.submit(
+                OPERATIONS[job["op"]], job["upload_path"], job["digest"], progress=progress, **job["params"]
+            )
+        except HTTPException:
+            # Pool saturated by live requests: hold the slot briefly, then let the job be claimed again
+            await asyncio.sleep(self.poll_interval * 4)
+            await asyncio.to_thread(self.store.requeue, [job_id])
+            return
+
+        async def cancelled() -> bool:
+            current = await asyncio.to_thread(self.store.get, job_id)
+            return current is None or current["status"] == "cancelled"
+
+        try:
+            result = await self.executor.wait(future, token, self.timeout, cancelled, reason="cancelled")
+        except asyncio.CancelledError:
+            # Shutdown: the worker was stopped, but keep the upload so the job can be requeued
+            raise
+        except (JobStopped, AnalysisCancelled):
+            pass
+        except asyncio.TimeoutError:
+            await asyncio.to_thread(
+                self.store.finish, job_id, "failed", error=f"Analysis exceeded {self.timeout:.0f}s"
+            )
+        except Exception as e:
+            await asyncio.to_thread(self.store.finish, job_id, "failed", error=str(e))
+        else:
+            await asyncio.to_thread(self.store.finish, job_id, "completed", result=result)
+        _remove(job["upload_path"])
+
+
+analysis_jobs = AnalysisJobs()
@@ -1,76 +1,208 @@
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
 import pandas as pd
 import numpy as np
-from typing import Any, Dict
 
+from app.core.config import settings
+from app.services.analysis_cache import AnalysisCache, analysis_cache
+from app.services.downsampling import StreamingDownsampler, downsample_columns, to_json_list
+from app.services.stats_accumulators import FrequentItems, Histogram, HyperLogLog, Moments, QuantileSketch
 
-def run_analysis(excel_path: str) -> Dict[str, Any]:
+HISTOGRAM_BINS = 7
+
+
+class AnalysisCancelled(Exception):
+    """Raised between chunks when the caller asked an analysis to stop."""
+
+
+def _watch(
+    chunks: Iterable[pd.DataFrame],
+    cancel: Optional[Callable[[], bool]] = None,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Check `cancel` and report `progress(phase, rows_processed)` between chunks."""
+    rows = 0
+    for chunk in chunks:
+        if cancel is not None and cancel():
+            raise AnalysisCancelled()
+        yield chunk
+        rows += len(chunk)
+        if progress is not None:
+            progress("analyzing", rows)
+    if progress is not None:
+        progress("summarizing", rows)
+
+
+def use_streaming(path: str) -> bool:
+    """Large CSVs are analysed chunk by chunk; Excel files and small CSVs are loaded whole."""
+    return path.lower().endswith('.csv') and os.path.getsize(path) >= settings.ANALYSIS_STREAMING_MIN_BYTES
+
+
+def iter_csv_chunks(
+    path: str, usecols: Optional[Callable[[str], bool]] = None, chunk_rows: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
     try:
-        if excel_path.lower().endswith('.csv'):
-            df = pd.read_csv(excel_path)
-        else:
-            df = pd.read_excel(excel_path)
+        yield from pd.read_csv(path, usecols=usecols, chunksize=chunk_rows or settings.ANALYSIS_CHUNK_ROWS)
     except Exception as e:
         raise RuntimeError(f"Failed to read file: {e}")
 
-    summary = {
-        "rowCount": int(len(df)),
-        "columnCount": int(len(df.columns)),
-        "hasNulls": bool(df.isna().any().any()),
-        "dataTypes": {c: str(df[c].dtype) for c in df.columns},
-    }
 
-    stats_cols = {}
-    for c in df.columns:
-        col = df[c]
-        if np.issubdtype(col.dtype, np.number):
-            stats_cols[c] = {
-                "mean": float(col.mean()),
-                "median": float(col.median()),
-                "min": float(col.min()),
-                "max": float(col.max()),
-            }
+def iter_file_chunks(path: str) -> Iterator[pd.DataFrame]:
+    """Parsed table as DataFrame chunks: streamed for large CSVs, a single chunk otherwise."""
+    if use_streaming(path):
+        yield from iter_csv_chunks(path)
+        return
+    try:
+        if path.lower().endswith('.csv'):
+            df = pd.read_csv(path)
         else:
-            vc = col.astype(str).value_counts().head(5)
-            stats_cols[c] = {
-                "unique": int(col.nunique()),
-                "frequent": {k: int(v) for k, v in vc.items()},
-            }
-
-    visualizations = []
-    num_cols = [c for c in df.columns if np.issubdtype(df[c].dtype, np.number)]
-    if num_cols:
-        first = num_cols[0]
-        series = df[first].dropna()
-        bins = np.linspace(series.min(), series.max(), 8)
-        counts, edges = np.histogram(series, bins=bins)
-        visualizations.append({
-            "id": f"dist-{first}",
-            "title": f"Distribution of {first}",
-            "type": "bar",
-            "data": [
-                {"range": f"{round(edges[i],2)}-{round(edges[i+1],2)}", "count": int(counts[i])}
-                for i in range(len(counts))
-            ]
-        })
+            df = pd.read_excel(path)
+    except Exception as e:
+        raise RuntimeError(f"Failed to read file: {e}")
+    yield df
+
 
+def _histogram_visualization(column: str, edges: np.ndarray, counts: np.ndarray) -> Dict[str, Any]:
     return {
-        "summary": summary,
-        "statistics": {"columns": stats_cols},
-        "visualizations": visualizations,
+        "id": f"dist-{column}",
+        "title": f"Distribution of {column}",
+        "type": "bar",
+        "data": [
+            {"range": f"{round(edges[i],2)}-{round(edges[i+1],2)}", "count": int(counts[i])}
+            for i in range(len(counts))
+        ]
     }
 
 
-def extract_eeg_line_series(excel_path: str, prefix: str = "eeg_", max_points: int = 1000):
+class TableProfile:
+    """
+    Mergeable one-pass profile of a table: build one per chunk (or per worker
+    process) with `update`, combine with `merge`, render with `to_result`.
+    Numeric columns use exact moments, a KLL sketch for the median and an
+    auto-ranging histogram; text columns use HyperLogLog and Misra-Gries, which
+    stay exact up to a bound and are reported with "approximate": true beyond it.
+    With `exact=True` (tables loaded whole) text columns keep every value count.
+    See app.services.stats_accumulators for the error bounds.
+    """
+
+    def __init__(self, exact: bool = False):
+        self.exact = exact
+        self.row_count = 0
+        self.has_nulls = False
+        self.dtypes: Dict[str, str] = {}
+        self.numeric: Dict[str, Tuple[Moments, QuantileSketch, Histogram]] = {}
+        self.text: Dict[str, Tuple[HyperLogLog, FrequentItems]] = {}
+
+    def update(self, df: pd.DataFrame) -> "TableProfile":
+        if not self.dtypes:
+            self.dtypes = {c: str(df[c].dtype) for c in df.columns}
+            for c in df.columns:
+                if np.issubdtype(df[c].dtype, np.number):
+                    self.numeric[c] = (Moments(), QuantileSketch(), Histogram())
+                else:
+                    if self.exact:
+                        self.text[c] = (HyperLogLog(exact_limit=None), FrequentItems(capacity=None))
+                    else:
+                        self.text[c] = (HyperLogLog(), FrequentItems())
+        self.row_count += len(df)
+        self.has_nulls = self.has_nulls or bool(df.isna().any().any())
+        for c, accs in self.numeric.items():
+            # Later chunks may infer a different dtype; coerce to the first chunk's kind
+            values = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64)
+            for acc in accs:
+                acc.update(values)
+        for c, (distinct, frequent) in self.text.items():
+            distinct.update(df[c])
+            frequent.update(df[c].astype(str).value_counts().to_dict())
+        return self
+
+    def merge(self, other: "TableProfile") -> "TableProfile":
+        if not self.dtypes:
+            self.dtypes, self.numeric, self.text = other.dtypes, other.numeric, other.text
+        else:
+            for c, accs in other.numeric.items():
+                for mine, theirs in zip(self.numeric[c], accs):
+                    mine.merge(theirs)
+            for c, accs in other.text.items():
+                for mine, theirs in zip(self.text[c], accs):
+                    mine.merge(theirs)
+        self.row_count += other.row_count
+        self.has_nulls = self.has_nulls or other.has_nulls
+        return self
+
+    def to_result(self) -> Dict[str, Any]:
+        stats_cols: Dict[str, Any] = {}
+        for c in self.dtypes:
+            if c in self.numeric:
+                moments, quantiles, _ = self.numeric[c]
+                empty = not moments.count
+                stats_cols[c] = {
+                    "mean": float("nan") if empty else moments.mean,
+                    "median": quantiles.quantile(0.5),
+                    "min": float("nan") if empty else moments.min,
+                    "max": float("nan") if empty else moments.max,
+                }
+            else:
+                distinct, frequent = self.text[c]
+                stats_cols[c] = {
+                    "unique": distinct.estimate(),
+                    "frequent": {k: int(v) for k, v in frequent.most_common(5)},
+                    "approximate": not (distinct.exact and frequent.exact),
+                }
+
+        visualizations = []
+        if self.numeric:
+            first = next(iter(self.numeric))
+            moments, _, histogram = self.numeric[first]
+            if moments.count:
+                edges = np.linspace(moments.min, moments.max, HISTOGRAM_BINS + 1)
+                visualizations.append(_histogram_visualization(first, edges, histogram.counts_for(edges)))
+
+        return {
+            "summary": {
+                "rowCount": self.row_count,
+                "columnCount": len(self.dtypes),
+                "hasNulls": self.has_nulls,
+                "dataTypes": self.dtypes,
+            },
+            "statistics": {"columns": stats_cols},
+            "visualizations": visualizations,
+        }
+
+
+def run_analysis(excel_path: str) -> Dict[str, Any]:
+    """
+    Summary, per-column statistics and a histogram of the first numeric column.
+    Large CSVs are profiled chunk by chunk; everything else is loaded whole and
+    profiled as a single chunk, so both paths make one pass per column.
+    """
+    if use_streaming(excel_path):
+        return run_analysis_streaming(excel_path)
+    try:
+        if excel_path.lower().endswith('.csv'):
+            df = pd.read_csv(excel_path)
+        else:
+            df = pd.read_excel(excel_path)
+    except Exception as e:
+        raise RuntimeError(f"Failed to read file: {e}")
+    return TableProfile(exact=True).update(df).to_result()
+
+
+def extract_eeg_line_series(excel_path: str, prefix: str = "eeg_", max_points: int = 1000, method: str = "m4"):
     """Return down-sampled line series for EEG columns starting with prefix.
 
-    Structure:
+    Downsampling keeps each bucket's extremes (see app.services.downsampling),
+    so spikes survive at any zoom level. Structure:
     {
       "series": [
-        {"column": "eeg_fp1_ref", "points": [{"x": 0, "value": 0.123}, ...] },
+        {"column": "eeg_fp1_ref", "x": [0, 17, 33, ...], "values": [0.123, -4.2, ...]},
         ...
       ]
     }
     """
+    if use_streaming(excel_path):
+        return extract_eeg_line_series_streaming(excel_path, prefix=prefix, max_points=max_points, method=method)
     try:
         if excel_path.lower().endswith('.csv'):
             df = pd.read_csv(excel_path)
@@ -80,13 +212,92 @@ def extract_eeg_line_series(excel_path: str, prefix: str = "eeg_", max_points: i
         raise RuntimeError(f"Failed to read file: {e}")
 
     cols = [c for c in df.columns if c.lower().startswith(prefix) and np.issubdtype(df[c].dtype, np.number)]
-    series_out = []
     if not cols:
-        return {"series": series_out}
-    step = max(1, len(df) // max_points) if len(df) > max_points else 1
-    idx_series = range(0, len(df), step)
-    for col in cols:
-        col_data = df[col].iloc[::step].reset_index(drop=True)
-        points = [{"x": int(i*step), "value": (None if (pd.isna(v)) else float(v))} for i, v in enumerate(col_data)]
-        series_out.append({"column": col, "points": points})
-    return {"series": series_out}
+        return {"series": []}
+    columns = {col: df[col].to_numpy(dtype=np.float64) for col in cols}
+    return {"series": downsample_columns(columns, max_points, method=method)}
+
+
+def analyze_chunks(chunks: Iterable[pd.DataFrame], exact: bool = False) -> Dict[str, Any]:
+    profile = TableProfile(exact=exact)
+    for chunk in chunks:
+        profile.update(chunk)
+    return profile.to_result()
+
+
+def eeg_line_series_from_chunks(
+    chunks: Iterable[pd.DataFrame], prefix: str = "eeg_", max_points: int = 1000, method: str = "m4",
+) -> Dict[str, List[Dict[str, Any]]]:
+    samplers: Dict[str, StreamingDownsampler] = {}
+    started = False
+    for chunk in chunks:
+        if not started:
+            started = True
+            for c in chunk.columns:
+                if str(c).lower().startswith(prefix) and np.issubdtype(chunk[c].dtype, np.number):
+                    samplers[c] = StreamingDownsampler(max_points, method=method)
+        for c, sampler in samplers.items():
+            sampler.update(pd.to_numeric(chunk[c], errors="coerce").to_numpy(dtype=np.float64))
+
+    series = []
+    for c, sampler in samplers.items():
+        x, values = sampler.result()
+        series.append({"column": c, "x": x.tolist(), "values": to_json_list(values)})
+    return {"series": series}
+
+
+def run_analysis_streaming(path: str, chunk_rows: Optional[int] = None) -> Dict[str, Any]:
+    """Same result shape as `run_analysis`, computed in one pass over CSV chunks."""
+    return analyze_chunks(iter_csv_chunks(path, chunk_rows=chunk_rows))
+
+
+def extract_eeg_line_series_streaming(
+    path: str, prefix: str = "eeg_", max_points: int = 1000, method: str = "m4", chunk_rows: Optional[int] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Chunked variant of `extract_eeg_line_series` that only parses columns starting with prefix."""
+    chunks = iter_csv_chunks(path, usecols=lambda c: c.lower().startswith(prefix), chunk_rows=chunk_rows)
+    return eeg_line_series_from_chunks(chunks, prefix=prefix, max_points=max_points, method=method)
+
+
+def run_analysis_cached(
+    path: str, digest: str, cache: AnalysisCache = analysis_cache, cancel: Optional[Callable[[], bool]] = None,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    `run_analysis` for an upload whose content hash is `digest`, reusing cached parses
+    and results. `cancel` is polled between chunks; a true value aborts the analysis.
+    `progress(phase, rows_processed)` is called after every chunk.
+    """
+    # Files small enough to load whole get exact frequent values and distinct counts
+    params = {"exact": not use_streaming(path)}
+    result = cache.get_result(digest, "analyze", params)
+    if result is None:
+        chunks = _watch(cache.chunks(digest, lambda: iter_file_chunks(path)), cancel, progress)
+        result = analyze_chunks(chunks, exact=params["exact"])
+        cache.put_result(digest, "analyze", params, result)
+    return result
+
+
+def extract_eeg_line_series_cached(
+    path: str, digest: str, prefix: str = "eeg_", max_points: int = 1000, method: str = "m4",
+    cache: AnalysisCache = analysis_cache, cancel: Optional[Callable[[], bool]] = None,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> Dict[str, Any]:
+    """`extract_eeg_line_series` for an upload whose content hash is `digest`."""
+    def is_eeg(c) -> bool:
+        return str(c).lower().startswith(prefix)
+
+    if not cache.enabled:
+        chunks = iter_csv_chunks(path, usecols=is_eeg) if use_streaming(path) else iter_file_chunks(path)
+        return eeg_line_series_from_chunks(
+            _watch(chunks, cancel, progress), prefix=prefix, max_points=max_points, method=method
+        )
+    params = {"prefix": prefix, "max_points": max_points, "method": method}
+    result = cache.get_result(digest, "eeg-lines", params)
+    if result is None:
+        chunks = cache.chunks(digest, lambda: iter_file_chunks(path), columns=is_eeg)
+        result = eeg_line_series_from_chunks(
+            _watch(chunks, cancel, progress), prefix=prefix, max_points=max_points, method=method
+        )
+        cache.put_result(digest, "eeg-lines", params, result)
+    return result
@@ -0,0 +1,161 @@
+"""
+Vectorized, extreme-preserving downsampling for EEG line series.
+
+All functions return the *indices* of the points to keep (sorted, unique), so the
+same selection can be applied to timestamps or any parallel array.
+
+- `minmax_indices`: per bucket, the min and max sample.
+- `m4_indices`: per bucket, first, last, min and max (exact line rendering at one bucket per pixel).
+- `lttb_indices`: Largest-Triangle-Three-Buckets, visually smooth but still keeps spikes.
+
+NaN samples are never chosen as a bucket's min/max unless the whole bucket is NaN.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+METHODS = ("m4", "minmax", "lttb")
+
+
+def _bucket_argminmax(y: np.ndarray, n_buckets: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Split `y` into equal buckets (the last one may be shorter) and return each
+    bucket's start offset and absolute argmin/argmax, without copying `y`.
+    """
+    n = len(y)
+    size = int(np.ceil(n / n_buckets))
+    full = n // size
+    offsets = np.arange(full + (1 if n % size else 0)) * size
+    argmin = np.empty(len(offsets), dtype=np.int64)
+    argmax = np.empty(len(offsets), dtype=np.int64)
+
+    parts = [(y[: full * size].reshape(full, size), slice(0, full))]
+    if n % size:
+        parts.append((y[full * size:].reshape(1, -1), slice(full, full + 1)))
+    for blocks, rows in parts:
+        nan = np.isnan(blocks)
+        if nan.any():
+            argmin[rows] = np.where(nan, np.inf, blocks).argmin(axis=1)
+            argmax[rows] = np.where(nan, -np.inf, blocks).argmax(axis=1)
+        else:
+            argmin[rows] = blocks.argmin(axis=1)
+            argmax[rows] = blocks.argmax(axis=1)
+    return offsets, offsets + argmin, offsets + argmax, size
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    y = np.asarray(y)
+    if len(y) <= n_out:
+        return np.arange(len(y))
+    _, argmin, argmax, _ = _bucket_argminmax(y, max(1, n_out // 2))
+    return np.unique(np.concatenate([argmin, argmax]))
+
+
+def m4_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    y = np.asarray(y)
+    if len(y) <= n_out:
+        return np.arange(len(y))
+    offsets, argmin, argmax, size = _bucket_argminmax(y, max(1, n_out // 4))
+    last = np.minimum(offsets + size - 1, len(y) - 1)
+    return np.unique(np.concatenate([offsets, argmin, argmax, last]))
+
+
+def lttb_indices(y: np.ndarray, n_out: int, x: Optional[np.ndarray] = None) -> np.ndarray:
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    y_filled = np.where(np.isnan(y), 0.0, y)
+
+    # Interior buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    # Average point of every bucket, used as the third triangle vertex
+    csum_x = np.concatenate([[0.0], np.cumsum(x)])
+    csum_y = np.concatenate([[0.0], np.cumsum(y_filled)])
+    counts = np.maximum(ends - starts, 1)
+    avg_x = (csum_x[ends] - csum_x[starts]) / counts
+    avg_y = (csum_y[ends] - csum_y[starts]) / counts
+    avg_x = np.append(avg_x, x[-1])
+    avg_y = np.append(avg_y, y_filled[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(len(starts)):
+        s, e = starts[i], max(ends[i], starts[i] + 1)
+        bx, by = x[s:e], y_filled[s:e]
+        area = np.abs((x[a] - avg_x[i + 1]) * (by - y_filled[a]) - (x[a] - bx) * (avg_y[i + 1] - y_filled[a]))
+        a = s + int(area.argmax())
+        out[i + 1] = a
+    return np.unique(out)
+
+
+def downsample_indices(y: np.ndarray, n_out: int, method: str = "m4", x: Optional[np.ndarray] = None) -> np.ndarray:
+    if method == "m4":
+        return m4_indices(y, n_out)
+    if method == "minmax":
+        return minmax_indices(y, n_out)
+    if method == "lttb":
+        return lttb_indices(y, n_out, x=x)
+    raise ValueError(f"Unknown downsampling method '{method}', expected one of {METHODS}")
+
+
+def to_json_list(values: np.ndarray) -> List[Any]:
+    """Float array to a JSON-ready list with NaN mapped to None."""
+    values = np.asarray(values, dtype=np.float64)
+    out = values.tolist()
+    if np.isnan(values).any():
+        for i in np.flatnonzero(np.isnan(values)):
+            out[i] = None
+    return out
+
+
+def downsample_columns(
+    columns: Dict[str, np.ndarray], n_out: int, method: str = "m4", x: Optional[np.ndarray] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Downsample parallel columns independently.
+    Returns [{"column": name, "x": [...], "values": [...]}, ...] where x is the row
+    index (or the matching entry of `x` when given).
+    """
+    series = []
+    for name, y in columns.items():
+        idx = downsample_indices(y, n_out, method=method, x=x)
+        xs = idx if x is None else np.asarray(x)[idx]
+        series.append({"column": name, "x": xs.tolist(), "values": to_json_list(np.asarray(y)[idx])})
+    return series
+
+
+class StreamingDownsampler:
+    """
+    Downsample a column that arrives in chunks, with memory bounded by `n_out`.
+
+    Each chunk is reduced with min/max-preserving M4 and appended; whenever the kept
+    points exceed a few times `n_out` they are re-reduced. Because every reduction
+    keeps bucket extremes, the global min/max and any spike survive to `result()`.
+    """
+
+    def __init__(self, n_out: int, method: str = "m4", slack: int = 8):
+        self.n_out = n_out
+        self.method = method
+        self.budget = max(n_out * slack, 64)
+        self.x = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float64)
+        self.count = 0
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        idx = m4_indices(values, self.budget)
+        self.x = np.concatenate([self.x, idx + self.count])
+        self.values = np.concatenate([self.values, values[idx]])
+        self.count += len(values)
+        if len(self.values) > 2 * self.budget:
+            keep = m4_indices(self.values, self.budget)
+            self.x, self.values = self.x[keep], self.values[keep]
+
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(x, values) reduced to about `n_out` points with the configured method."""
+        keep = downsample_indices(self.values, self.n_out, method=self.method, x=self.x)
+        return self.x[keep], self.values[keep]
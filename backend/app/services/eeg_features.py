@@ -0,0 +1,179 @@
+"""
+Windowed EEG features for seizure detection.
+
+`window_features` turns windows of shape (n_windows, n_samples, n_channels) into
+one feature row per window, vectorized over windows and channels. Per channel, in
+`FEATURE_NAMES` order:
+
+- line_length: mean absolute first difference
+- variance (Hjorth activity)
+- zero_crossings: fraction of consecutive samples that change sign about the mean
+- hjorth_mobility, hjorth_complexity
+- delta/theta/alpha/beta/gamma band power, from a Welch PSD (Hann, 1 s segments, 50% overlap)
+
+Rows are channel-major: all features of channel 0, then channel 1, and so on.
+`StreamingFeatureEngine` keeps a ring buffer per patient and emits a window
+every hop, so inference runs once per hop instead of once per sample.
+"""
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.core.config import settings
+
+BANDS: Tuple[Tuple[str, float, float], ...] = (
+    ("delta", 0.5, 4.0),
+    ("theta", 4.0, 8.0),
+    ("alpha", 8.0, 13.0),
+    ("beta", 13.0, 30.0),
+    ("gamma", 30.0, 70.0),
+)
+FEATURE_NAMES: Tuple[str, ...] = (
+    "line_length", "variance", "zero_crossings", "hjorth_mobility", "hjorth_complexity",
+) + tuple(f"{name}_power" for name, _, _ in BANDS)
+
+_EPS = 1e-12
+
+
+def welch_psd(x: np.ndarray, fs: float, nperseg: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    One-sided Welch PSD along axis 1 of x (n_windows, n_samples, n_channels).
+    Returns (freqs, psd) with psd of shape (n_windows, n_channels, n_freqs).
+    """
+    n = x.shape[1]
+    nperseg = min(n, nperseg or int(fs))
+    step = max(1, nperseg // 2)
+    segments = sliding_window_view(x, nperseg, axis=1)[:, ::step]  # (w, segs, c, nperseg)
+    segments = segments - segments.mean(axis=-1, keepdims=True)
+    taper = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(nperseg) / nperseg)  # periodic Hann
+    spectrum = np.abs(np.fft.rfft(segments * taper, axis=-1)) ** 2 / (fs * (taper ** 2).sum())
+    # Fold negative frequencies in (DC and, for even lengths, Nyquist appear once)
+    spectrum[..., 1: nperseg // 2 + (nperseg % 2)] *= 2
+    return np.fft.rfftfreq(nperseg, 1.0 / fs), spectrum.mean(axis=1)
+
+
+def band_powers(x: np.ndarray, fs: float) -> np.ndarray:
+    """Power per band in `BANDS`, shape (n_windows, n_channels, n_bands)."""
+    freqs, psd = welch_psd(x, fs)
+    df = freqs[1] - freqs[0] if len(freqs) > 1 else fs
+    weights = np.stack([((freqs >= lo) & (freqs < hi)) * df for _, lo, hi in BANDS], axis=1)
+    return psd @ weights
+
+
+def window_features(windows: np.ndarray, fs: float = settings.EEG_SAMPLE_RATE) -> np.ndarray:
+    """
+    Feature rows for `windows` of shape (n_windows, n_samples, n_channels), or a single
+    (n_samples, n_channels) window. Returns (n_windows, n_channels * len(FEATURE_NAMES)).
+    """
+    x = np.asarray(windows, dtype=np.float64)
+    if x.ndim == 2:
+        x = x[None]
+    x = x - x.mean(axis=1, keepdims=True)
+    d1 = np.diff(x, axis=1)
+    d2 = np.diff(d1, axis=1)
+
+    variance = x.var(axis=1)
+    var_d1 = d1.var(axis=1)
+    mobility = np.sqrt(var_d1 / (variance + _EPS))
+    complexity = np.sqrt(d2.var(axis=1) / (var_d1 + _EPS)) / (mobility + _EPS)
+    line_length = np.abs(d1).mean(axis=1)
+    zero_crossings = (np.signbit(x[:, 1:]) != np.signbit(x[:, :-1])).mean(axis=1)
+
+    time_domain = np.stack([line_length, variance, zero_crossings, mobility, complexity], axis=-1)
+    features = np.concatenate([time_domain, band_powers(x, fs)], axis=-1)  # (w, c, f)
+    return features.reshape(len(x), -1)
+
+
+_NO_FEATURES = np.empty(0)
+
+
+class FeatureWindow(NamedTuple):
+    patient_id: int
+    samples: np.ndarray  # (window_samples, n_channels), oldest first
+    features: np.ndarray  # (n_channels * len(FEATURE_NAMES),), or empty when not computed
+    hop: int  # samples that are new since the previous window
+
+
+class _Ring:
+    __slots__ = ("buffer", "pos", "filled", "since_hop")
+
+    def __init__(self, size: int, n_channels: int):
+        self.buffer = np.zeros((size, n_channels), dtype=np.float64)
+        self.pos = 0
+        self.filled = 0
+        self.since_hop = 0
+
+    def ordered(self) -> np.ndarray:
+        return np.concatenate([self.buffer[self.pos:], self.buffer[: self.pos]])
+
+
+class StreamingFeatureEngine:
+    """
+    Per-patient ring buffers of the last `window_seconds` of samples. Every
+    `hop_seconds` of new samples, a full window is emitted with its features.
+    Each patient's channel count is fixed by its first sample; later samples are
+    truncated or zero-padded to it.
+    """
+
+    def __init__(
+        self,
+        fs: float = settings.EEG_SAMPLE_RATE,
+        window_seconds: float = settings.SEIZURE_WINDOW_SECONDS,
+        hop_seconds: float = settings.SEIZURE_HOP_SECONDS,
+    ):
+        self.fs = fs
+        self.window = max(4, int(round(window_seconds * fs)))
+        self.hop = max(1, int(round(hop_seconds * fs)))
+        self._rings: Dict[int, _Ring] = {}
+
+    def reset(self, patient_id: Optional[int] = None) -> None:
+        if patient_id is None:
+            self._rings.clear()
+        else:
+            self._rings.pop(patient_id, None)
+
+    def _ring(self, patient_id: int, n_channels: int) -> _Ring:
+        ring = self._rings.get(patient_id)
+        if ring is None:
+            ring = self._rings[patient_id] = _Ring(self.window, n_channels)
+        return ring
+
+    def push(self, patient_id: int, samples, n_features: Optional[int] = None) -> List[FeatureWindow]:
+        """
+        Append one sample (n_channels,) or a block (n_samples, n_channels) for a patient.
+        Returns the windows completed by these samples, oldest first (usually none).
+        With `n_features` (the model's input width), features are only computed when they
+        have that width; otherwise the windows carry an empty `features` array.
+        """
+        block = np.asarray(samples, dtype=np.float64)
+        if block.ndim == 1:
+            block = block[None]
+        ring = self._ring(patient_id, block.shape[1])
+        n_channels = ring.buffer.shape[1]
+        if block.shape[1] != n_channels:
+            fitted = np.zeros((len(block), n_channels))
+            fitted[:, : min(n_channels, block.shape[1])] = block[:, :n_channels]
+            block = fitted
+
+        ready: List[np.ndarray] = []
+        i = 0
+        while i < len(block):
+            # Copy up to the next hop boundary or the end of the ring, whichever is first
+            take = min(len(block) - i, self.hop - ring.since_hop, self.window - ring.pos)
+            ring.buffer[ring.pos: ring.pos + take] = block[i: i + take]
+            ring.pos = (ring.pos + take) % self.window
+            ring.filled = min(self.window, ring.filled + take)
+            ring.since_hop += take
+            i += take
+            if ring.since_hop == self.hop:
+                ring.since_hop = 0
+                if ring.filled == self.window:
+                    ready.append(ring.ordered())
+        if not ready:
+            return []
+        if n_features is None or n_channels * len(FEATURE_NAMES) == n_features:
+            features = window_features(np.stack(ready), self.fs)
+        else:
+            features = [_NO_FEATURES] * len(ready)
+        return [FeatureWindow(patient_id, w, f, self.hop) for w, f in zip(ready, features)]
@@ -0,0 +1,156 @@
+"""
+Compact binary EEG frames for device -> MQTT -> backend transport.
+
+A frame carries a block of consecutive samples from one device with a fixed
+36-byte little-endian header, followed by the samples packed sample-major
+(n_samples x n_channels):
+
+    offset  size  field
+         0     2  magic b"EG"
+         2     1  format version (1)
+         3     1  encoding: 1 = float32, 2 = int24 (two's complement, times `scale`)
+         4     4  patient id (uint32)
+         8     4  device id (uint32)
+        12     4  sequence number (uint32, +1 per frame, wraps)
+        16     8  timestamp of the first sample, microseconds since the Unix epoch (int64, UTC)
+        24     4  sample rate in Hz (float32)
+        28     2  samples in the frame (uint16)
+        30     1  channels (uint8)
+        31     1  reserved (0)
+        32     4  scale: value of one int24 step (float32; 1.0 for float32 frames)
+
+Per-sample timestamps are derived as timestamp + i / sample_rate, so nothing is
+formatted or parsed as text on either end. float32 samples are decoded with
+`numpy.frombuffer` without copying; int24 samples (the ADS1299's native output)
+are widened in one vectorized pass.
+
+JSON messages stay supported: a frame is recognized by its magic, and a JSON
+payload always starts with "{".
+"""
+import math
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+MAGIC = b"EG"
+FORMAT_VERSION = 1
+FLOAT32 = 1
+INT24 = 2
+ENCODINGS = {FLOAT32: "float32", INT24: "int24"}
+
+HEADER = struct.Struct("<2sBBIIIqfHBBf")
+HEADER_SIZE = HEADER.size  # 36
+_BYTES_PER_VALUE = {FLOAT32: 4, INT24: 3}
+_INT24_MAX = 2 ** 23 - 1
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class FrameError(ValueError):
+    """Raised for payloads that are not valid EEG frames."""
+
+
+class EEGFrame(NamedTuple):
+    patient_id: int
+    device_id: int
+    sequence: int
+    timestamp: datetime  # first sample, UTC
+    sample_rate: float
+    samples: np.ndarray  # (n_samples, n_channels), read-only view of the payload for float32
+
+    def timestamps(self) -> np.ndarray:
+        """Per-sample times as datetime64[us]."""
+        start = np.datetime64(int((self.timestamp - EPOCH) // timedelta(microseconds=1)), "us")
+        offsets = np.round(np.arange(len(self.samples)) * (1e6 / self.sample_rate)).astype("timedelta64[us]")
+        return start + offsets
+
+    @property
+    def end_timestamp(self) -> datetime:
+        """Timestamp of the last sample."""
+        return self.timestamp + timedelta(seconds=(len(self.samples) - 1) / self.sample_rate)
+
+
+def is_frame(payload: bytes) -> bool:
+    return payload[:2] == MAGIC
+
+
+def frame_patient_id(payload: bytes) -> int:
+    """The patient id from a frame's header, without decoding the rest."""
+    if len(payload) < HEADER_SIZE:
+        raise FrameError(f"Frame too short ({len(payload)} bytes)")
+    return struct.unpack_from("<I", payload, 4)[0]
+
+
+def encode_frame(
+    patient_id: int,
+    samples: np.ndarray,
+    timestamp: datetime,
+    sample_rate: float,
+    sequence: int = 0,
+    device_id: int = 0,
+    encoding: int = FLOAT32,
+    scale: Optional[float] = None,
+) -> bytes:
+    """
+    Pack (n_samples, n_channels) samples into a frame. For INT24, values are divided by
+    `scale` (default: the smallest step that fits the block's range) and rounded.
+    """
+    samples = np.asarray(samples)
+    if samples.ndim == 1:
+        samples = samples[None]
+    n_samples, n_channels = samples.shape
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    t_us = (timestamp - EPOCH) // timedelta(microseconds=1)
+    if encoding == FLOAT32:
+        scale = 1.0
+        body = np.ascontiguousarray(samples, dtype="<f4").tobytes()
+    elif encoding == INT24:
+        if scale is None:
+            peak = float(np.abs(samples).max()) if samples.size else 0.0
+            scale = peak / _INT24_MAX if peak > 0 else 1.0
+        scale = float(np.float32(scale))  # as the header stores it
+        counts = np.clip(np.round(samples / scale), -_INT24_MAX - 1, _INT24_MAX).astype("<i4")
+        body = counts.view(np.uint8).reshape(n_samples, n_channels, 4)[..., :3].tobytes()
+    else:
+        raise FrameError(f"Unknown frame encoding {encoding}")
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, encoding, patient_id, device_id, sequence & 0xFFFFFFFF,
+        t_us, sample_rate, n_samples, n_channels, 0, scale,
+    )
+    return header + body
+
+
+def decode_frame(payload: bytes) -> EEGFrame:
+    if len(payload) < HEADER_SIZE:
+        raise FrameError(f"Frame too short ({len(payload)} bytes)")
+    (magic, version, encoding, patient_id, device_id, sequence,
+     t_us, sample_rate, n_samples, n_channels, _, scale) = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise FrameError("Not an EEG frame")
+    if version != FORMAT_VERSION:
+        raise FrameError(f"Unsupported frame version {version}")
+    if encoding not in _BYTES_PER_VALUE:
+        raise FrameError(f"Unknown frame encoding {encoding}")
+    if not (math.isfinite(sample_rate) and sample_rate > 0) or n_channels == 0:
+        raise FrameError(f"Invalid frame geometry (rate={sample_rate}, channels={n_channels})")
+    expected = HEADER_SIZE + n_samples * n_channels * _BYTES_PER_VALUE[encoding]
+    if len(payload) != expected:
+        raise FrameError(f"Frame is {len(payload)} bytes, header says {expected}")
+
+    if encoding == FLOAT32:
+        samples = np.frombuffer(payload, dtype="<f4", count=n_samples * n_channels, offset=HEADER_SIZE)
+        samples = samples.reshape(n_samples, n_channels)
+    else:
+        raw = np.frombuffer(payload, dtype=np.uint8, offset=HEADER_SIZE).reshape(n_samples, n_channels, 3)
+        wide = np.zeros((n_samples, n_channels, 4), dtype=np.uint8)
+        wide[..., 1:] = raw
+        # Little-endian int24 in the top three bytes; the arithmetic shift sign-extends it
+        samples = (wide.view("<i4")[..., 0] >> 8).astype(np.float32) * np.float32(scale)
+    try:
+        timestamp = EPOCH + timedelta(microseconds=t_us)
+    except OverflowError:
+        raise FrameError(f"Invalid frame timestamp {t_us}")
+    return EEGFrame(patient_id, device_id, sequence, timestamp, float(sample_rate), samples)
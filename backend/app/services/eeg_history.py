@@ -0,0 +1,170 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.services.downsampling import m4_indices, to_json_list
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (name, bucket seconds, continuous aggregate over eeg_data), coarsest first
+ROLLUPS: List[Tuple[str, int, str]] = [
+    ("1m", 60, "eeg_rollup_1m"),
+    ("10s", 10, "eeg_rollup_10s"),
+    ("1s", 1, "eeg_rollup_1s"),
+]
+# The same rollups over eeg_samples, for the wide layout
+WIDE_ROLLUP_VIEWS: Dict[str, str] = {
+    "1m": "eeg_samples_rollup_1m",
+    "10s": "eeg_samples_rollup_10s",
+    "1s": "eeg_samples_rollup_1s",
+}
+# Channels the wide rollups have columns for (see the eeg_samples rollup migration). Wider
+# rows still count in the rollups' `channels` column; their extra channels are aggregated
+# from eeg_samples at query time (WIDE_RAW_ROLLUP_SQL).
+WIDE_ROLLUP_CHANNELS = 8
+
+NARROW_ROLLUP_SQL = """
+SELECT bucket, channel_id, min_mv, max_mv, sum_mv / n AS mean_mv, sqrt(sumsq_mv / n) AS rms_mv
+FROM {view}
+WHERE patient_id = :patient_id AND bucket >= :start AND bucket < :end {channel_filter}
+ORDER BY channel_id, bucket
+"""
+
+# Continuous aggregates cannot unnest arrays, so the wide rollups keep one set of
+# columns per channel (min_0, max_0, sum_0, sumsq_0, n_0, ...), unnested here.
+WIDE_ROLLUP_SQL = """
+SELECT r.bucket, c.ord - 1 AS channel_id, c.min_mv, c.max_mv, c.sum_mv / c.n AS mean_mv, sqrt(c.sumsq_mv / c.n) AS rms_mv
+FROM {view} r, unnest({arrays}) WITH ORDINALITY AS c(min_mv, max_mv, sum_mv, sumsq_mv, n, ord)
+WHERE r.patient_id = :patient_id AND r.bucket >= :start AND r.bucket < :end AND c.n > 0 {channel_filter}
+ORDER BY 2, 1
+"""
+
+WIDE_CHANNELS_SQL = """
+SELECT max(channels) FROM {view}
+WHERE patient_id = :patient_id AND bucket >= :start AND bucket < :end
+"""
+
+# The same aggregates computed from raw samples, for channels the rollups have no columns for
+WIDE_RAW_ROLLUP_SQL = """
+SELECT time_bucket(make_interval(secs => :seconds), s.time) AS bucket, c.ord - 1 AS channel_id,
+       min(c.v), max(c.v), avg(c.v), sqrt(avg(c.v * c.v))
+FROM eeg_samples s, unnest(s.channel_data) WITH ORDINALITY AS c(v, ord)
+WHERE s.patient_id = :patient_id AND s.time >= :start AND s.time < :end AND c.ord > :rolled {channel_filter}
+GROUP BY 1, 2
+ORDER BY 2, 1
+"""
+
+
+def _wide_arrays(n_channels: int = WIDE_ROLLUP_CHANNELS) -> str:
+    # ARRAY[r.min_0, r.min_1, ...], ARRAY[r.max_0, ...], ...
+    return ", ".join(
+        "ARRAY[" + ", ".join(f"r.{column}_{i}" for i in range(n_channels)) + "]"
+        for column in ("min", "max", "sum", "sumsq", "n")
+    )
+
+
+def pick_resolution(start: datetime, end: datetime, width: int) -> Optional[Tuple[str, int, str]]:
+    """
+    Coarsest rollup that still yields at least `width` buckets over [start, end).
+    Returns None when even 1 s buckets are too coarse and raw samples are needed.
+    """
+    seconds_per_pixel = (end - start).total_seconds() / max(width, 1)
+    for rollup in ROLLUPS:
+        if rollup[1] <= seconds_per_pixel:
+            return rollup
+    return None
+
+
+def _rollup_rows(
+    db: Session, rollup: Tuple[str, int, str], patient_id: int, start: datetime, end: datetime,
+    channels: Optional[List[int]],
+):
+    params: Dict[str, Any] = {"patient_id": patient_id, "start": start, "end": end}
+    if channels:
+        params["channels"] = channels
+    if settings.EEG_STORAGE_LAYOUT != "wide":
+        channel_filter = "AND channel_id = ANY(:channels)" if channels else ""
+        return list(db.execute(text(NARROW_ROLLUP_SQL.format(view=rollup[2], channel_filter=channel_filter)), params))
+
+    view = WIDE_ROLLUP_VIEWS[rollup[0]]
+    channel_filter = "AND c.ord - 1 = ANY(:channels)" if channels else ""
+    rows = list(db.execute(
+        text(WIDE_ROLLUP_SQL.format(view=view, arrays=_wide_arrays(), channel_filter=channel_filter)), params,
+    ))
+    if channels and max(channels) < WIDE_ROLLUP_CHANNELS:
+        return rows
+    widest = db.execute(text(WIDE_CHANNELS_SQL.format(view=view)), params).scalar()
+    if widest and widest > WIDE_ROLLUP_CHANNELS:
+        rows += db.execute(
+            text(WIDE_RAW_ROLLUP_SQL.format(channel_filter=channel_filter)),
+            {**params, "seconds": rollup[1], "rolled": WIDE_ROLLUP_CHANNELS},
+        )
+    return rows
+
+
+def get_history(
+    db: Session,
+    *,
+    patient_id: int,
+    start: datetime,
+    end: datetime,
+    width: int,
+    channels: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """
+    EEG history for a patient at the coarsest resolution that fills `width` pixels.
+
+    Structure:
+    {
+      "resolution": "10s" | "raw",
+      "channels": [
+        {"channel_id": 0, "time": [...], "min": [...], "max": [...], "mean": [...], "rms": [...]},
+        ...
+      ]
+    }
+    For "raw" each channel has "time" and "values" instead of the aggregate columns,
+    M4-downsampled to `width` points.
+    """
+    rollup = pick_resolution(start, end, width)
+    out: Dict[int, Dict[str, Any]] = {}
+
+    if rollup is None:
+        samples = crud.eeg_store.get_range(db, patient_id=patient_id, start=start, end=end)
+        if not samples:
+            return {"resolution": "raw", "channels": []}
+        times = np.array([sample.timestamp.isoformat() for sample in samples])
+        n_channels = max(len(sample.channel_data) for sample in samples)
+        matrix = np.full((len(samples), n_channels), np.nan)
+        for i, sample in enumerate(samples):
+            matrix[i, : len(sample.channel_data)] = sample.channel_data
+        for channel_id in range(n_channels):
+            if channels and channel_id not in channels:
+                continue
+            idx = m4_indices(matrix[:, channel_id], width)
+            out[channel_id] = {
+                "channel_id": channel_id,
+                "time": times[idx].tolist(),
+                "values": to_json_list(matrix[idx, channel_id]),
+            }
+        return {"resolution": "raw", "channels": list(out.values())}
+
+    for bucket, channel_id, min_mv, max_mv, mean_mv, rms_mv in _rollup_rows(
+        db, rollup, patient_id, start, end, channels
+    ):
+        ch = out.setdefault(
+            channel_id,
+            {"channel_id": channel_id, "time": [], "min": [], "max": [], "mean": [], "rms": []},
+        )
+        ch["time"].append(bucket.isoformat())
+        ch["min"].append(min_mv)
+        ch["max"].append(max_mv)
+        ch["mean"].append(mean_mv)
+        ch["rms"].append(rms_mv)
+    return {"resolution": rollup[0], "channels": list(out.values())}
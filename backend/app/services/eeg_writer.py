@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Union
+
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.core.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class EEGWriter:
+    """
+    Batched, asynchronous persistence stage for incoming EEG samples.
+
+    The MQTT network thread calls `submit()`, which only enqueues the sample block
+    (schemas.EEGBlockCreate) on a bounded queue. A dedicated writer thread drains the
+    queue and flushes to the configured EEG table (`crud.eeg_store`) in bulk whenever
+    `batch_size` samples are buffered or the oldest buffered block reaches
+    `flush_interval` seconds, so commits happen per batch, not per sample, and rows
+    are only expanded from blocks on the writer thread.
+
+    When the queue is full, `submit()` blocks for at most `put_timeout` seconds
+    (backpressure) and then drops the block, counting its samples in `stats()`.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        max_queue: int = settings.EEG_INGEST_QUEUE_SIZE,
+        batch_size: int = settings.EEG_INGEST_BATCH_SIZE,
+        flush_interval: float = settings.EEG_INGEST_FLUSH_INTERVAL,
+        put_timeout: float = settings.EEG_INGEST_PUT_TIMEOUT,
+    ):
+        if session_factory is None:
+            from app.db.session import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.queue: "queue.Queue[schemas.EEGBlockCreate]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            "received": 0,
+            "written_samples": 0,
+            "written_rows": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "failed_samples": 0,
+            "overflows": 0,
+            "dropped": 0,
+        }
+
+    def _incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def submit(self, eeg_data_in: Union[schemas.EEGBlockCreate, schemas.EEGDataCreate]) -> bool:
+        """Enqueue a sample block (or a single sample) for persistence. Returns False if it was dropped."""
+        if isinstance(eeg_data_in, schemas.EEGDataCreate):
+            eeg_data_in = schemas.EEGBlockCreate.from_sample(eeg_data_in)
+        self._incr("received", len(eeg_data_in))
+        try:
+            self.queue.put_nowait(eeg_data_in)
+            return True
+        except queue.Full:
+            self._incr("overflows")
+        try:
+            self.queue.put(eeg_data_in, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self._incr("dropped", len(eeg_data_in))
+            return False
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="eeg-writer", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"EEG writer started (batch={self.batch_size}, interval={self.flush_interval}s, "
+            f"queue={self.queue.maxsize})"
+        )
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the writer thread after flushing whatever is still buffered."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        logger.info(f"EEG writer stopped: {self.stats()}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counters)
+        out["queue_depth"] = self.queue.qsize()
+        return out
+
+    def _run(self):
+        batch: List[schemas.EEGBlockCreate] = []
+        samples = 0
+        oldest = 0.0
+        while not (self._stop.is_set() and self.queue.empty()):
+            timeout = self.flush_interval
+            if batch:
+                timeout = max(0.0, oldest + self.flush_interval - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+                if not batch:
+                    oldest = time.monotonic()
+                batch.append(item)
+                samples += len(item)
+                # Drain whatever is already waiting without re-checking the clock per item
+                while samples < self.batch_size:
+                    item = self.queue.get_nowait()
+                    batch.append(item)
+                    samples += len(item)
+            except queue.Empty:
+                pass
+
+            if batch and (
+                samples >= self.batch_size
+                or time.monotonic() - oldest >= self.flush_interval
+                or self._stop.is_set()
+            ):
+                self._flush(batch, samples)
+                batch = []
+                samples = 0
+        if batch:
+            self._flush(batch, samples)
+
+    def _flush(self, batch: List[schemas.EEGBlockCreate], samples: int):
+        db = self.session_factory()
+        try:
+            rows = crud.eeg_store.create_blocks(db, blocks=batch)
+            self._incr("flushes")
+            self._incr("written_samples", samples)
+            self._incr("written_rows", rows)
+        except Exception as e:
+            db.rollback()
+            self._incr("failed_flushes")
+            self._incr("failed_samples", samples)
+            logger.error(f"Failed to flush {samples} EEG samples: {e}")
+        finally:
+            db.close()
@@ -0,0 +1,241 @@
+"""
+Inference backends for the seizure model.
+
+Every backend exposes `predict(X)`, `predict_proba(X)`, `classes_` and
+`n_features_in_`, so `SeizureDetector` can swap them freely:
+
+- `sklearn`: the unpickled estimator as is.
+- `numpy`: tree ensembles flattened into NumPy arrays and traversed for the whole
+  batch and every tree at once, one vectorized step per tree level. Predictions
+  match sklearn exactly (inputs are compared as float32, like sklearn does).
+- `onnx`: the model converted with skl2onnx and run by onnxruntime on CPU.
+  Both packages are optional; without them this backend is unavailable.
+- `auto` (default): `numpy` for batches below SEIZURE_INFERENCE_AUTO_ROWS rows, where
+  sklearn's per-call overhead dominates, `sklearn` from there on, where it is several
+  times faster per row (see benchmark_inference_backends.py). Serving from a mapped
+  artifact, the sklearn model is only unpickled by a process that runs a large batch.
+
+`load_backend(model, name)` falls back to `sklearn` when the requested backend
+cannot handle the model.
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("auto", "sklearn", "numpy", "onnx")
+
+
+class SklearnBackend:
+    name = "sklearn"
+
+    def __init__(self, model: Any):
+        self.model = model
+        self.classes_ = model.classes_
+        self.n_features_in_ = getattr(model, "n_features_in_", None)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.model.predict(X)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.model.predict_proba(X)
+
+
+class NumpyForestBackend:
+    """
+    A fitted decision tree classifier or forest of them as flat arrays.
+
+    All trees' nodes are concatenated and leaves point to themselves, so traversal
+    advances every (row, tree) pair one level per vectorized step, with no per-row
+    or per-tree Python loop.
+    """
+
+    name = "numpy"
+
+    # Arrays that make up a flattened forest; see model_artifacts.py for the on-disk layout
+    ARRAYS = ("feature", "threshold", "children", "is_leaf", "value", "roots")
+
+    def __init__(self, arrays: Dict[str, np.ndarray], classes: np.ndarray, n_features: int):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        # Interleaved (left, right) children: the next node is children[2 * node + went_right]
+        self.children = arrays["children"]
+        self.is_leaf = arrays["is_leaf"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = n_features
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> "NumpyForestBackend":
+        trees = getattr(model, "estimators_", None)
+        if trees is None:
+            trees = [model]
+        if not hasattr(trees[0], "tree_") or not hasattr(model, "classes_"):
+            raise TypeError(f"{type(model).__name__} is not a tree ensemble classifier")
+
+        features: List[np.ndarray] = []
+        thresholds: List[np.ndarray] = []
+        children: List[np.ndarray] = []
+        leaves: List[np.ndarray] = []
+        values: List[np.ndarray] = []
+        roots = []
+        offset = 0
+        for estimator in trees:
+            tree = estimator.tree_
+            n = tree.node_count
+            leaf = tree.children_left == -1
+            index = np.arange(n)
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, 0.0, tree.threshold))
+            # Leaves point to themselves
+            left = np.where(leaf, index, tree.children_left) + offset
+            right = np.where(leaf, index, tree.children_right) + offset
+            children.append(np.stack([left, right], axis=1).ravel())
+            leaves.append(leaf)
+            value = tree.value[:, 0, :].astype(np.float64)
+            values.append(value / np.maximum(value.sum(axis=1, keepdims=True), 1e-300))
+            roots.append(offset)
+            offset += n
+        arrays = {
+            "feature": np.concatenate(features).astype(np.int32),
+            "threshold": np.concatenate(thresholds).astype(np.float64),
+            "children": np.concatenate(children).astype(np.int32),
+            "is_leaf": np.concatenate(leaves),
+            "value": np.concatenate(values),
+            "roots": np.array(roots, dtype=np.int32),
+        }
+        n_features = getattr(model, "n_features_in_", int(arrays["feature"].max()) + 1)
+        return cls(arrays, model.classes_, int(n_features))
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def _leaves(self, X: np.ndarray, chunk_rows: int = 1024) -> np.ndarray:
+        """Leaf node reached in every tree, shape (n_rows, n_trees)."""
+        # sklearn compares float32 inputs against float64 thresholds; do the same for identical splits
+        X = np.asarray(X, dtype=np.float32)
+        n_features = X.shape[1]
+        n_trees = len(self.roots)
+        out = np.empty(len(X) * n_trees, dtype=np.int32)
+        for start in range(0, len(X), chunk_rows):
+            flat = X[start: start + chunk_rows].ravel()
+            n = len(flat) // n_features
+            # One entry per (row, tree): output position, current node and the row's offset into `flat`
+            pos = np.arange(start * n_trees, (start + n) * n_trees)
+            node = np.tile(self.roots, n)
+            base = np.repeat(np.arange(n, dtype=np.int64) * n_features, n_trees)
+            while len(pos):
+                node = self.children[2 * node + (flat[base + self.feature[node]] > self.threshold[node])]
+                done = self.is_leaf[node]
+                n_done = np.count_nonzero(done)
+                if n_done == len(done):
+                    out[pos] = node
+                    break
+                # Leaves loop to themselves, so finished entries are only dropped once compaction pays off
+                if n_done * 4 > len(done):
+                    out[pos[done]] = node[done]
+                    keep = ~done
+                    pos, node, base = pos[keep], node[keep], base[keep]
+        return out.reshape(len(X), n_trees)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.value[self._leaves(X)].mean(axis=1)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, onnx_bytes: bytes, classes: np.ndarray, n_features: int):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        self.session = onnxruntime.InferenceSession(onnx_bytes, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = n_features
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> "OnnxBackend":
+        from skl2onnx import to_onnx
+
+        sample = np.zeros((1, model.n_features_in_), dtype=np.float32)
+        onnx_model = to_onnx(model, sample, options={id(model): {"zipmap": False}}, target_opset=17)
+        return cls(onnx_model.SerializeToString(), model.classes_, model.n_features_in_)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        _, proba = self.session.run(None, {self.input_name: np.asarray(X, dtype=np.float32)})
+        return proba
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        labels, _ = self.session.run(None, {self.input_name: np.asarray(X, dtype=np.float32)})
+        return labels
+
+
+class AutoBackend:
+    """
+    Picks a backend per batch: `small` below `min_rows` rows, `large` from there on.
+    `large` may instead be given as `load_large`, a zero-argument callable that builds
+    it on the first large batch, so a process that never runs one never loads it.
+    """
+
+    name = "auto"
+
+    def __init__(
+        self,
+        small: Any,
+        large: Any = None,
+        min_rows: int = settings.SEIZURE_INFERENCE_AUTO_ROWS,
+        load_large: Optional[Callable[[], Any]] = None,
+    ):
+        if large is None and load_large is None:
+            raise ValueError("AutoBackend needs a large backend or a loader for one")
+        self.small = small
+        self._large = large
+        self._load_large = load_large
+        self._lock = threading.Lock()
+        self.min_rows = min_rows
+        self.classes_ = small.classes_
+        self.n_features_in_ = small.n_features_in_
+
+    @property
+    def large(self) -> Any:
+        if self._large is None:
+            with self._lock:
+                if self._large is None:
+                    self._large = self._load_large()
+        return self._large
+
+    def _pick(self, X: np.ndarray) -> Any:
+        return self.large if len(X) >= self.min_rows else self.small
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self._pick(X).predict(X)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self._pick(X).predict_proba(X)
+
+
+def load_backend(model: Any, name: str = "auto") -> Any:
+    """Wrap a fitted sklearn classifier in the named backend, falling back to sklearn."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {BACKENDS}")
+    try:
+        if name == "auto":
+            return AutoBackend(NumpyForestBackend.from_sklearn(model), SklearnBackend(model))
+        if name == "numpy":
+            return NumpyForestBackend.from_sklearn(model)
+        if name == "onnx":
+            return OnnxBackend.from_sklearn(model)
+    except Exception as e:
+        logger.warning(f"Inference backend '{name}' unavailable ({e}), using sklearn")
+    return SklearnBackend(model)
@@ -0,0 +1,196 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from app.core.config import settings
+from app.services.eeg_features import FeatureWindow
+from app.services.model_registry import model_manager
+from app.services.seizure_detection import SeizureDetector, get_detector
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Called with the decisions and the version of the model that made them
+Callback = Callable[[List[bool], Optional[str]], None]
+
+
+class SchedulerFull(Exception):
+    """The request was dropped because the scheduler queue stayed full."""
+
+
+class _Request(NamedTuple):
+    windows: Sequence[FeatureWindow]
+    callback: Optional[Callback]
+    future: Future
+    enqueued: float
+
+
+class InferenceScheduler:
+    """
+    Cross-patient micro-batching in front of `SeizureDetector`.
+
+    Callers `submit()` windows from any patient; a scheduler thread collects them
+    until `max_rows` model rows are pending or the oldest has waited `max_delay`
+    seconds, runs one `predict_windows` call on the stacked batch, and routes each
+    caller's decisions back through its callback (or future, for `predict()`).
+
+    When the queue is full, `submit()` blocks for at most `put_timeout` seconds and
+    then drops the request (counted in `dropped_windows`; its future fails with
+    `SchedulerFull` and its callback never runs). Running it inline instead would
+    let it overtake queued requests and deliver a patient's decisions out of order.
+
+    Without an explicit `detector`, each batch runs on the current global one, so a
+    hot model swap applies from the next batch on; a shadow model set through
+    `model_manager` is scored on the same batch after the callbacks have run.
+    """
+
+    def __init__(
+        self,
+        detector: Optional[SeizureDetector] = None,
+        max_rows: int = settings.SEIZURE_BATCH_MAX_ROWS,
+        max_delay: float = settings.SEIZURE_BATCH_MAX_DELAY,
+        max_queue: int = settings.SEIZURE_BATCH_QUEUE_SIZE,
+        put_timeout: float = settings.EEG_INGEST_PUT_TIMEOUT,
+    ):
+        self._detector = detector
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.put_timeout = put_timeout
+        self.queue: "queue.Queue[_Request]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {
+            "requests": 0,
+            "windows": 0,
+            "rows": 0,
+            "batches": 0,
+            "dropped": 0,
+            "dropped_windows": 0,
+            "failed_batches": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    @property
+    def detector(self) -> SeizureDetector:
+        return self._detector or get_detector()
+
+    def _incr(self, name: str, amount: float = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def submit(self, windows: Sequence[FeatureWindow], callback: Optional[Callback] = None) -> Future:
+        """
+        Queue windows for the next batch. `callback(decisions, model_version)` runs on
+        the scheduler thread with one decision per window; the returned future resolves
+        to the same list, or fails with `SchedulerFull` if the request was dropped.
+        """
+        future: Future = Future()
+        if not windows:
+            future.set_result([])
+            return future
+        request = _Request(windows, callback, future, time.monotonic())
+        self._incr("requests")
+        if self._thread is None:
+            self._run_batch([request])
+            return future
+        try:
+            self.queue.put(request, timeout=self.put_timeout)
+        except queue.Full:
+            self._incr("dropped")
+            self._incr("dropped_windows", len(windows))
+            future.set_exception(SchedulerFull(f"Inference queue full, dropped {len(windows)} windows"))
+        return future
+
+    def predict(self, windows: Sequence[FeatureWindow], timeout: Optional[float] = None) -> List[bool]:
+        """Blocking variant of `submit()`."""
+        return self.submit(windows).result(timeout=timeout)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Inference scheduler started (rows={self.max_rows}, delay={self.max_delay * 1000:.0f}ms, "
+            f"queue={self.queue.maxsize})"
+        )
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the scheduler thread after running whatever is still queued."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        logger.info(f"Inference scheduler stopped: {self.stats()}")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            out = dict(self._counters)
+        out["queue_depth"] = self.queue.qsize()
+        out["mean_batch_windows"] = out["windows"] / out["batches"] if out["batches"] else 0.0
+        out["mean_wait_seconds"] = out["wait_seconds"] / out["requests"] if out["requests"] else 0.0
+        return out
+
+    def _rows(self, request: _Request, detector: Optional[SeizureDetector] = None) -> int:
+        detector = detector or self.detector
+        return sum(detector.input_rows(w) for w in request.windows)
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                first = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch = [first]
+            rows = self._rows(first)
+            deadline = first.enqueued + self.max_delay
+            while rows < self.max_rows:
+                remaining = deadline - time.monotonic()
+                try:
+                    request = self.queue.get_nowait() if remaining <= 0 else self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                rows += self._rows(request)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_Request]):
+        started = time.monotonic()
+        # One detector for the whole batch, even if a swap lands meanwhile
+        detector = self.detector
+        windows = [w for request in batch for w in request.windows]
+        try:
+            decisions = detector.predict_windows(windows)
+        except Exception as e:
+            self._incr("failed_batches")
+            logger.error(f"Batched seizure inference failed for {len(windows)} windows: {e}")
+            decisions = [False] * len(windows)
+
+        elapsed = time.monotonic() - started
+        waits = [started - request.enqueued for request in batch]
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["windows"] += len(windows)
+            self._counters["rows"] += sum(self._rows(request, detector) for request in batch)
+            self._counters["wait_seconds"] += sum(waits)
+            self._counters["max_wait_seconds"] = max(self._counters["max_wait_seconds"], *waits)
+
+        i = 0
+        for request in batch:
+            result = decisions[i: i + len(request.windows)]
+            i += len(request.windows)
+            if request.callback is not None:
+                try:
+                    request.callback(result, detector.version)
+                except Exception as e:
+                    logger.error(f"Seizure inference callback failed: {e}")
+            request.future.set_result(result)
+
+        if self._detector is None and model_manager.shadow is not None:
+            model_manager.score_shadow(windows, decisions, elapsed)
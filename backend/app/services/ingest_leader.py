@@ -0,0 +1,100 @@
+"""
+One MQTT ingest pipeline across `uvicorn --workers N`.
+
+Every worker runs an `IngestLeader`; the one that holds a Postgres session-level
+advisory lock runs ingest (MQTT consumption, detection, persistence, events) and
+publishes through the broadcast backend, the others only serve viewers. If the
+leader's process or lock connection dies the lock is released and another worker
+takes over on its next attempt. Without Postgres, or with `elect=False` (the
+in-process broadcast backend, where each worker serves only its own viewers),
+the worker just runs ingest.
+"""
+import logging
+import threading
+from typing import Callable, Optional
+
+from app.core.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INGEST_LOCK_KEY = 0x1E6E5700  # arbitrary, shared by every worker
+
+
+class IngestLeader:
+    def __init__(
+        self,
+        start_ingest: Callable[[], None],
+        stop_ingest: Callable[[], None],
+        database_url: Optional[str] = None,
+        retry_interval: float = 5.0,
+        elect: bool = True,
+    ):
+        self.start_ingest = start_ingest
+        self.stop_ingest = stop_ingest
+        self.database_url = database_url or settings.DATABASE_URL
+        self.retry_interval = retry_interval
+        self.elect = elect
+        self.leading = False
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not self.elect or not (self.database_url or "").startswith("postgresql"):
+            self._lead()
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ingest-leader", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self._follow()
+
+    def _lead(self):
+        try:
+            self.start_ingest()
+            self.leading = True
+        except Exception as e:
+            logger.error(f"MQTT ingest not started: {e}")
+            try:
+                self.stop_ingest()  # whatever did start
+            except Exception:
+                pass
+
+    def _follow(self):
+        if self.leading:
+            self.leading = False
+            try:
+                self.stop_ingest()
+            except Exception as e:
+                logger.error(f"Error stopping MQTT ingest: {e}")
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _run(self):
+        from app.websockets.broadcast import _libpq_dsn
+        import psycopg2
+
+        while not self._stop.is_set():
+            try:
+                if self._conn is None:
+                    self._conn = psycopg2.connect(_libpq_dsn(self.database_url))
+                    self._conn.autocommit = True
+                with self._conn.cursor() as cur:
+                    if self.leading:
+                        cur.execute("SELECT 1")  # the lock lives as long as this connection
+                    else:
+                        cur.execute("SELECT pg_try_advisory_lock(%s)", (INGEST_LOCK_KEY,))
+                        if cur.fetchone()[0]:
+                            logger.info("This worker holds the ingest lock and runs MQTT ingest")
+                            self._lead()
+            except Exception as e:
+                logger.error(f"Ingest lock connection lost: {e}")
+                self._follow()
+            self._stop.wait(self.retry_interval)
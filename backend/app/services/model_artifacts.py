@@ -0,0 +1,125 @@
+"""
+Memory-mappable seizure-model artifacts.
+
+An artifact is a directory holding a flattened forest (see NumpyForestBackend):
+
+    meta.json        format version, classes, feature count, sizes
+    feature.npy      one plain .npy file per array in NumpyForestBackend.ARRAYS
+    threshold.npy
+    ...
+
+Arrays are opened with `np.load(mmap_mode="r")`, so loading is near-instant and the
+pages are shared through the OS page cache by every process that maps the same
+files: N Uvicorn workers use about the memory of one, unlike N unpickled copies.
+
+Convert a pickled model with:
+
+    python -m app.services.model_artifacts export random_forest_model.pkl random_forest_model.forest
+"""
+import argparse
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Any, Dict
+
+import numpy as np
+
+from app.services.inference_backends import NumpyForestBackend
+
+FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = ".forest"
+
+
+def is_artifact(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "meta.json"))
+
+
+def save_forest(backend: NumpyForestBackend, path: str, **extra: Any) -> Dict[str, Any]:
+    """
+    Write `backend` to the artifact directory `path` and return the metadata. The new
+    artifact is written next to it and swapped in by renames: the old one is moved aside
+    first and restored if the swap fails. A reader never sees a partially written
+    artifact, though for an instant between the two renames it finds none. Processes
+    that already mapped the old arrays keep using them.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".forest-")
+    try:
+        for name, array in backend.arrays().items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "classes": backend.classes_.tolist(),
+            "n_features": backend.n_features_in_,
+            "n_trees": int(len(backend.roots)),
+            "n_nodes": int(len(backend.feature)),
+            **extra,
+        }
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    old = None
+    if os.path.isdir(path):
+        old = tempfile.mkdtemp(dir=parent, prefix=".forest-old-")
+        os.replace(path, old)
+    try:
+        os.replace(tmp, path)
+    except Exception:
+        if old is not None:
+            os.replace(old, path)
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+def read_meta(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+
+def load_forest(path: str, mmap: bool = True) -> NumpyForestBackend:
+    """Open an artifact; with `mmap` the arrays stay read-only mappings of the files."""
+    meta = read_meta(path)
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact version {meta.get('format_version')} in {path}")
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+        for name in NumpyForestBackend.ARRAYS
+    }
+    return NumpyForestBackend(arrays, np.asarray(meta["classes"]), int(meta["n_features"]))
+
+
+def export_pickle(pickle_path: str, path: str) -> Dict[str, Any]:
+    with open(pickle_path, "rb") as f:
+        model = pickle.load(f)
+    return save_forest(NumpyForestBackend.from_sklearn(model), path, source=os.path.basename(pickle_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert and inspect memory-mappable seizure-model artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="convert a pickled sklearn forest to an artifact directory")
+    export.add_argument("pickle_path")
+    export.add_argument("path", nargs="?", help="defaults to the pickle path with a .forest suffix")
+    info = sub.add_parser("info", help="print an artifact's metadata")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        path = args.path or os.path.splitext(args.pickle_path)[0] + ARTIFACT_SUFFIX
+        meta = export_pickle(args.pickle_path, path)
+        print(f"Wrote {path}")
+    else:
+        meta = read_meta(args.path)
+    print(json.dumps(meta, indent=2))
+
+
+if __name__ == "__main__":
+    main()
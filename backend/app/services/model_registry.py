@@ -0,0 +1,299 @@
+"""
+Versioned seizure-model registry and hot model swap.
+
+Each registered version is a directory under SEIZURE_MODEL_REGISTRY_DIR:
+
+    models/
+      ACTIVE                     name of the active version, replaced atomically
+      20261018-101500/
+        version.json             description, source, registration time, artifact metadata
+        model.pkl                the pickled sklearn model (kept for non-numpy backends)
+        model.forest/            memory-mapped artifact (see model_artifacts.py)
+
+`model_manager.activate(version)` loads and warms up the new detector before
+swapping it in with `swap_detector`, so live streams keep running on the old model
+until the new one is ready and never see a half-loaded one. Writing ACTIVE lets the
+other worker processes follow: each polls its mtime every SEIZURE_MODEL_WATCH_INTERVAL
+seconds, and editing ACTIVE by hand works the same way.
+
+A shadow version can be scored on the same batches as the active one without
+affecting detections; its agreement with the active model and its latency are
+reported by `shadow_stats()`.
+"""
+import json
+import logging
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.services.eeg_features import FeatureWindow
+from app.services.inference_backends import NumpyForestBackend
+from app.services.model_artifacts import ARTIFACT_SUFFIX, save_forest
+from app.services.seizure_detection import SeizureDetector, get_detector, swap_detector
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ACTIVE_FILE = "ACTIVE"
+VERSION_FILE = "version.json"
+PICKLE_FILE = "model.pkl"
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+
+class ModelRegistry:
+    """Model versions stored on disk; see the module docstring for the layout."""
+
+    def __init__(self, root: str = settings.SEIZURE_MODEL_REGISTRY_DIR):
+        self.root = root
+
+    def _path(self, version: str) -> str:
+        if not VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid model version '{version}'")
+        return os.path.join(self.root, version)
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.root):
+            return []
+        out = []
+        for name in sorted(os.listdir(self.root)):
+            info = self.get(name) if VERSION_PATTERN.match(name) else None
+            if info is not None:
+                out.append(info)
+        return out
+
+    def get(self, version: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._path(version), VERSION_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def register(self, model: Any, version: Optional[str] = None, description: str = "", **extra: Any) -> Dict[str, Any]:
+        """
+        Store a fitted sklearn model as a new version: its pickle plus, for tree
+        ensembles, a memory-mapped artifact. Versions are immutable once registered.
+        """
+        version = version or datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+        path = self._path(version)
+        if os.path.exists(path):
+            raise FileExistsError(f"Model version '{version}' already exists")
+        os.makedirs(self.root, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self.root, prefix=".register-")
+        try:
+            with open(os.path.join(tmp, PICKLE_FILE), "wb") as f:
+                pickle.dump(model, f)
+            info: Dict[str, Any] = {
+                "version": version,
+                "description": description,
+                "model_type": type(model).__name__,
+                "registered_at": datetime.now(timezone.utc).isoformat(),
+                **extra,
+            }
+            try:
+                artifact = os.path.join(tmp, os.path.splitext(PICKLE_FILE)[0] + ARTIFACT_SUFFIX)
+                info["artifact"] = save_forest(NumpyForestBackend.from_sklearn(model), artifact)
+            except TypeError as e:
+                logger.warning(f"Model version {version} has no artifact ({e})")
+            with open(os.path.join(tmp, VERSION_FILE), "w") as f:
+                json.dump(info, f, indent=2)
+            os.rename(tmp, path)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        logger.info(f"Registered seizure model version {version}")
+        return info
+
+    def register_pickle(
+        self, pickle_path: str, version: Optional[str] = None, description: str = "", source: Optional[str] = None
+    ) -> Dict[str, Any]:
+        with open(pickle_path, "rb") as f:
+            model = pickle.load(f)
+        return self.register(model, version, description, source=source or os.path.basename(pickle_path))
+
+    def active_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def active_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.root, ACTIVE_FILE)).st_mtime_ns
+        except OSError:
+            return None
+
+    def set_active(self, version: str) -> None:
+        self._path(version)
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".active-")
+        with os.fdopen(fd, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp, os.path.join(self.root, ACTIVE_FILE))
+
+    def load(self, version: str, backend: str = settings.SEIZURE_INFERENCE_BACKEND) -> SeizureDetector:
+        """Build and warm up a detector for `version`; raises if it cannot be loaded."""
+        if self.get(version) is None:
+            raise KeyError(f"Unknown model version '{version}'")
+        detector = SeizureDetector(os.path.join(self._path(version), PICKLE_FILE), backend, version=version)
+        if detector.backend is None:
+            raise ValueError(f"Model version '{version}' could not be loaded")
+        detector.warm_up()
+        return detector
+
+
+class ModelManager:
+    """Owns which registry version is live in this process, plus the optional shadow model."""
+
+    def __init__(self, registry: Optional[ModelRegistry] = None, watch_interval: float = settings.SEIZURE_MODEL_WATCH_INTERVAL):
+        self.registry = registry or ModelRegistry()
+        self.watch_interval = watch_interval
+        self.shadow: Optional[SeizureDetector] = None
+        self._lock = threading.Lock()
+        self._shadow_lock = threading.Lock()
+        self._shadow_stats: Dict[str, float] = {}
+        self._seen_mtime: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def active_version(self) -> Optional[str]:
+        return get_detector().version
+
+    def start(self) -> SeizureDetector:
+        """
+        Load the registry's active version, or the default SEIZURE_MODEL_PATH model when
+        there is none, and start following ACTIVE if SEIZURE_MODEL_WATCH_INTERVAL is set.
+        """
+        self._seen_mtime = self.registry.active_mtime()
+        version = self.registry.active_version()
+        detector = None
+        if version:
+            try:
+                detector = self.registry.load(version)
+                swap_detector(detector)
+            except Exception as e:
+                logger.error(f"Active model version {version} failed to load ({e}), using {settings.SEIZURE_MODEL_PATH}")
+        if detector is None:
+            detector = get_detector()
+            detector.warm_up()
+        if self.watch_interval > 0 and not (self._thread and self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._thread.start()
+        return detector
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.watch_interval + 1)
+            self._thread = None
+
+    def activate(self, version: str, persist: bool = True) -> Dict[str, Any]:
+        """
+        Hot-swap the live detector to `version`. The new model is loaded and warmed up
+        first; if that fails the current one stays active. With `persist`, ACTIVE is
+        updated so other workers and restarts follow.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            detector = self.registry.load(version)
+            previous = swap_detector(detector)
+            if persist:
+                self.registry.set_active(version)
+                self._seen_mtime = self.registry.active_mtime()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        old = previous.version if previous is not None else None
+        logger.info(f"Seizure model swapped {old or 'default'} -> {version} in {elapsed_ms:.0f} ms")
+        return {"version": version, "previous": old, "load_ms": round(elapsed_ms, 1)}
+
+    def _watch(self):
+        while not self._stop.wait(self.watch_interval):
+            mtime = self.registry.active_mtime()
+            if mtime is None or mtime == self._seen_mtime:
+                continue
+            self._seen_mtime = mtime
+            version = self.registry.active_version()
+            if not version or version == self.active_version:
+                continue
+            try:
+                self.activate(version, persist=False)
+            except Exception as e:
+                logger.error(f"Could not follow ACTIVE to model version {version}: {e}")
+
+    def set_shadow(self, version: str) -> Dict[str, Any]:
+        """Score `version` alongside the active model from the next batch on; resets shadow stats."""
+        detector = self.registry.load(version)
+        with self._shadow_lock:
+            self.shadow = detector
+            self._shadow_stats = {
+                "windows": 0,
+                "agreements": 0,
+                "shadow_positives": 0,
+                "active_positives": 0,
+                "batches": 0,
+                "failed_batches": 0,
+                "active_seconds": 0.0,
+                "shadow_seconds": 0.0,
+            }
+        logger.info(f"Shadow scoring seizure model version {version}")
+        return self.shadow_stats()
+
+    def clear_shadow(self) -> Dict[str, Any]:
+        stats = self.shadow_stats()
+        with self._shadow_lock:
+            self.shadow = None
+        return stats
+
+    def score_shadow(self, windows: Sequence[FeatureWindow], decisions: List[bool], active_seconds: float) -> None:
+        """Run the shadow model on a batch the active model just decided; never raises."""
+        shadow = self.shadow
+        if shadow is None:
+            return
+        started = time.perf_counter()
+        try:
+            shadow_decisions = shadow.predict_windows(windows)
+        except Exception as e:
+            logger.error(f"Shadow model {shadow.version} failed on {len(windows)} windows: {e}")
+            shadow_decisions = None
+        elapsed = time.perf_counter() - started
+        with self._shadow_lock:
+            if shadow is not self.shadow:
+                return
+            stats = self._shadow_stats
+            stats["batches"] += 1
+            if shadow_decisions is None:
+                stats["failed_batches"] += 1
+                return
+            stats["windows"] += len(windows)
+            stats["agreements"] += sum(a == b for a, b in zip(decisions, shadow_decisions))
+            stats["active_positives"] += sum(decisions)
+            stats["shadow_positives"] += sum(shadow_decisions)
+            stats["active_seconds"] += active_seconds
+            stats["shadow_seconds"] += elapsed
+
+    def shadow_stats(self) -> Dict[str, Any]:
+        with self._shadow_lock:
+            if self.shadow is None:
+                return {"shadow_version": None}
+            stats = dict(self._shadow_stats)
+            version = self.shadow.version
+        batches = stats["batches"] - stats["failed_batches"]
+        return {
+            "shadow_version": version,
+            "active_version": self.active_version,
+            **stats,
+            "agreement": stats["agreements"] / stats["windows"] if stats["windows"] else None,
+            "mean_active_batch_ms": stats["active_seconds"] * 1000 / batches if batches else None,
+            "mean_shadow_batch_ms": stats["shadow_seconds"] * 1000 / batches if batches else None,
+        }
+
+
+model_manager = ModelManager()
@@ -1,75 +1,254 @@
-import asyncio
 import json
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+from typing import Dict, Optional, Tuple
 
+import numpy as np
 import paho.mqtt.client as mqtt
-from sqlalchemy.orm import Session
 
-from app import crud, schemas
-from app.services.seizure_detection import detect_seizure
-from app.websockets.manager import manager
+from app import schemas
+from app.core.config import settings
+from app.services.eeg_frames import EEGFrame, FrameError, decode_frame, frame_patient_id, is_frame
+from app.services.eeg_writer import EEGWriter
+from app.services.inference_scheduler import InferenceScheduler
+from app.services.seizure_detection import StreamingSeizureDetector
+from app.services.seizure_events import SeizureEventWriter
+from app.websockets.broadcast import broadcast
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def shard_of(patient_id: int, shards: int) -> int:
+    """The ingest shard (0..shards-1) that owns a patient's stream."""
+    return patient_id % shards
+
+
+def _topic_patient_id(topic: str) -> Optional[int]:
+    # Per-patient topics: "<topic>/<patient_id>"
+    suffix = topic.rsplit("/", 1)[-1]
+    return int(suffix) if suffix.isdigit() else None
+
+
 class MQTTClient:
-    def __init__(self, host: str, port: int, db: Session, topic: str = "eeg/data"):
+    """
+    MQTT ingest: decoding, detection, persistence and live publishing of EEG messages.
+
+    paho's network thread only runs `on_message()`, which drops other shards'
+    patients when the topic or frame header says so and hands the rest to a bounded
+    queue. An ingest thread decodes and processes them (`process()`), so slow
+    detection or database work never delays the MQTT keepalive. The ingest path
+    never holds a database session: the writer and event stages open short-lived
+    ones per flush from the pooled engine (app/db/session.py).
+
+    When the queue is full, `on_message()` blocks for at most `put_timeout` seconds
+    and then drops the message, counting it in `stats()`.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        topic: str = "eeg/data",
+        writer: EEGWriter = None,
+        shard: Optional[Tuple[int, int]] = None,
+        max_queue: int = settings.MQTT_INGEST_QUEUE_SIZE,
+        put_timeout: float = settings.EEG_INGEST_PUT_TIMEOUT,
+    ):
         self.host = host
         self.port = port
-        self.db = db
         self.topic = topic
+        # (index, count): only handle patients with shard_of(patient_id, count) == index
+        self.shard = shard
+        self.put_timeout = put_timeout
+        self.queue: "queue.Queue[Tuple[str, bytes]]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            "received": 0,
+            "processed": 0,
+            "failed": 0,
+            "skipped": 0,
+            "overflows": 0,
+            "dropped": 0,
+            "frames_lost": 0,
+            "frames_duplicate": 0,
+            "sequence_resets": 0,
+        }
+        self.writer = writer or EEGWriter()
+        self.scheduler = InferenceScheduler()
+        self.events = SeizureEventWriter()
+        self.detector = StreamingSeizureDetector(scheduler=self.scheduler, events=self.events)
         self.client = mqtt.Client()
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
-        self.loop = None
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        # Last binary frame sequence number per (patient, device), to count lost frames
+        self._sequences: Dict[Tuple[int, int], int] = {}
+
+    def _incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counters)
+        out["queue_depth"] = self.queue.qsize()
+        return out
+
+    @property
+    def skipped(self) -> int:
+        return self.stats()["skipped"]
+
+    @property
+    def frames_lost(self) -> int:
+        return self.stats()["frames_lost"]
 
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             logger.info("Connected to MQTT Broker!")
-            self.client.subscribe(self.topic)
+            # The shared topic and per-patient "<topic>/<patient_id>" topics
+            self.client.subscribe([(self.topic, 0), (f"{self.topic}/+", 0)])
         else:
             logger.error(f"Failed to connect, return code {rc}\n")
 
+    def _owns(self, patient_id: int) -> bool:
+        if self.shard is None or shard_of(patient_id, self.shard[1]) == self.shard[0]:
+            return True
+        self._incr("skipped")
+        return False
+
     def on_message(self, client, userdata, msg):
+        """paho network thread: filter by shard where that is free, then hand off."""
+        self._incr("received")
+        topic_patient = _topic_patient_id(msg.topic) if self.shard is not None else None
+        if topic_patient is not None and not self._owns(topic_patient):
+            return
+        if topic_patient is None and self.shard is not None and is_frame(msg.payload):
+            try:
+                if not self._owns(frame_patient_id(msg.payload)):
+                    return
+            except FrameError:
+                pass  # reported by process()
+        item = (msg.topic, msg.payload)
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            self._incr("overflows")
         try:
-            eeg_data_in = schemas.EEGDataCreate(**json.loads(msg.payload.decode()))
-
-            # Perform seizure detection on the incoming data
-            is_seizure = detect_seizure(eeg_data_in.channel_data)
-            
-            # Send live data to the specific patient's websocket
-            patient_id = eeg_data_in.patient_id
-            eeg_data_dict = eeg_data_in.model_dump()
-            eeg_data_dict['timestamp'] = eeg_data_dict['timestamp'].isoformat()
-            eeg_data_dict['seizure_detected'] = is_seizure  # Add seizure detection result
-            
-            # Schedule the coroutine in the existing event loop without blocking
-            if self.loop and not self.loop.is_closed():
-                asyncio.run_coroutine_threadsafe(
-                    manager.send_to_patient(eeg_data_dict, patient_id),
-                    self.loop
-                )
+            self.queue.put(item, timeout=self.put_timeout)
+        except queue.Full:
+            self._incr("dropped")
 
+    def process(self, topic: str, payload: bytes):
+        """Decode one MQTT message and handle it (ingest thread)."""
+        if is_frame(payload):
+            try:
+                self.on_frame(decode_frame(payload))
+                self._incr("processed")
+            except FrameError as e:
+                self._incr("failed")
+                logger.error(f"Invalid EEG frame: {e}")
+            except Exception as e:
+                self._incr("failed")
+                logger.error(f"Error processing frame: {e}")
+            return
+        try:
+            data = json.loads(payload.decode())
+            # Sharded on the shared topic: JSON only says whose it is once parsed
+            if self.shard is not None and _topic_patient_id(topic) is None and not self._owns(int(data["patient_id"])):
+                return
+            if "samples" in data:
+                # Block message: {"patient_id", "timestamp", "sample_rate", "samples": [[...], ...]}
+                block = schemas.EEGBlockCreate(**data)
+            else:
+                # Legacy single-sample message
+                block = schemas.EEGBlockCreate.from_sample(schemas.EEGDataCreate(**data))
+            self.on_block(block)
+            self._incr("processed")
         except Exception as e:
+            self._incr("failed")
             logger.error(f"Error processing message: {e}")
 
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                topic, payload = self.queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            self.process(topic, payload)
+
+    def on_frame(self, frame: EEGFrame):
+        """A binary frame (eeg_frames.py): checks its samples and sequence number, then handles it as a block."""
+        # The one check pydantic would make that the frame layout does not (as EEGBlockCreate)
+        if not np.isfinite(frame.samples).all():
+            raise FrameError("samples must be finite")
+        patient_id = frame.patient_id
+        key = (patient_id, frame.device_id)
+        last = self._sequences.get(key)
+        if last is not None:
+            # Forward distance modulo 2**32: a gap below 2**31 is lost frames, 0 a redelivery,
+            # anything else a backward jump, i.e. the device restarted its sequence
+            ahead = (frame.sequence - last) & 0xFFFFFFFF
+            if ahead == 0:
+                self._incr("frames_duplicate")
+                logger.debug(f"Patient {patient_id} device {frame.device_id}: duplicate EEG frame #{frame.sequence}")
+                return
+            if ahead >= 1 << 31:
+                self._incr("sequence_resets")
+                logger.info(f"Patient {patient_id} device {frame.device_id}: EEG frame sequence restarted at #{frame.sequence}")
+            elif ahead > 1:
+                self._incr("frames_lost", ahead - 1)
+                logger.warning(f"Patient {patient_id} device {frame.device_id}: {ahead - 1} EEG frame(s) lost before #{frame.sequence}")
+        self._sequences[key] = frame.sequence
+
+        # Otherwise validated by the frame layout, so skip pydantic validation
+        self.on_block(schemas.EEGBlockCreate.model_construct(
+            patient_id=patient_id, timestamp=frame.timestamp, sample_rate=frame.sample_rate, samples=frame.samples,
+        ))
+
+    def on_block(self, block: schemas.EEGBlockCreate):
+        """
+        One block of samples, whatever its wire format: persisted, detected on and
+        published to the patient's live viewers as a unit.
+        """
+        patient_id = block.patient_id
+
+        # Hand off to the batched writer; never touches the DB on this thread
+        self.writer.submit(block)
+
+        # Windowed seizure detection: the model runs once per hop, not per sample
+        is_seizure = self.detector.push(patient_id, block.samples, block.end_timestamp)
+
+        # To every API worker's viewers of the patient, coalesced there at LIVE_EEG_FLUSH_HZ
+        broadcast.publish_samples(
+            patient_id, block.timestamp, block.sample_rate, block.samples,
+            is_seizure, self.detector.model_version(patient_id),
+        )
+
     def start(self):
-        # Get the running event loop
-        try:
-            self.loop = asyncio.get_running_loop()
-        except RuntimeError:
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
-        
+        self.writer.start()
+        self.scheduler.start()
+        self.events.start()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mqtt-ingest", daemon=True)
+            self._thread.start()
         self.client.connect(self.host, self.port)
         self.client.loop_start()
         logger.info(f"MQTT Client started and subscribed to {self.topic}")
 
-    def stop(self):
+    def stop(self, timeout: float = 10.0):
         self.client.loop_stop()
         self.client.disconnect()
-        self.executor.shutdown(wait=True)
-        logger.info("MQTT Client stopped")
+        # Process what was already received, then stop the stages it feeds
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self.writer.stop()
+        self.scheduler.stop()
+        self.events.stop()
+        logger.info(f"MQTT Client stopped: {self.stats()}")
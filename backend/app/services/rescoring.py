@@ -0,0 +1,456 @@
+"""
+Offline re-scoring of stored EEG history with the seizure model.
+
+Usage:
+    python -m app.services.rescoring [--patient-id 1 ...] [--model-version v2] [--start ISO] [--end ISO]
+                                     [--workers 8] [--chunk-seconds 300] [--restart]
+
+Each patient's history is streamed from the database in time order through a
+server-side cursor, cut into chunks of `--chunk-seconds`, and the chunks are scored
+in a process pool: sliding windows and features exactly as the live stream computes
+them (SEIZURE_WINDOW_SECONDS / SEIZURE_HOP_SECONDS), then one batched model call per
+chunk. Window decisions go through the same event state machine as live detection
+(seizure_events.py) and every event is written to `notable_sessions`, tagged in
+`notes` with the model that found it.
+
+Progress is checkpointed to a JSON file after every chunk, so an interrupted run
+resumes where it stopped when started again with the same arguments. Re-running a
+finished job is a no-op; `--restart` scores it again and replaces its sessions.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import create_engine, delete, insert, text
+
+from app.core.config import settings
+from app.models.models import Session as NotableSession
+from app.services.seizure_events import END, SeizureSegmenter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Samples as (microseconds since epoch, channel voltages), oldest first
+WIDE_SAMPLES_SQL = """
+SELECT CAST(extract(epoch FROM time) * 1000000 AS BIGINT) AS t_us, channel_data
+FROM eeg_samples
+WHERE patient_id = :patient_id {time_filter}
+ORDER BY time
+"""
+
+NARROW_SAMPLES_SQL = """
+SELECT CAST(extract(epoch FROM time) * 1000000 AS BIGINT) AS t_us, array_agg(voltage_mv ORDER BY channel_id)
+FROM eeg_data
+WHERE patient_id = :patient_id {time_filter}
+GROUP BY time
+ORDER BY time
+"""
+
+Block = Tuple[np.ndarray, np.ndarray]  # (t_us (n,), samples (n, channels))
+
+
+def to_datetime(t_us: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(t_us))
+
+
+def to_us(dt: datetime) -> int:
+    dt = dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+    return (dt - EPOCH) // timedelta(microseconds=1)
+
+
+def read_blocks(
+    engine, patient_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None, block_rows: int = 50_000
+) -> Iterator[Block]:
+    """Stream a patient's samples in time order, `block_rows` at a time, over a server-side cursor."""
+    time_filter = ""
+    params: Dict[str, Any] = {"patient_id": patient_id}
+    if start is not None:
+        time_filter += " AND time >= :start"
+        params["start"] = start
+    if end is not None:
+        time_filter += " AND time < :end"
+        params["end"] = end
+    sql = WIDE_SAMPLES_SQL if settings.EEG_STORAGE_LAYOUT == "wide" else NARROW_SAMPLES_SQL
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=block_rows).execute(
+            text(sql.format(time_filter=time_filter)), params
+        )
+        for rows in result.partitions(block_rows):
+            t_us = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            yield t_us, np.asarray([row[1] for row in rows], dtype=np.float64)
+
+
+# Per-process state of pool workers, set by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(model_version: Optional[str], model_path: str, backend: str) -> None:
+    # Imported here so the parent process never loads a model it does not use
+    from app.services.eeg_features import StreamingFeatureEngine
+    from app.services.model_registry import ModelRegistry
+    from app.services.seizure_detection import SeizureDetector
+
+    logging.getLogger("app.services.seizure_detection").setLevel(logging.WARNING)
+    if model_version:
+        detector = ModelRegistry().load(model_version, backend)
+    else:
+        detector = SeizureDetector(model_path, backend)
+    engine = StreamingFeatureEngine()
+    _worker.update(detector=detector, window=engine.window, hop=engine.hop, fs=engine.fs)
+
+
+def _score_chunk(t_us: np.ndarray, samples: np.ndarray, offset: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Score the windows that end inside this chunk. `offset` is the stream index of
+    samples[0]; windows end at every multiple of the hop, like the live engine's, and
+    the chunk starts with window - hop samples of context from the previous one.
+    Windows spanning a recording gap are skipped. Returns the start and end time of
+    each scored window's hop and its decision.
+    """
+    from app.services.eeg_features import FeatureWindow, window_features
+
+    detector, window, hop, fs = _worker["detector"], _worker["window"], _worker["hop"], _worker["fs"]
+    first = -(-(offset + window) // hop) * hop
+    ends = np.arange(first, offset + len(samples) + 1, hop) - offset
+    if not len(ends):
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, bool)
+    starts = ends - window
+    max_span_us = (window - 1) / fs * 1.5e6
+    ends = ends[t_us[ends - 1] - t_us[starts] <= max_span_us]
+    if not len(ends):
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, bool)
+    starts = ends - window
+
+    decisions: List[bool] = []
+    views = np.lib.stride_tricks.sliding_window_view(samples, window, axis=0)  # (n, channels, window)
+    for i in range(0, len(starts), 256):
+        batch = views[starts[i: i + 256]].transpose(0, 2, 1)
+        if detector.uses_window_features(samples.shape[1]):
+            features = window_features(batch, fs)
+        else:
+            features = np.empty((len(batch), 0))
+        decisions += detector.predict_windows(
+            [FeatureWindow(0, w, f, hop) for w, f in zip(batch, features)]
+        )
+    return t_us[ends - hop], t_us[ends - 1], np.asarray(decisions, dtype=bool)
+
+
+class _Checkpoint:
+    """Job progress in a JSON file, replaced atomically after every chunk."""
+
+    def __init__(self, path: str, job: Dict[str, Any]):
+        self.path = path
+        self.state: Dict[str, Any] = {"job": job, "patients": {}}
+        if os.path.isfile(path):
+            with open(path) as f:
+                self.state = json.load(f)
+            if self.state.get("job") != job:
+                raise ValueError(f"Checkpoint {path} belongs to a different re-scoring job: {self.state.get('job')}")
+
+    def patient(self, patient_id: int) -> Optional[Dict[str, Any]]:
+        return self.state["patients"].get(str(patient_id))
+
+    def save(self, patient_id: int, progress: Dict[str, Any]) -> None:
+        self.state["patients"][str(patient_id)] = progress
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), prefix=".checkpoint-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+
+class RescoreJob:
+    """
+    Re-score stored EEG of some or all patients with one model over one time range.
+    See the module docstring for the pipeline.
+    """
+
+    def __init__(
+        self,
+        model_version: Optional[str] = None,
+        model_path: str = settings.SEIZURE_MODEL_PATH,
+        backend: str = settings.SEIZURE_INFERENCE_BACKEND,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        workers: Optional[int] = None,
+        chunk_seconds: float = 300.0,
+        segmenter: Optional[SeizureSegmenter] = None,
+        checkpoint_path: Optional[str] = None,
+        db_url: Optional[str] = None,
+    ):
+        from app.services.eeg_features import StreamingFeatureEngine
+
+        self.model_version = model_version
+        self.model_path = model_path
+        self.backend = backend
+        self.start = start
+        self.end = end
+        self.workers = workers or os.cpu_count() or 1
+        self.segmenter = segmenter or SeizureSegmenter()
+        geometry = StreamingFeatureEngine()
+        self.window, self.hop, self.fs = geometry.window, geometry.hop, geometry.fs
+        self.context = self.window - self.hop
+        self.chunk = max(1, int(chunk_seconds * self.fs) // self.hop) * self.hop
+        self.db_url = db_url or settings.DATABASE_URL
+        self.model_label = model_version or os.path.basename(model_path)
+        self.notes = f"Seizure detected by model {self.model_label} (offline re-scoring)"
+        job = {
+            "model": self.model_label,
+            "start": start.isoformat() if start else None,
+            "end": end.isoformat() if end else None,
+            "window": self.window,
+            "hop": self.hop,
+            # Saved segmenter states are only valid under the settings that produced them
+            "segmenter": {
+                "on_windows": self.segmenter.on_windows,
+                "off_windows": self.segmenter.off_windows,
+                "min_seconds": self.segmenter.min_seconds,
+                "merge_gap_seconds": self.segmenter.merge_gap,
+            },
+        }
+        if checkpoint_path is None:
+            key = hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()[:12]
+            checkpoint_path = os.path.join(settings.RESCORE_CHECKPOINT_DIR, f"{self.model_label}-{key}.json")
+        self.checkpoint = _Checkpoint(checkpoint_path, job)
+        self._engine = None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = create_engine(self.db_url, pool_pre_ping=True)
+        return self._engine
+
+    def patient_ids(self) -> List[int]:
+        with self.engine.connect() as conn:
+            return [row[0] for row in conn.execute(text("SELECT id FROM patients ORDER BY id"))]
+
+    def run(self, patient_ids: Optional[Iterable[int]] = None, restart: bool = False) -> Dict[str, Any]:
+        patient_ids = list(patient_ids) if patient_ids is not None else self.patient_ids()
+        totals = {"patients": 0, "samples": 0, "windows": 0, "events": 0, "seconds": 0.0}
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(self.model_version, self.model_path, self.backend),
+        ) as pool:
+            for patient_id in patient_ids:
+                progress = self.checkpoint.patient(patient_id)
+                if progress and progress["done"] and not restart:
+                    logger.info(f"Patient {patient_id}: already re-scored with {self.model_label}, skipping")
+                    continue
+                resume = None if restart else progress
+                blocks = read_blocks(
+                    self.engine, patient_id, to_datetime(resume["resume_us"]) if resume else self.start, self.end
+                )
+                result = self.rescore_patient(pool, patient_id, blocks, resume)
+                totals["patients"] += 1
+                for key in ("samples", "windows", "events", "seconds"):
+                    totals[key] += result[key]
+        totals["samples_per_second"] = totals["samples"] / totals["seconds"] if totals["seconds"] else 0.0
+        logger.info(f"Re-scoring with {self.model_label} finished: {totals}")
+        return totals
+
+    def _chunks(self, blocks: Iterable[Block], offset: int, carry: int) -> Iterator[Tuple[np.ndarray, np.ndarray, int]]:
+        """
+        Cut the block stream into (t_us, samples, offset) chunks of `self.chunk` new samples,
+        each prefixed with the previous chunk's last window - hop samples. The first
+        `carry` samples of the stream are context already scored before a resume.
+        """
+        pending_t: List[np.ndarray] = []
+        pending_x: List[np.ndarray] = []
+        size = 0
+        for t_us, samples in blocks:
+            pending_t.append(t_us)
+            pending_x.append(samples)
+            size += len(t_us)
+            while size - carry >= self.chunk:
+                t_all, x_all = np.concatenate(pending_t), np.concatenate(pending_x)
+                n = carry + self.chunk
+                yield t_all[:n], x_all[:n], offset
+                keep = n - min(self.context, n)
+                pending_t, pending_x = [t_all[keep:]], [x_all[keep:]]
+                offset += keep
+                carry = n - keep
+                size = len(pending_t[0])
+        if size > carry:
+            yield np.concatenate(pending_t), np.concatenate(pending_x), offset
+
+    def rescore_patient(
+        self, pool: ProcessPoolExecutor, patient_id: int, blocks: Iterable[Block], resume: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Score one patient's block stream and write its sessions; `resume` is its checkpoint entry."""
+        if resume is None:
+            self._delete_sessions(patient_id)
+            progress = {
+                "done": False, "offset": 0, "carry": 0, "resume_us": to_us(self.start) if self.start else 0,
+                "scored_until_us": None, "segmenter": None, "samples": 0, "windows": 0, "events": 0, "seconds": 0.0,
+            }
+        else:
+            progress = dict(resume)
+            if progress["scored_until_us"] is not None:
+                # Sessions written after the last checkpoint would be written again
+                self._delete_sessions(patient_id, from_us=self._resume_floor_us(progress))
+            logger.info(f"Patient {patient_id}: resuming from {to_datetime(progress['resume_us']).isoformat()}")
+
+        started = time.monotonic() - progress["seconds"]
+        last_log = time.monotonic()
+        # (future, new samples, then where the next chunk starts: offset, context samples, time)
+        in_flight: Deque[Tuple[Future, int, int, int, int]] = deque()
+
+        def collect():
+            future, new_samples, next_offset, next_carry, next_resume_us = in_flight.popleft()
+            starts, ends, decisions = future.result()
+            closed = self._segment(patient_id, progress, starts, ends, decisions)
+            self._write_sessions(patient_id, closed)
+            progress.update(offset=next_offset, carry=next_carry, resume_us=next_resume_us)
+            progress["samples"] += new_samples
+            progress["windows"] += len(decisions)
+            progress["events"] += len(closed)
+            if len(ends):
+                progress["scored_until_us"] = int(ends[-1])
+            progress["seconds"] = time.monotonic() - started
+            self.checkpoint.save(patient_id, progress)
+
+        carry = progress["carry"]
+        for t_us, samples, offset in self._chunks(blocks, progress["offset"], carry):
+            keep = len(t_us) - min(self.context, len(t_us))
+            resume_us = int(t_us[keep]) if keep < len(t_us) else int(t_us[-1]) + 1
+            future = pool.submit(_score_chunk, t_us, samples, offset)
+            in_flight.append((future, len(t_us) - carry, offset + keep, len(t_us) - keep, resume_us))
+            carry = len(t_us) - keep
+            while len(in_flight) >= 2 * self.workers:
+                collect()
+            if time.monotonic() - last_log >= 10:
+                last_log = time.monotonic()
+                rate = progress["samples"] / max(time.monotonic() - started, 1e-9)
+                logger.info(f"Patient {patient_id}: {progress['samples']:,} samples, {rate:,.0f} samples/s")
+        while in_flight:
+            collect()
+
+        # The stream has ended: an event still open is complete
+        closed = self._segment(patient_id, progress, np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, bool), True)
+        self._write_sessions(patient_id, closed)
+        progress["events"] += len(closed)
+        progress["done"] = True
+        progress["seconds"] = time.monotonic() - started
+        self.checkpoint.save(patient_id, progress)
+        rate = progress["samples"] / progress["seconds"] if progress["seconds"] else 0.0
+        logger.info(
+            f"Patient {patient_id}: {progress['samples']:,} samples, {progress['windows']:,} windows, "
+            f"{progress['events']} events in {progress['seconds']:.1f}s ({rate:,.0f} samples/s)"
+        )
+        return progress
+
+    def _segment(
+        self, patient_id: int, progress: Dict[str, Any], starts: np.ndarray, ends: np.ndarray, decisions: np.ndarray,
+        final: bool = False,
+    ) -> List[Tuple[int, int]]:
+        """
+        Run one chunk of window decisions through the same event state machine as live
+        detection, continuing from the checkpointed state. Returns the ended events in µs.
+        """
+        self.segmenter.restore(patient_id, progress["segmenter"])
+        transitions = []
+        for start, end, positive in zip(starts.tolist(), ends.tolist(), decisions.tolist()):
+            transitions += self.segmenter.update(patient_id, start / 1e6, end / 1e6, positive, self.model_label)
+        if final:
+            transitions += self.segmenter.finish(patient_id)
+        progress["segmenter"] = self.segmenter.state(patient_id)
+        return [(round(event.start * 1e6), round(event.end * 1e6)) for kind, event in transitions if kind == END]
+
+    @staticmethod
+    def _resume_floor_us(progress: Dict[str, Any]) -> int:
+        """
+        Earliest start of a session that can have been written after this checkpoint: the
+        checkpointed open event's (or pending onset run's) start, since it may have been
+        closed and written in the next chunk, else the first window after `scored_until_us`.
+        Sessions written before the checkpoint all ended before that.
+        """
+        state = progress["segmenter"] or {}
+        if state.get("start") is not None:
+            return round(state["start"] * 1e6)
+        if state.get("positives") and state.get("run_start") is not None:
+            return round(state["run_start"] * 1e6)
+        return progress["scored_until_us"] + 1
+
+    def _write_sessions(self, patient_id: int, intervals: List[Tuple[int, int]]) -> None:
+        if not intervals:
+            return
+        rows = []
+        for start_us, end_us in intervals:
+            # notable_sessions holds naive UTC timestamps
+            rows.append({
+                "patient_id": patient_id,
+                "start_time": to_datetime(start_us).replace(tzinfo=None),
+                "end_time": to_datetime(end_us).replace(tzinfo=None),
+                "duration": (end_us - start_us) / 1e6,
+                "notes": self.notes,
+            })
+        with self.engine.begin() as conn:
+            conn.execute(insert(NotableSession.__table__), rows)
+
+    def _delete_sessions(self, patient_id: int, from_us: Optional[int] = None) -> None:
+        """Remove this job's sessions for a patient, or those starting at `from_us` or later, so re-runs replace them."""
+        table = NotableSession.__table__
+        stmt = delete(table).where(table.c.patient_id == patient_id, table.c.notes == self.notes)
+        if self.start is not None:
+            stmt = stmt.where(table.c.end_time >= to_datetime(to_us(self.start)).replace(tzinfo=None))
+        if self.end is not None:
+            stmt = stmt.where(table.c.start_time < to_datetime(to_us(self.end)).replace(tzinfo=None))
+        if from_us is not None:
+            stmt = stmt.where(table.c.start_time >= to_datetime(from_us).replace(tzinfo=None))
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+
+def _parse_time(value: str) -> datetime:
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored EEG history with the seizure model")
+    parser.add_argument("--patient-id", type=int, action="append", help="repeatable; default: every patient")
+    parser.add_argument("--model-version", help="registry version (model_registry.py); default: SEIZURE_MODEL_PATH")
+    parser.add_argument("--model-path", default=settings.SEIZURE_MODEL_PATH)
+    parser.add_argument("--backend", default=settings.SEIZURE_INFERENCE_BACKEND)
+    parser.add_argument("--start", type=_parse_time)
+    parser.add_argument("--end", type=_parse_time)
+    parser.add_argument("--workers", type=int, help="scoring processes; default: one per CPU")
+    parser.add_argument("--chunk-seconds", type=float, default=300.0)
+    parser.add_argument("--merge-gap-seconds", type=float, default=settings.SEIZURE_EVENT_MERGE_GAP_SECONDS)
+    parser.add_argument("--min-duration-seconds", type=float, default=settings.SEIZURE_EVENT_MIN_SECONDS)
+    parser.add_argument("--checkpoint", help="checkpoint file; default: derived from the model and time range")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and score everything again")
+    args = parser.parse_args()
+    job = RescoreJob(
+        model_version=args.model_version,
+        model_path=args.model_path,
+        backend=args.backend,
+        start=args.start,
+        end=args.end,
+        workers=args.workers,
+        chunk_seconds=args.chunk_seconds,
+        segmenter=SeizureSegmenter(
+            min_seconds=args.min_duration_seconds, merge_gap_seconds=args.merge_gap_seconds
+        ),
+        checkpoint_path=args.checkpoint,
+    )
+    job.run(args.patient_id, restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
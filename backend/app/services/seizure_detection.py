@@ -1,44 +1,104 @@
 import logging
 import pickle
 import os
+from datetime import datetime
+from functools import partial
 import numpy as np
-from typing import List, Union, Dict
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union, Dict
+
+from app.core.config import settings
+from app.services.eeg_features import FEATURE_NAMES, FeatureWindow, StreamingFeatureEngine, window_features
+from app.services.inference_backends import AutoBackend, SklearnBackend, load_backend
+from app.services.model_artifacts import ARTIFACT_SUFFIX, is_artifact, load_forest
+
+if TYPE_CHECKING:
+    from app.services.inference_scheduler import InferenceScheduler
+    from app.services.seizure_events import SeizureEventWriter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Inputs of the legacy per-sample model: the first 20 channel readings
+SAMPLE_FEATURES = 20
+# Fraction of a hop's samples the per-sample model must flag to flag the window
+SAMPLE_VOTE = 0.5
+
+
+def _load_sklearn(path: str) -> SklearnBackend:
+    """The pickled model, for the large batches of an auto backend serving from an artifact."""
+    with open(path, 'rb') as f:
+        backend = SklearnBackend(pickle.load(f))
+    logger.info(f"Loaded {path} for large batches")
+    return backend
+
 
 class SeizureDetector:
     """
     Seizure detection using a trained Random Forest model.
-    Loads the model once and reuses it for predictions.
+    Loads the model once and reuses it for predictions, run through the
+    configured inference backend (see inference_backends.py).
     """
     
-    def __init__(self, model_path: str = 'random_forest_model.pkl'):
+    def __init__(
+        self,
+        model_path: str = settings.SEIZURE_MODEL_PATH,
+        backend: str = settings.SEIZURE_INFERENCE_BACKEND,
+        version: Optional[str] = None,
+    ):
         self.model = None
+        self.backend = None
+        self.backend_name = backend
         self.model_path = model_path
+        # Registry version (see model_registry.py); None for a model loaded straight from a file
+        self.version = version
         self._load_model()
     
     def _load_model(self):
-        """Load the trained Random Forest model from pickle file."""
+        """
+        Load the trained Random Forest model. A memory-mapped artifact (model_artifacts.py),
+        given directly or found next to the pickle with a .forest suffix, is preferred
+        for the numpy and auto backends; with auto, the pickle is only unpickled on the
+        first large batch. Without an artifact the pickle file is loaded.
+        """
         try:
-            # Try absolute path first
-            if os.path.exists(self.model_path):
-                with open(self.model_path, 'rb') as f:
-                    self.model = pickle.load(f)
-                logger.info(f"Successfully loaded model from {self.model_path}")
-            else:
-                # Try relative to backend directory
-                backend_path = os.path.join('backend', self.model_path)
-                if os.path.exists(backend_path):
-                    with open(backend_path, 'rb') as f:
-                        self.model = pickle.load(f)
-                    logger.info(f"Successfully loaded model from {backend_path}")
-                else:
-                    logger.warning(f"Model file not found at {self.model_path}, using fallback detection")
+            # Try the path as given first, then relative to the backend directory
+            for path in (self.model_path, os.path.join('backend', self.model_path)):
+                artifact = path if is_artifact(path) else os.path.splitext(path)[0] + ARTIFACT_SUFFIX
+                if is_artifact(artifact) and (self.backend_name in ("numpy", "auto") or not os.path.isfile(path)):
+                    forest = load_forest(artifact)
+                    if self.backend_name == "auto" and os.path.isfile(path):
+                        self.set_backend(AutoBackend(forest, load_large=partial(_load_sklearn, path)))
+                    else:
+                        self.set_backend(forest)
+                    logger.info(f"Successfully mapped model artifact {artifact}")
+                    return
+                if os.path.isfile(path):
+                    with open(path, 'rb') as f:
+                        self.set_model(pickle.load(f))
+                    logger.info(f"Successfully loaded model from {path}")
+                    return
+            logger.warning(f"Model file not found at {self.model_path}, using fallback detection")
         except Exception as e:
             logger.error(f"Error loading model: {e}, using fallback detection")
-            self.model = None
+        self.set_model(None)
+
+    def set_model(self, model) -> None:
+        """Use `model` (a fitted classifier, or None for fallback detection) from now on."""
+        self.model = model
+        self.backend = load_backend(model, self.backend_name) if model is not None else None
+        if self.backend is not None:
+            logger.info(f"Seizure model running on the {self.backend.name} backend")
+
+    def set_backend(self, backend) -> None:
+        """Use an already-built inference backend, e.g. one mapped from an artifact."""
+        self.model = None
+        self.backend = backend
+        logger.info(f"Seizure model running on the {backend.name} backend")
+
+    def warm_up(self) -> None:
+        """Run one prediction so first-message latency does not include lazy setup or page faults."""
+        if self.backend is not None and self.n_features_in:
+            self.backend.predict(np.zeros((1, self.n_features_in)))
     
     def extract_features(self, eeg_data: Union[List[float], Dict, np.ndarray]) -> np.ndarray:
         """
@@ -96,8 +156,8 @@ class SeizureDetector:
             features = self.extract_features(eeg_data)
             
             # Use ML model if available
-            if self.model is not None:
-                prediction = self.model.predict(features)[0]
+            if self.backend is not None:
+                prediction = self.backend.predict(features)[0]
                 is_seizure = bool(prediction == 1)
                 
                 if is_seizure:
@@ -112,6 +172,77 @@ class SeizureDetector:
             logger.error(f"Error in seizure prediction: {e}")
             return False
     
+    @property
+    def n_features_in(self) -> Optional[int]:
+        return getattr(self.backend, "n_features_in_", None)
+
+    def _sample_rows(self, samples: np.ndarray) -> np.ndarray:
+        """Pad or truncate (n, channels) samples to the per-sample model's 20 inputs."""
+        rows = np.zeros((len(samples), SAMPLE_FEATURES))
+        n = min(SAMPLE_FEATURES, samples.shape[1])
+        rows[:, :n] = samples[:, :n]
+        return rows
+
+    def uses_window_features(self, n_channels: int) -> bool:
+        """Whether the model takes window features for windows of `n_channels` channels."""
+        return self.backend is not None and n_channels * len(FEATURE_NAMES) == self.n_features_in
+
+    def input_rows(self, window: FeatureWindow) -> int:
+        """Model rows `predict_windows` uses for this window."""
+        if self.backend is None or self.uses_window_features(window.samples.shape[1]):
+            return 1
+        return window.hop
+
+    def predict_windows(self, windows: Sequence[FeatureWindow]) -> List[bool]:
+        """
+        Classify sliding windows with one model call for all of them.
+
+        A model trained on window features (n_features_in_ equal to the window's feature
+        count) gets one row per window; windows pushed without features get them computed
+        here. The per-sample model gets every new sample of each window's hop, and flags
+        the window when at least SAMPLE_VOTE of them are.
+
+        Args:
+            windows: FeatureWindow objects from StreamingFeatureEngine, any mix of patients
+
+        Returns:
+            One seizure decision per window, in order
+        """
+        if not windows:
+            return []
+        try:
+            if self.backend is None:
+                return [self._fallback_detection(w.samples[-w.hop:]) for w in windows]
+
+            out = [False] * len(windows)
+            windowed = [i for i, w in enumerate(windows) if self.uses_window_features(w.samples.shape[1])]
+            if windowed:
+                features = [windows[i].features for i in windowed]
+                missing = [j for j, f in enumerate(features) if len(f) != self.n_features_in]
+                if missing:
+                    computed = window_features(np.stack([windows[windowed[j]].samples for j in missing]))
+                    for j, row in zip(missing, computed):
+                        features[j] = row
+                labels = self.backend.predict(np.vstack(features))
+                for i, label in zip(windowed, labels):
+                    out[i] = bool(label == 1)
+
+            per_sample = [i for i, w in enumerate(windows) if not self.uses_window_features(w.samples.shape[1])]
+            if per_sample:
+                rows = [self._sample_rows(windows[i].samples[-windows[i].hop:]) for i in per_sample]
+                sizes = np.array([len(r) for r in rows])
+                labels = (self.backend.predict(np.vstack(rows)) == 1).astype(np.float64)
+                votes = np.add.reduceat(labels, np.concatenate([[0], np.cumsum(sizes)[:-1]])) / sizes
+                for i, vote in zip(per_sample, votes):
+                    out[i] = bool(vote >= SAMPLE_VOTE)
+
+            if any(out):
+                logger.info(f"Seizure detected by ML model in {sum(out)} of {len(out)} windows")
+            return out
+        except Exception as e:
+            logger.error(f"Error in windowed seizure prediction: {e}")
+            return [False] * len(windows)
+
     def _fallback_detection(self, features: np.ndarray) -> bool:
         """
         Simple fallback detection when ML model is not available.
@@ -136,6 +267,85 @@ def get_detector() -> SeizureDetector:
     return _detector_instance
 
 
+def swap_detector(detector: SeizureDetector) -> Optional[SeizureDetector]:
+    """
+    Atomically replace the global detector. Callers already holding the old one finish
+    their current batch with it; every later get_detector() returns the new one.
+    """
+    global _detector_instance
+    previous, _detector_instance = _detector_instance, detector
+    return previous
+
+
+class StreamingSeizureDetector:
+    """
+    Sliding-window seizure detection over live samples.
+    Samples are buffered per patient and the model runs once per hop
+    (SEIZURE_HOP_SECONDS) on the last SEIZURE_WINDOW_SECONDS, not once per sample.
+    With a `scheduler`, windows are batched with other patients' and the decision
+    is applied when the batch completes, a few milliseconds later.
+    Without an explicit `detector`, the current global one is used, so a hot swap
+    (swap_detector) takes effect on the next window. With `events`, every window
+    decision also feeds the seizure event state machine (seizure_events.py).
+    """
+
+    def __init__(
+        self,
+        detector: Optional[SeizureDetector] = None,
+        engine: Optional[StreamingFeatureEngine] = None,
+        scheduler: Optional["InferenceScheduler"] = None,
+        events: Optional["SeizureEventWriter"] = None,
+    ):
+        self._detector = detector
+        self.engine = engine or StreamingFeatureEngine()
+        self.scheduler = scheduler
+        self.events = events
+        self._state: Dict[int, Tuple[bool, Optional[str]]] = {}
+
+    @property
+    def detector(self) -> SeizureDetector:
+        return self._detector or get_detector()
+
+    def push(self, patient_id: int, channel_data, timestamp: Optional[datetime] = None) -> bool:
+        """
+        Add one sample (or a block of samples) for a patient. `timestamp`, that of the
+        last sample, places the completed windows in time for seizure events.
+
+        Returns:
+            The patient's latest window decision; unchanged until the next hop completes
+        """
+        # The per-sample model never reads window features, so skip computing them for it
+        windows = self.engine.push(patient_id, channel_data, n_features=self.detector.n_features_in or 0)
+        if windows and self.scheduler is not None:
+            self.scheduler.submit(windows, partial(self._apply, patient_id, timestamp))
+        elif windows:
+            detector = self.detector
+            self._apply(patient_id, timestamp, detector.predict_windows(windows), detector.version)
+        return self._state.get(patient_id, (False, None))[0]
+
+    def model_version(self, patient_id: int) -> Optional[str]:
+        """Version of the model that made the patient's latest decision."""
+        return self._state.get(patient_id, (False, None))[1]
+
+    def _apply(
+        self, patient_id: int, timestamp: Optional[datetime], decisions: List[bool], version: Optional[str]
+    ) -> None:
+        self._state[patient_id] = (any(decisions), version)
+        if self.events is not None and timestamp is not None:
+            self.events.update(patient_id, decisions, timestamp, version)
+
+
+_streaming_detector_instance = None
+
+
+def get_streaming_detector() -> StreamingSeizureDetector:
+    """Get or create the global streaming detector instance."""
+    global _streaming_detector_instance
+    if _streaming_detector_instance is None:
+        _streaming_detector_instance = StreamingSeizureDetector()
+    return _streaming_detector_instance
+
+
 def detect_seizure(eeg_data: Union[List[float], Dict, np.ndarray]) -> bool:
     """
     Main function for seizure detection using ML model.
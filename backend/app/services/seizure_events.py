@@ -0,0 +1,301 @@
+"""
+Seizure events from the per-window detection stream.
+
+`SeizureSegmenter` is a per-patient state machine over window decisions:
+
+- onset: SEIZURE_EVENT_ON_WINDOWS consecutive positive windows open an event,
+  starting where the first of them starts (hysteresis against single false positives);
+- an event is confirmed, and alerted, once it has lasted SEIZURE_EVENT_MIN_SECONDS;
+- offset: it ends at its last positive window once SEIZURE_EVENT_OFF_WINDOWS
+  consecutive negatives have arrived and SEIZURE_EVENT_MERGE_GAP_SECONDS have passed
+  since that window, so short dips merge into one event. A pause in the stream
+  longer than the merge gap ends it too.
+
+Each window costs O(1) and the state is a small JSON-able dict per patient, which
+offline re-scoring checkpoints. `SeizureEventWriter` runs the segmenter on live
+detections and, on its own thread, writes one `notable_sessions` row per confirmed
+event and pushes start/end alerts to the seizure alert WebSocket channel, so the
+detection path never waits for the database.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Session as NotableSession
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+START = "seizure_start"
+END = "seizure_end"
+
+
+class SeizureEvent(NamedTuple):
+    patient_id: int
+    start: float  # seconds since the epoch
+    end: float  # last positive window's end so far
+    model_version: Optional[str]
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+Transition = Tuple[str, SeizureEvent]  # (START or END, event)
+
+
+def _idle() -> Dict[str, Any]:
+    return {"positives": 0, "negatives": 0, "run_start": None, "start": None, "last": None,
+            "seen": None, "confirmed": False, "version": None}
+
+
+class SeizureSegmenter:
+    """Per-patient onset/offset state machine; see the module docstring."""
+
+    def __init__(
+        self,
+        on_windows: int = settings.SEIZURE_EVENT_ON_WINDOWS,
+        off_windows: int = settings.SEIZURE_EVENT_OFF_WINDOWS,
+        min_seconds: float = settings.SEIZURE_EVENT_MIN_SECONDS,
+        merge_gap_seconds: float = settings.SEIZURE_EVENT_MERGE_GAP_SECONDS,
+    ):
+        self.on_windows = max(1, on_windows)
+        self.off_windows = max(1, off_windows)
+        self.min_seconds = min_seconds
+        self.merge_gap = merge_gap_seconds
+        self._states: Dict[int, Dict[str, Any]] = {}
+
+    def state(self, patient_id: int) -> Optional[Dict[str, Any]]:
+        return self._states.get(patient_id)
+
+    def restore(self, patient_id: int, state: Optional[Dict[str, Any]]) -> None:
+        if state is None:
+            self._states.pop(patient_id, None)
+        else:
+            self._states[patient_id] = dict(state)
+
+    def active(self) -> List[int]:
+        """Patients with an open event."""
+        return [pid for pid, s in self._states.items() if s["start"] is not None]
+
+    def update(
+        self, patient_id: int, start: float, end: float, positive: bool, version: Optional[str] = None
+    ) -> List[Transition]:
+        """Feed one window decision (its hop spans [start, end] seconds); returns the resulting transitions."""
+        s = self._states.get(patient_id)
+        if s is None:
+            s = self._states[patient_id] = _idle()
+        out: List[Transition] = []
+        if s["start"] is not None and s["seen"] is not None and start - s["seen"] > self.merge_gap:
+            out += self._close(patient_id, s)
+        s["seen"] = end
+
+        if not positive:
+            s["positives"] = 0
+            if s["start"] is not None:
+                s["negatives"] += 1
+                if s["negatives"] >= self.off_windows and end - s["last"] >= self.merge_gap:
+                    out += self._close(patient_id, s)
+            return out
+
+        s["negatives"] = 0
+        if s["start"] is None:
+            if s["positives"] == 0:
+                s["run_start"] = start
+            s["positives"] += 1
+            if s["positives"] < self.on_windows:
+                return out
+            s["start"], s["version"] = s["run_start"], version
+        s["last"] = end
+        if not s["confirmed"] and s["last"] - s["start"] >= self.min_seconds:
+            s["confirmed"] = True
+            out.append((START, SeizureEvent(patient_id, s["start"], s["last"], s["version"])))
+        return out
+
+    def finish(self, patient_id: int) -> List[Transition]:
+        """The patient's stream has ended: close any open event."""
+        s = self._states.get(patient_id)
+        return self._close(patient_id, s) if s is not None and s["start"] is not None else []
+
+    def _close(self, patient_id: int, s: Dict[str, Any]) -> List[Transition]:
+        event = SeizureEvent(patient_id, s["start"], s["last"], s["version"])
+        confirmed = s["confirmed"]
+        s.update(_idle(), seen=s["seen"])
+        return [(END, event)] if confirmed else []
+
+
+def _naive_utc(seconds: float) -> datetime:
+    # notable_sessions holds naive UTC timestamps, like the dashboards' utcnow() comparisons
+    return datetime(1970, 1, 1) + timedelta(seconds=seconds)
+
+
+def _epoch_seconds(timestamp: datetime) -> float:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+class SeizureEventWriter:
+    """
+    Live seizure events: `update()` runs the segmenter on a patient's new window
+    decisions (called from the inference scheduler thread) and only enqueues the
+    transitions. The writer thread inserts a `notable_sessions` row per ended event,
+    publishes alerts through the broadcast backend (websockets/broadcast.py), and
+    closes events of patients whose stream went quiet for `idle_seconds`.
+    """
+
+    def __init__(
+        self,
+        segmenter: Optional[SeizureSegmenter] = None,
+        session_factory: Optional[Callable[[], Session]] = None,
+        hop_seconds: float = settings.SEIZURE_HOP_SECONDS,
+        idle_seconds: float = settings.SEIZURE_EVENT_IDLE_SECONDS,
+        max_queue: int = 10000,
+    ):
+        if session_factory is None:
+            from app.db.session import SessionLocal
+            session_factory = SessionLocal
+        self.segmenter = segmenter or SeizureSegmenter()
+        self.session_factory = session_factory
+        self.hop_seconds = hop_seconds
+        self.idle_seconds = idle_seconds
+        self.queue: "queue.Queue[Transition]" = queue.Queue(maxsize=max_queue)
+        self._segment_lock = threading.Lock()
+        self._touched: Dict[int, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"started": 0, "ended": 0, "written": 0, "failed_writes": 0, "dropped": 0}
+
+    def _incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def update(self, patient_id: int, decisions: Sequence[bool], timestamp: datetime, version: Optional[str]) -> None:
+        """
+        Feed the decisions of the windows completed by a patient's sample at `timestamp`,
+        oldest first; earlier windows of a block are placed one hop apart before it.
+        """
+        end = _epoch_seconds(timestamp)
+        n = len(decisions)
+        with self._segment_lock:
+            self._touched[patient_id] = time.monotonic()
+            for i, positive in enumerate(decisions):
+                t = end - (n - 1 - i) * self.hop_seconds
+                for transition in self.segmenter.update(patient_id, t - self.hop_seconds, t, positive, version):
+                    self._enqueue(transition)
+
+    def _enqueue(self, transition: Transition) -> None:
+        try:
+            self.queue.put_nowait(transition)
+        except queue.Full:
+            self._incr("dropped")
+            logger.error(f"Seizure event queue full, dropped {transition[0]} for patient {transition[1].patient_id}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="seizure-events", daemon=True)
+        self._thread.start()
+        logger.info(f"Seizure event writer started (idle close after {self.idle_seconds}s)")
+
+    def stop(self, timeout: float = 10.0):
+        """Stop after closing open events and writing everything still queued."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        logger.info(f"Seizure event writer stopped: {self.stats()}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counters)
+        out["queue_depth"] = self.queue.qsize()
+        with self._segment_lock:
+            out["active_events"] = len(self.segmenter.active())
+        return out
+
+    def _expire(self, idle_seconds: float) -> None:
+        cutoff = time.monotonic() - idle_seconds
+        with self._segment_lock:
+            for patient_id in self.segmenter.active():
+                if self._touched.get(patient_id, 0.0) <= cutoff:
+                    for transition in self.segmenter.finish(patient_id):
+                        self._enqueue(transition)
+
+    def _run(self):
+        last_sweep = time.monotonic()
+        while True:
+            stopping = self._stop.is_set()
+            if stopping:
+                self._expire(0.0)
+            elif time.monotonic() - last_sweep >= 1.0:
+                self._expire(self.idle_seconds)
+                last_sweep = time.monotonic()
+            batch: List[Transition] = []
+            try:
+                batch.append(self.queue.get(timeout=0.0 if stopping else 0.5))
+                while len(batch) < 500:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                self._handle(batch)
+            elif stopping:
+                return
+
+    def _handle(self, batch: List[Transition]):
+        ended = [event for kind, event in batch if kind == END]
+        session_ids = self._write(ended) if ended else {}
+        for kind, event in batch:
+            self._incr("started" if kind == START else "ended")
+            message = {
+                "type": kind,
+                "patient_id": event.patient_id,
+                "start_time": _naive_utc(event.start).isoformat(),
+                "end_time": _naive_utc(event.end).isoformat() if kind == END else None,
+                "duration": round(event.duration, 3),
+                "model_version": event.model_version,
+                "session_id": session_ids.get((event.patient_id, event.start)) if kind == END else None,
+            }
+            logger.info(f"Seizure {'started' if kind == START else 'ended'} for patient {event.patient_id}: {message}")
+            self._alert(message)
+
+    def _write(self, events: List[SeizureEvent]) -> Dict[Tuple[int, float], int]:
+        db = self.session_factory()
+        try:
+            rows = [
+                NotableSession(
+                    patient_id=event.patient_id,
+                    start_time=_naive_utc(event.start),
+                    end_time=_naive_utc(event.end),
+                    duration=event.duration,
+                    notes=f"Seizure detected live by model {event.model_version or 'default'}",
+                )
+                for event in events
+            ]
+            db.add_all(rows)
+            db.commit()
+            self._incr("written", len(rows))
+            return {(event.patient_id, event.start): row.id for event, row in zip(events, rows)}
+        except Exception as e:
+            db.rollback()
+            self._incr("failed_writes", len(events))
+            logger.error(f"Failed to write {len(events)} seizure sessions: {e}")
+            return {}
+        finally:
+            db.close()
+
+    def _alert(self, message: Dict[str, Any]) -> None:
+        # Imported lazily: the offline tools use this module without the web app
+        from app.websockets.broadcast import broadcast
+
+        broadcast.publish_alert(json.dumps(message))
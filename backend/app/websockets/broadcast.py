@@ -0,0 +1,310 @@
+"""
+Broadcast backends: how live EEG blocks and seizure alerts get from the ingest
+pipeline to the WebSocket viewers of every API worker.
+
+`publish_samples()` / `publish_alert()` are called by ingest (any thread); each
+backend delivers them to the local `ConnectionManager` of every subscribed process,
+which then coalesces and fans out as usual.
+
+- `InProcessBroadcast` (BROADCAST_BACKEND="inprocess", default): straight to this
+  process's manager. Right for a single worker and for tests.
+- `PostgresBroadcast` ("postgres"): NOTIFY on BROADCAST_CHANNEL from the ingesting
+  process, LISTEN in every worker, so one ingest/detection pipeline serves viewers
+  connected to any `uvicorn --workers N` process. Blocks are sent as base64 float32
+  and split to stay under Postgres' 8000-byte NOTIFY payload limit.
+"""
+import asyncio
+import base64
+import json
+import logging
+import queue
+import re
+import select
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.websockets.manager import manager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+NOTIFY_MAX_BYTES = 7900  # Postgres rejects payloads of 8000 bytes or more
+SAMPLES = "S"
+ALERT = "A"
+
+
+def encode_samples(
+    patient_id: int,
+    timestamp: datetime,
+    sample_rate: float,
+    samples: np.ndarray,
+    seizure_detected: bool,
+    model_version: Optional[str],
+    max_bytes: int = NOTIFY_MAX_BYTES,
+) -> List[str]:
+    """A block as text payloads of at most `max_bytes`, split along samples if needed."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    start_us = (timestamp - _EPOCH) // timedelta(microseconds=1)
+    samples = np.ascontiguousarray(samples, dtype="<f4")
+    n_samples, n_channels = samples.shape
+    header = json.dumps([patient_id, 0, sample_rate, n_channels, seizure_detected, model_version])
+    # base64 is 4 bytes per 3; leave room for the header growing with a longer timestamp
+    per_payload = max(1, ((max_bytes - len(header) - 32) * 3 // 4) // (4 * n_channels))
+    payloads = []
+    for i in range(0, n_samples, per_payload):
+        chunk = samples[i: i + per_payload]
+        t_us = start_us + round(i * 1e6 / sample_rate)
+        meta = json.dumps([patient_id, t_us, sample_rate, n_channels, seizure_detected, model_version])
+        payloads.append(f"{SAMPLES}{meta}|{base64.b64encode(chunk.tobytes()).decode()}")
+    return payloads
+
+
+def decode_samples(payload: str) -> Dict:
+    meta, body = payload[1:].rsplit("|", 1)  # base64 has no "|"; the model version might
+    patient_id, t_us, sample_rate, n_channels, seizure_detected, model_version = json.loads(meta)
+    samples = np.frombuffer(base64.b64decode(body), dtype="<f4").reshape(-1, n_channels)
+    return {
+        "patient_id": patient_id,
+        "timestamp": _EPOCH + timedelta(microseconds=t_us),
+        "sample_rate": sample_rate,
+        "samples": samples,
+        "seizure_detected": seizure_detected,
+        "model_version": model_version,
+    }
+
+
+class InProcessBroadcast:
+    """Deliver to this process's ConnectionManager only."""
+
+    name = "inprocess"
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+
+    def stop(self):
+        self.loop = None
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+    def publish_samples(self, patient_id, timestamp, sample_rate, samples, seizure_detected, model_version=None):
+        manager.publish(patient_id, timestamp, sample_rate, samples, seizure_detected, model_version)
+
+    def publish_alert(self, message: str):
+        if self.loop is not None and not self.loop.is_closed():
+            asyncio.run_coroutine_threadsafe(manager.broadcast_alert(message), self.loop)
+
+
+def _libpq_dsn(url: str) -> str:
+    from sqlalchemy.engine import make_url
+
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class PostgresBroadcast(InProcessBroadcast):
+    """
+    LISTEN/NOTIFY over BROADCAST_CHANNEL. Publishing only enqueues; a publisher thread
+    sends the queued payloads in batches on its own connection. A listener thread in
+    every process that called `start()` hands notifications to the local manager.
+
+    Sample payloads go through a bounded queue that drops its oldest payload when full,
+    since a viewer only needs the latest signal. Alerts have their own unbounded queue,
+    are sent ahead of any pending samples and are retried if a publish fails.
+    """
+
+    name = "postgres"
+
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        channel: str = settings.BROADCAST_CHANNEL,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+    ):
+        super().__init__()
+        if not re.fullmatch(r"[a-z_][a-z0-9_]*", channel):
+            raise ValueError(f"Invalid broadcast channel name {channel!r}")
+        self.dsn = _libpq_dsn(database_url or settings.DATABASE_URL)
+        self.channel = channel
+        self.batch_size = batch_size
+        self.queue: "queue.Queue[str]" = queue.Queue(maxsize=max_queue)
+        self.alerts: Deque[str] = deque()
+        self._pending = threading.Event()
+        self._stop = threading.Event()
+        self._publisher: Optional[threading.Thread] = None
+        self._listener: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"published": 0, "dropped": 0, "received": 0, "failed_publishes": 0}
+
+    def _incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counters)
+        out["queue_depth"] = self.queue.qsize()
+        out["alert_queue_depth"] = len(self.alerts)
+        return out
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Start listening (for this process's viewers) and the publisher thread."""
+        self.loop = loop
+        self._stop.clear()
+        if loop is not None and (self._listener is None or not self._listener.is_alive()):
+            self._listener = threading.Thread(target=self._listen, name="broadcast-listen", daemon=True)
+            self._listener.start()
+        if self._publisher is None or not self._publisher.is_alive():
+            self._publisher = threading.Thread(target=self._publish, name="broadcast-publish", daemon=True)
+            self._publisher.start()
+        logger.info(f"Postgres broadcast on channel {self.channel} ({'listening' if loop else 'publish only'})")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for thread in (self._publisher, self._listener):
+            if thread is not None:
+                thread.join(timeout=timeout)
+        self._publisher = self._listener = None
+        self.loop = None
+        logger.info(f"Postgres broadcast stopped: {self.stats()}")
+
+    def publish_samples(self, patient_id, timestamp, sample_rate, samples, seizure_detected, model_version=None):
+        for payload in encode_samples(patient_id, timestamp, sample_rate, samples, seizure_detected, model_version):
+            self._enqueue(payload)
+
+    def publish_alert(self, message: str):
+        payload = ALERT + message
+        if len(payload.encode()) > NOTIFY_MAX_BYTES:
+            logger.error(f"Seizure alert too large to broadcast ({len(payload)} bytes)")
+            return
+        self.alerts.append(payload)
+        self._pending.set()
+
+    def _enqueue(self, payload: str):
+        while True:
+            try:
+                self.queue.put_nowait(payload)
+                break
+            except queue.Full:
+                # Make room by dropping the oldest payload: live viewers want the newest signal
+                try:
+                    self.queue.get_nowait()
+                    self._incr("dropped")
+                except queue.Empty:
+                    pass
+        self._pending.set()
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def _publish(self):
+        conn = None
+        while not (self._stop.is_set() and self.queue.empty() and not self.alerts):
+            self._pending.wait(0.2)
+            self._pending.clear()
+            alerts: List[str] = []
+            while self.alerts and len(alerts) < self.batch_size:
+                alerts.append(self.alerts.popleft())
+            batch = list(alerts)
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                continue
+            if len(batch) == self.batch_size:
+                # More may be waiting; do not sleep before the next batch
+                self._pending.set()
+            try:
+                if conn is None or conn.closed:
+                    conn = self._connect()
+                with conn.cursor() as cur:
+                    # One round trip per batch
+                    cur.execute(
+                        "SELECT " + ", ".join(["pg_notify(%s, %s)"] * len(batch)),
+                        [v for payload in batch for v in (self.channel, payload)],
+                    )
+                self._incr("published", len(batch))
+            except Exception as e:
+                lost = len(batch) - len(alerts)
+                self._incr("failed_publishes", lost)
+                if conn is not None:
+                    conn.close()
+                conn = None
+                if self._stop.is_set():
+                    logger.error(f"Broadcast publish failed while stopping, {len(batch)} messages lost: {e}")
+                    self.alerts.clear()
+                    break
+                # Alerts go back to the front of their queue and are retried
+                self.alerts.extendleft(reversed(alerts))
+                logger.error(f"Broadcast publish failed, {lost} sample messages lost, {len(alerts)} alerts requeued: {e}")
+                self._stop.wait(1.0)
+                self._pending.set()
+        if conn is not None:
+            conn.close()
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                conn = self._connect()
+            except Exception as e:
+                logger.error(f"Broadcast listener cannot connect, retrying: {e}")
+                self._stop.wait(2.0)
+                continue
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 0.5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"Broadcast listener lost its connection, reconnecting: {e}")
+                self._stop.wait(1.0)
+            finally:
+                conn.close()
+
+    def _dispatch(self, payload: str):
+        self._incr("received")
+        try:
+            if payload.startswith(SAMPLES):
+                block = decode_samples(payload)
+                manager.publish(
+                    block["patient_id"], block["timestamp"], block["sample_rate"], block["samples"],
+                    block["seizure_detected"], block["model_version"],
+                )
+            elif payload.startswith(ALERT):
+                super().publish_alert(payload[1:])
+        except Exception as e:
+            logger.error(f"Invalid broadcast message: {e}")
+
+
+_BACKENDS = {"inprocess": InProcessBroadcast, "postgres": PostgresBroadcast}
+
+
+def get_broadcast(name: str = settings.BROADCAST_BACKEND):
+    try:
+        backend = _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown BROADCAST_BACKEND {name!r}, expected one of {sorted(_BACKENDS)}")
+    return backend()
+
+
+broadcast = get_broadcast()
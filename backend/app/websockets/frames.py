@@ -0,0 +1,58 @@
+"""
+Binary live EEG frames for WebSocket viewers.
+
+A viewer opts in by requesting the SUBPROTOCOL subprotocol on connect
+(`new WebSocket(url, ["insmos.eeg.f32.v1"])`); everyone else keeps getting JSON
+"eeg_block" messages. A binary message is a 28-byte little-endian header followed
+by the samples as float32, sample-major (n_samples x n_channels):
+
+    offset  size  field
+         0     2  magic b"EW"
+         2     1  format version (1)
+         3     1  flags: bit 0 = seizure detected
+         4     4  patient id (uint32)
+         8     8  timestamp of the first sample, milliseconds since the Unix epoch (float64)
+        16     4  sample rate in Hz (float32)
+        20     4  samples in the frame (uint32)
+        24     2  channels (uint16)
+        26     2  reserved (0)
+
+The body starts 4-byte aligned, so browsers can read it as a `Float32Array` view of
+the message without copying. Sample i is at timestamp + i * 1000 / sample_rate ms.
+"""
+import struct
+
+import numpy as np
+
+SUBPROTOCOL = "insmos.eeg.f32.v1"
+MAGIC = b"EW"
+FORMAT_VERSION = 1
+SEIZURE = 0x01
+
+HEADER = struct.Struct("<2sBBIdfIHH")
+HEADER_SIZE = HEADER.size  # 28
+
+
+def encode_ws_frame(patient_id: int, start_us: int, sample_rate: float, samples: np.ndarray, seizure_detected: bool) -> bytes:
+    """Pack a (n_samples, n_channels) block whose first sample is at `start_us` microseconds since the epoch."""
+    n_samples, n_channels = samples.shape
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, SEIZURE if seizure_detected else 0, patient_id,
+        start_us / 1000.0, sample_rate, n_samples, n_channels, 0,
+    )
+    return header + np.ascontiguousarray(samples, dtype="<f4").tobytes()
+
+
+def decode_ws_frame(payload: bytes) -> dict:
+    """The inverse of `encode_ws_frame`, as the JSON message's fields; used by benchmarks and tests."""
+    magic, version, flags, patient_id, t_ms, sample_rate, n_samples, n_channels, _ = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Not a live EEG frame")
+    samples = np.frombuffer(payload, dtype="<f4", count=n_samples * n_channels, offset=HEADER_SIZE)
+    return {
+        "patient_id": patient_id,
+        "timestamp_ms": t_ms,
+        "sample_rate": float(sample_rate),
+        "samples": samples.reshape(n_samples, n_channels),
+        "seizure_detected": bool(flags & SEIZURE),
+    }
@@ -1,45 +1,397 @@
 import asyncio
-from typing import Dict, List
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+import numpy as np
 from fastapi import WebSocket
 
+from app.core.config import settings
+from app.websockets.frames import SUBPROTOCOL, encode_ws_frame
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+Block = Tuple[int, float, np.ndarray]  # (first sample, microseconds since the epoch; sample rate; samples)
+
+
+class _PatientStream:
+    """Samples published for one patient since the last flush."""
+
+    __slots__ = ("blocks", "pending", "seizure_detected", "model_version", "sent_seizure")
 
-class ConnectionManager:
     def __init__(self):
-        self.patient_connections: Dict[int, List[WebSocket]] = {}
-        self.alert_connections: List[WebSocket] = []
+        self.blocks: List[Block] = []
+        self.pending = 0
+        self.seizure_detected = False
+        self.model_version: Optional[str] = None
+        self.sent_seizure = False
+
+
+class Connection:
+    """
+    One WebSocket with its own bounded outbound queue and writer task, so a slow
+    viewer only ever delays itself. Past `max_queue` queued messages the oldest
+    droppable one (live frames) is dropped; alerts are never dropped. When a message
+    is queued while the oldest unsent one is older than `max_lag` seconds, or when a
+    send fails, the connection is evicted: `on_evict` is called and the socket closed.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        patient_id: Optional[int],
+        binary: bool,
+        max_queue: int,
+        max_lag: float,
+        on_evict: Callable[["Connection", str], None],
+    ):
+        self.websocket = websocket
+        self.patient_id = patient_id
+        self.binary = binary
+        self.max_queue = max_queue
+        self.max_lag = max_lag
+        self.on_evict = on_evict
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.max_lag_seen = 0.0
+        self._items: Deque[Tuple[Union[str, bytes], float, bool]] = deque()  # (payload, enqueued at, droppable)
+        self._inflight: Optional[float] = None  # enqueue time of the message being sent
+        self._ready = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    @property
+    def queued(self) -> int:
+        return len(self._items)
+
+    def lag(self, now: Optional[float] = None) -> float:
+        """Age of the oldest message not yet sent, in seconds."""
+        oldest = self._inflight if self._inflight is not None else (self._items[0][1] if self._items else None)
+        return 0.0 if oldest is None else (now or time.monotonic()) - oldest
+
+    def send(self, payload: Union[str, bytes], droppable: bool = True) -> bool:
+        """Queue a message without waiting; returns False if the connection is (now) evicted."""
+        if self.closed:
+            return False
+        now = time.monotonic()
+        lag = self.lag(now)
+        if lag > self.max_lag:
+            self.evict(f"{lag:.1f}s behind")
+            return False
+        if droppable and len(self._items) >= self.max_queue:
+            # Keep the latest frames: drop the oldest droppable message
+            for i, item in enumerate(self._items):
+                if item[2]:
+                    del self._items[i]
+                    self.dropped += 1
+                    break
+        self._items.append((payload, now, droppable))
+        self._ready.set()
+        return True
+
+    async def _run(self):
+        try:
+            while True:
+                while not self._items:
+                    self._ready.clear()
+                    await self._ready.wait()
+                payload, enqueued, _ = self._items.popleft()
+                # A send stuck past the lag budget is caught by the next send() and cancelled
+                self._inflight = enqueued
+                if isinstance(payload, bytes):
+                    await self.websocket.send_bytes(payload)
+                else:
+                    await self.websocket.send_text(payload)
+                self._inflight = None
+                self.sent += 1
+                self.max_lag_seen = max(self.max_lag_seen, time.monotonic() - enqueued)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.evict(f"send failed: {e!r}")
+
+    def evict(self, reason: str) -> None:
+        if self.closed:
+            return
+        self.stop()
+        self.on_evict(self, reason)
+        asyncio.get_running_loop().create_task(self._close())
+
+    def stop(self) -> None:
+        """Stop the writer (the client went away); queued messages are discarded."""
+        self.closed = True
+        self._items.clear()
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def _close(self):
+        try:
+            # 1013: try again later; a stalled peer may never acknowledge it
+            await asyncio.wait_for(self.websocket.close(code=1013), timeout=1.0)
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "patient_id": self.patient_id,
+            "binary": self.binary,
+            "queued": self.queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "lag": round(self.lag(), 3),
+            "max_lag": round(self.max_lag_seen, 3),
+        }
+
+
+def _coalesce(blocks: List[Block]) -> List[Block]:
+    """Join blocks that continue each other (same rate and channels, no gap) into one."""
+    runs: List[Tuple[int, float, List[np.ndarray]]] = []
+    expected = None
+    for start_us, rate, samples in blocks:
+        if (
+            runs and runs[-1][1] == rate and runs[-1][2][-1].shape[1] == samples.shape[1]
+            and abs(start_us - expected) <= 0.5e6 / rate
+        ):
+            runs[-1][2].append(samples)
+        else:
+            runs.append((start_us, rate, [samples]))
+        expected = start_us + round(len(samples) * 1e6 / rate)
+    return [(start_us, rate, np.concatenate(parts) if len(parts) > 1 else parts[0]) for start_us, rate, parts in runs]
+
+
+class ConnectionManager:
+    """
+    Live EEG viewers and seizure alert subscribers.
+
+    Ingest calls `publish()` from its own thread with each block of samples; nothing
+    is sent then. Blocks accumulate per patient and a flush task on the event loop
+    sends them `flush_hz` times a second, at once when the patient's seizure state
+    changes, as one "eeg_block" message per contiguous run of samples. Each message
+    is serialized once per format and the same text (JSON) or bytes (viewers that
+    negotiated the binary subprotocol, see frames.py) go to every viewer of the patient.
+
+    Sending never waits on a socket: every viewer and alert subscriber is a
+    `Connection` with its own queue and writer task, evicted when it falls behind.
+    """
+
+    def __init__(
+        self,
+        flush_hz: float = settings.LIVE_EEG_FLUSH_HZ,
+        max_pending_seconds: float = settings.LIVE_EEG_MAX_PENDING_SECONDS,
+        send_queue_size: int = settings.LIVE_EEG_SEND_QUEUE_SIZE,
+        max_lag_seconds: float = settings.LIVE_EEG_MAX_LAG_SECONDS,
+    ):
+        self.patient_connections: Dict[int, List[Connection]] = {}
+        self.alert_connections: List[Connection] = []
+        self.flush_interval = 1.0 / flush_hz
+        self.max_pending_seconds = max_pending_seconds
+        self.send_queue_size = send_queue_size
+        self.max_lag_seconds = max_lag_seconds
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._streams: Dict[int, _PatientStream] = {}
+        self._streams_lock = threading.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            "published_blocks": 0, "published_samples": 0, "dropped_samples": 0,
+            "flushes": 0, "messages_serialized": 0, "bytes_serialized": 0, "sends": 0,
+            "frames_serialized": 0, "frame_bytes_serialized": 0, "frame_sends": 0,
+            "alerts": 0, "evicted": 0,
+        }
+
+    def _incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counters)
+        out["viewers"] = sum(len(c) for c in self.patient_connections.values())
+        out["patients_viewed"] = len(self.patient_connections)
+        out["alert_subscribers"] = len(self.alert_connections)
+        return out
+
+    def connection_stats(self) -> List[Dict[str, Any]]:
+        """Queue depth, drops and lag of every open connection (patient_id None: alerts)."""
+        connections = [c for group in self.patient_connections.values() for c in group] + self.alert_connections
+        return [c.stats() for c in connections]
+
+    def _connection(self, websocket: WebSocket, patient_id: Optional[int], binary: bool = False) -> Connection:
+        return Connection(
+            websocket, patient_id, binary, self.send_queue_size, self.max_lag_seconds, self._evicted,
+        )
+
+    def _evicted(self, connection: Connection, reason: str) -> None:
+        self._incr("evicted")
+        logger.warning(
+            f"Evicted {'patient ' + str(connection.patient_id) if connection.patient_id is not None else 'alert'} "
+            f"WebSocket ({reason}; {connection.dropped} dropped)"
+        )
+        self._remove(connection)
+
+    def _remove(self, connection: Connection) -> None:
+        patient_id = connection.patient_id
+        if patient_id is None:
+            if connection in self.alert_connections:
+                self.alert_connections.remove(connection)
+            return
+        group = self.patient_connections.get(patient_id)
+        if group is not None and connection in group:
+            group.remove(connection)
+            if not group:
+                del self.patient_connections[patient_id]
+                with self._streams_lock:
+                    self._streams.pop(patient_id, None)
 
     async def connect_patient(self, websocket: WebSocket, patient_id: int):
-        await websocket.accept()
-        if patient_id not in self.patient_connections:
-            self.patient_connections[patient_id] = []
-        self.patient_connections[patient_id].append(websocket)
+        # Binary frames only for viewers that ask for them; JSON otherwise
+        binary = SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+        await websocket.accept(subprotocol=SUBPROTOCOL if binary else None)
+        self.patient_connections.setdefault(patient_id, []).append(self._connection(websocket, patient_id, binary))
+        self._ensure_flusher()
 
     def disconnect_patient(self, websocket: WebSocket, patient_id: int):
-        if patient_id in self.patient_connections and websocket in self.patient_connections[patient_id]:
-            self.patient_connections[patient_id].remove(websocket)
-            if not self.patient_connections[patient_id]:
-                del self.patient_connections[patient_id]
+        for connection in list(self.patient_connections.get(patient_id, ())):
+            if connection.websocket is websocket:
+                connection.stop()
+                self._remove(connection)
+
+    def publish(
+        self,
+        patient_id: int,
+        timestamp: datetime,
+        sample_rate: float,
+        samples: np.ndarray,
+        seizure_detected: bool,
+        model_version: Optional[str] = None,
+    ) -> None:
+        """Queue a block of live samples for the patient's viewers; safe to call from any thread."""
+        if patient_id not in self.patient_connections or self.loop is None:
+            return
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        start_us = (timestamp - _EPOCH) // timedelta(microseconds=1)
+        dropped = 0
+        with self._streams_lock:
+            stream = self._streams.get(patient_id)
+            if stream is None:
+                stream = self._streams[patient_id] = _PatientStream()
+            stream.blocks.append((start_us, sample_rate, samples))
+            stream.pending += len(samples)
+            # Flushes stalled: keep the latest samples only
+            while len(stream.blocks) > 1 and stream.pending > self.max_pending_seconds * sample_rate:
+                dropped += len(stream.blocks[0][2])
+                stream.pending -= len(stream.blocks.pop(0)[2])
+            stream.seizure_detected = seizure_detected
+            stream.model_version = model_version
+            urgent = seizure_detected != stream.sent_seizure
+        with self._lock:
+            self._counters["published_blocks"] += 1
+            self._counters["published_samples"] += len(samples)
+            self._counters["dropped_samples"] += dropped
+        if urgent and self._wake is not None:
+            try:
+                self.loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:  # loop closed
+                pass
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and not self._flusher.done():
+            return
+        self.loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._flusher = self.loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        # Runs while anyone is watching a live stream
+        while self.patient_connections:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Live EEG flush failed: {e}")
+        self.loop = None
+
+    async def flush(self):
+        """Queue every patient's pending samples on its viewers' connections."""
+        with self._streams_lock:
+            ready = []
+            for patient_id, stream in self._streams.items():
+                if stream.blocks:
+                    ready.append((patient_id, stream.blocks, stream.seizure_detected, stream.model_version))
+                    stream.blocks, stream.pending = [], 0
+                    stream.sent_seizure = stream.seizure_detected
+        if not ready:
+            return
+        self._incr("flushes")
+        for item in ready:
+            self._send_blocks(*item)
+
+    def _send_blocks(self, patient_id: int, blocks: List[Block], seizure_detected: bool, model_version: Optional[str]):
+        connections = list(self.patient_connections.get(patient_id, ()))
+        if not connections:
+            return
+        binary = [c for c in connections if c.binary]
+        text_only = [c for c in connections if not c.binary] if binary else connections
+        for start_us, rate, samples in _coalesce(blocks):
+            if text_only:
+                text = json.dumps({
+                    "type": "eeg_block",
+                    "patient_id": patient_id,
+                    "timestamp": (_EPOCH + timedelta(microseconds=start_us)).isoformat(),
+                    "sample_rate": rate,
+                    "samples": samples.tolist(),
+                    "seizure_detected": seizure_detected,
+                    "model_version": model_version,
+                })
+                for connection in text_only:
+                    connection.send(text)
+                with self._lock:
+                    self._counters["messages_serialized"] += 1
+                    self._counters["bytes_serialized"] += len(text)
+                    self._counters["sends"] += len(text_only)
+            if binary:
+                frame = encode_ws_frame(patient_id, start_us, rate, samples, seizure_detected)
+                for connection in binary:
+                    connection.send(frame)
+                with self._lock:
+                    self._counters["frames_serialized"] += 1
+                    self._counters["frame_bytes_serialized"] += len(frame)
+                    self._counters["frame_sends"] += len(binary)
 
     async def send_to_patient(self, message: dict, patient_id: int):
-        if patient_id in self.patient_connections:
-            # Send to all connections concurrently
-            tasks = [
-                connection.send_json(message)
-                for connection in self.patient_connections[patient_id]
-            ]
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
+        connections = list(self.patient_connections.get(patient_id, ()))
+        if connections:
+            text = json.dumps(message)
+            for connection in connections:
+                connection.send(text)
 
     async def connect_alert(self, websocket: WebSocket):
         await websocket.accept()
-        self.alert_connections.append(websocket)
+        self.alert_connections.append(self._connection(websocket, None))
 
     def disconnect_alert(self, websocket: WebSocket):
-        self.alert_connections.remove(websocket)
+        for connection in list(self.alert_connections):
+            if connection.websocket is websocket:
+                connection.stop()
+                self._remove(connection)
 
     async def broadcast_alert(self, message: str):
-        for connection in self.alert_connections:
-            await connection.send_text(message)
+        self._incr("alerts")
+        for connection in list(self.alert_connections):
+            connection.send(message, droppable=False)
 
 
 manager = ConnectionManager()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ingest throughput per core, JSON-per-sample messages vs JSON sample blocks
+vs binary EEG frames.
+
+Two stages are timed on one core (CPU time):
+- decode: payload -> validated samples (json.loads + EEGDataCreate / EEGBlockCreate, or decode_frame);
+- ingest: the whole MQTTClient.on_message path (decode, writer hand-off, windowed
+  detection, live-message building), with the writer and scheduler threads not
+  started so only the message-handling thread's work is counted.
+
+Usage:
+    python benchmark_eeg_frames.py [--seconds 60] [--channels 8] [--rate 250] [--frame-samples 8 32 128]
+"""
+import argparse
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app import schemas
+from app.services.eeg_frames import FLOAT32, INT24, decode_frame, encode_frame
+from app.services.mqtt_client import MQTTClient
+
+
+def json_payloads(samples: np.ndarray, start: datetime, rate: float) -> list:
+    return [
+        json.dumps({
+            "patient_id": 1,
+            "timestamp": (start + timedelta(seconds=i / rate)).isoformat(),
+            "channel_data": [round(float(v), 4) for v in row],
+        }).encode()
+        for i, row in enumerate(samples)
+    ]
+
+
+def json_block_payloads(samples: np.ndarray, start: datetime, rate: float, per_block: int) -> list:
+    return [
+        json.dumps({
+            "patient_id": 1,
+            "timestamp": (start + timedelta(seconds=i / rate)).isoformat(),
+            "sample_rate": rate,
+            "samples": np.round(samples[i: i + per_block], 4).tolist(),
+        }).encode()
+        for i in range(0, len(samples), per_block)
+    ]
+
+
+def frame_payloads(samples: np.ndarray, start: datetime, rate: float, per_frame: int, encoding: int) -> list:
+    return [
+        encode_frame(1, samples[i: i + per_frame], start + timedelta(seconds=i / rate), rate,
+                     sequence=i // per_frame, encoding=encoding)
+        for i in range(0, len(samples), per_frame)
+    ]
+
+
+def decode_json(payload: bytes):
+    return schemas.EEGDataCreate(**json.loads(payload.decode()))
+
+
+def decode_json_block(payload: bytes):
+    return schemas.EEGBlockCreate(**json.loads(payload.decode()))
+
+
+def time_cpu(fn, payloads) -> float:
+    start = time.process_time()
+    for payload in payloads:
+        fn(payload)
+    return time.process_time() - start
+
+
+def time_ingest(payloads) -> float:
+    client = MQTTClient(host="localhost", port=1883)
+    client.writer.queue.maxsize = 0  # unbounded: nothing drains it here
+    start = time.process_time()
+    for payload in payloads:
+        client.process("eeg/data", payload)  # what the ingest thread does per message
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=60.0, help="simulated seconds of EEG per case")
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=250.0)
+    parser.add_argument("--frame-samples", type=int, nargs="+", default=[8, 32, 128])
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    rng = np.random.default_rng(0)
+    n = int(args.seconds * args.rate)
+    samples = rng.normal(scale=50.0, size=(n, args.channels))
+    start = datetime.now(timezone.utc)
+
+    cases = [("json", 1, json_payloads(samples, start, args.rate), decode_json)]
+    for per_block in args.frame_samples:
+        cases.append(("json", per_block, json_block_payloads(samples, start, args.rate, per_block), decode_json_block))
+    for encoding, name in ((FLOAT32, "float32"), (INT24, "int24")):
+        for per_frame in args.frame_samples:
+            cases.append((name, per_frame, frame_payloads(samples, start, args.rate, per_frame, encoding), decode_frame))
+
+    print(f"{n:,} samples x {args.channels} channels at {args.rate:.0f} Hz; rates are per core (CPU time)")
+    print(f"{'format':<8}{'samples/msg':>12}{'bytes/sample':>14}{'decode msg/s':>14}{'decode smp/s':>14}"
+          f"{'ingest msg/s':>14}{'ingest smp/s':>14}")
+    for name, per_message, payloads, decode in cases:
+        size = sum(len(p) for p in payloads) / n
+        decode_s = time_cpu(decode, payloads)
+        ingest_s = time_ingest(payloads)
+        print(
+            f"{name:<8}{per_message:>12}{size:>14.1f}{len(payloads) / decode_s:>14,.0f}{n / decode_s:>14,.0f}"
+            f"{len(payloads) / ingest_s:>14,.0f}{n / ingest_s:>14,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark: seizure-model rows/second per inference backend at batch sizes 1, 64 and 4096.
+
+Uses random_forest_model.pkl when present, otherwise a synthetic forest of the same shape
+(20 raw channel inputs). The onnx backend is skipped when skl2onnx/onnxruntime are missing.
+
+Usage:
+    python benchmark_inference_backends.py [--trees 100] [--batches 1 64 4096]
+"""
+import argparse
+import logging
+import os
+import pickle
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from app.services.inference_backends import BACKENDS, load_backend
+
+
+def rows_per_second(backend, X: np.ndarray, batch: int, min_seconds: float = 1.0) -> float:
+    backend.predict(X[:batch])  # warm-up
+    rows = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        offset = (rows // batch * batch) % (len(X) - batch + 1)
+        backend.predict(X[offset: offset + batch])
+        rows += batch
+    return rows / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 64, 4096])
+    args = parser.parse_args()
+    logging.getLogger("app.services.inference_backends").setLevel(logging.ERROR)
+
+    rng = np.random.default_rng(0)
+    if os.path.exists("random_forest_model.pkl"):
+        with open("random_forest_model.pkl", "rb") as f:
+            model = pickle.load(f)
+        source = "random_forest_model.pkl"
+    else:
+        X = rng.normal(size=(20000, 20)) * 50
+        model = RandomForestClassifier(args.trees, random_state=0).fit(X, (X[:, 0] + X[:, 1] > 0).astype(int))
+        source = f"synthetic forest ({args.trees} trees)"
+    X = rng.normal(size=(max(args.batches) * 4, model.n_features_in_)) * 50
+
+    print(f"{source}, {model.n_features_in_} features")
+    print(f"{'backend':<8}" + "".join(f"{f'batch {b}':>16}" for b in args.batches))
+    for name in BACKENDS:
+        backend = load_backend(model, name)
+        if backend.name != name:
+            print(f"{name:<8} unavailable")
+            continue
+        cells = "".join(f"{rows_per_second(backend, X, b):>12,.0f} r/s" for b in args.batches)
+        print(f"{name:<8}{cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-window vs cross-patient micro-batched seizure inference.
+
+For each patient count, every patient emits one window per hop with arrivals spread
+evenly over the hop, as in live streaming. The unbatched path calls the model once per
+window; the batched path goes through InferenceScheduler. Reported: CPU per window,
+the resulting gain, batch sizes and submit-to-decision latency.
+
+Models are trained on synthetic window features so the script runs without a model file.
+
+Usage:
+    python benchmark_inference_batching.py [--patients 50 200 1000] [--trees 100] [--delay-ms 10]
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from app.core.config import settings
+from app.services.eeg_features import FEATURE_NAMES, FeatureWindow
+from app.services.inference_scheduler import InferenceScheduler
+from app.services.seizure_detection import SeizureDetector
+
+
+def make_windows(n: int, channels: int, rng) -> list:
+    features = rng.normal(size=(n, channels * len(FEATURE_NAMES)))
+    empty = np.zeros((0, channels))
+    return [FeatureWindow(i, empty, features[i], 0) for i in range(n)]
+
+
+def run_unbatched(detector: SeizureDetector, windows: list) -> float:
+    start = time.process_time()
+    for window in windows:
+        detector.predict_windows([window])
+    return time.process_time() - start
+
+
+def run_batched(detector: SeizureDetector, windows: list, hop: float, delay: float, rng):
+    scheduler = InferenceScheduler(detector, max_delay=delay)
+    scheduler.start()
+    offsets = np.sort(rng.uniform(0, hop, len(windows)))
+    latencies = []
+    futures = []
+    t0 = time.monotonic()
+    cpu0 = time.process_time()
+    for offset, window in zip(offsets, windows):
+        wait = t0 + offset - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        sent = time.monotonic()
+        future = scheduler.submit([window])
+        future.add_done_callback(lambda _, sent=sent: latencies.append(time.monotonic() - sent))
+        futures.append(future)
+    for future in futures:
+        future.result()
+    cpu = time.process_time() - cpu0
+    stats = scheduler.stats()
+    scheduler.stop()
+    return cpu, stats, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--delay-ms", type=float, default=settings.SEIZURE_BATCH_MAX_DELAY * 1000)
+    args = parser.parse_args()
+    logging.getLogger("app.services.seizure_detection").setLevel(logging.WARNING)
+    logging.getLogger("app.services.inference_scheduler").setLevel(logging.WARNING)
+
+    rng = np.random.default_rng(0)
+    train = make_windows(5000, args.channels, rng)
+    model = RandomForestClassifier(n_estimators=args.trees, random_state=0)
+    model.fit(np.vstack([w.features for w in train]), rng.integers(0, 2, len(train)))
+    detector = SeizureDetector(model_path="")
+    detector.set_model(model)
+
+    hop = settings.SEIZURE_HOP_SECONDS
+    print(f"{args.trees} trees, {args.channels} channels, hop {hop} s, max batch delay {args.delay_ms:.0f} ms")
+    print(f"{'patients':>8} {'unbatched':>14} {'batched':>14} {'gain':>7} {'batch':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for patients in args.patients:
+        windows = make_windows(patients, args.channels, rng)
+        unbatched = run_unbatched(detector, windows) / patients
+        cpu, stats, latency = run_batched(detector, windows, hop, args.delay_ms / 1000, rng)
+        batched = cpu / patients
+        print(
+            f"{patients:>8} {unbatched * 1000:>11.3f} ms {batched * 1000:>11.3f} ms {unbatched / batched:>6.1f}x "
+            f"{stats['mean_batch_windows']:>7.1f} {np.percentile(latency, 50) * 1000:>8.1f} "
+            f"{np.percentile(latency, 99) * 1000:>8.1f}"
+        )
+    print("(unbatched/batched: CPU per window; batch: mean windows per model call)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory and load time of N worker processes each loading the seizure model,
+pickled sklearn forest vs memory-mapped .forest artifact.
+
+Each worker loads the model, touches every array page (as a long-running worker
+eventually does) and reports its proportional set size (PSS), which splits shared
+pages between the processes mapping them. A synthetic forest is used so the numbers
+do not depend on random_forest_model.pkl.
+
+Usage (Linux, needs /proc/self/smaps_rollup):
+    python benchmark_model_memory.py [--workers 8] [--trees 200]
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from app.services.inference_backends import NumpyForestBackend
+from app.services.model_artifacts import load_forest, save_forest
+
+
+def pss_kib() -> int:
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    return 0
+
+
+def worker(mode: str, path: str, barrier, results):
+    base = pss_kib()
+    started = time.perf_counter()
+    if mode == "pickle":
+        with open(path, "rb") as f:
+            backend = NumpyForestBackend.from_sklearn(pickle.load(f))
+    else:
+        backend = load_forest(path)
+    load_ms = (time.perf_counter() - started) * 1000
+    for array in backend.arrays().values():
+        np.asarray(array).sum()
+    barrier.wait()  # every worker holds its model while PSS is measured
+    results.put((load_ms, pss_kib() - base))
+    barrier.wait()
+
+
+def run(mode: str, path: str, workers: int):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, path, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    out = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return np.mean([o[0] for o in out]), sum(o[1] for o in out) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--trees", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(20000, 20))
+    model = RandomForestClassifier(args.trees, random_state=0, n_jobs=-1).fit(X, rng.integers(0, 2, len(X)))
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, "model.pkl")
+        with open(pickle_path, "wb") as f:
+            pickle.dump(model, f)
+        artifact = os.path.join(tmp, "model.forest")
+        meta = save_forest(NumpyForestBackend.from_sklearn(model), artifact)
+        print(f"{meta['n_trees']} trees, {meta['n_nodes']:,} nodes, pickle {os.path.getsize(pickle_path) / 2**20:.0f} MiB")
+        print(f"{'format':<10}{'workers':>8}{'load ms':>10}{'total PSS MiB':>15}")
+        for workers in args.workers:
+            for mode, path in (("pickle", pickle_path), ("artifact", artifact)):
+                load_ms, pss = run(mode, path, workers)
+                print(f"{mode:<10}{workers:>8}{load_ms:>10.1f}{pss:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CPU time per patient-second of EEG for per-sample vs windowed seizure detection.
+
+Models are trained on synthetic data so the script runs without random_forest_model.pkl:
+- per-sample: RandomForest on 20 raw channel readings (the shape of the shipped model)
+- windowed: RandomForest on window features (app.services.eeg_features)
+
+Usage:
+    python benchmark_seizure_detection.py [--seconds 20] [--channels 8] [--trees 100]
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from app.core.config import settings
+from app.services.eeg_features import StreamingFeatureEngine, window_features
+from app.services.seizure_detection import SeizureDetector, StreamingSeizureDetector
+
+
+def make_detector(model) -> SeizureDetector:
+    detector = SeizureDetector(model_path="")
+    detector.set_model(model)
+    return detector
+
+
+def synthetic_eeg(seconds: float, channels: int, fs: float, rng) -> np.ndarray:
+    t = np.arange(int(seconds * fs)) / fs
+    signal = 20 * np.sin(2 * np.pi * 10 * t)[:, None] + rng.normal(0, 10, (len(t), channels))
+    return signal
+
+
+def cpu_per_patient_second(fn, samples: np.ndarray, fs: float) -> float:
+    start = time.process_time()
+    fn(samples)
+    return (time.process_time() - start) / (len(samples) / fs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--trees", type=int, default=100)
+    args = parser.parse_args()
+    # Detection logs every positive; keep it out of the timings
+    logging.getLogger("app.services.seizure_detection").setLevel(logging.WARNING)
+
+    fs = settings.EEG_SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    train = synthetic_eeg(120, args.channels, fs, rng)
+    labels = (np.abs(train).mean(axis=1) > 12).astype(int)
+
+    per_sample = RandomForestClassifier(n_estimators=args.trees, random_state=0)
+    rows = np.zeros((len(train), 20))
+    rows[:, : args.channels] = train
+    per_sample.fit(rows, labels)
+
+    engine = StreamingFeatureEngine(fs=fs)
+    windows = np.stack([train[i: i + engine.window] for i in range(0, len(train) - engine.window, engine.hop)])
+    windowed = RandomForestClassifier(n_estimators=args.trees, random_state=0)
+    windowed.fit(window_features(windows, fs), rng.integers(0, 2, len(windows)))
+
+    stream = synthetic_eeg(args.seconds, args.channels, fs, rng)
+    print(f"{args.seconds:.0f} s of {args.channels}-channel EEG at {fs:.0f} Hz, {args.trees} trees, "
+          f"window {settings.SEIZURE_WINDOW_SECONDS} s, hop {settings.SEIZURE_HOP_SECONDS} s")
+
+    legacy = make_detector(per_sample)
+
+    def run_per_sample(samples):
+        for sample in samples:
+            legacy.predict(sample)
+
+    def run_streaming(model):
+        def run(samples):
+            detector = StreamingSeizureDetector(make_detector(model), StreamingFeatureEngine(fs=fs))
+            for sample in samples:
+                detector.push(1, sample)
+        return run
+
+    results = [
+        ("per-sample predict (current)", run_per_sample),
+        ("windowed, per-sample model voted per hop", run_streaming(per_sample)),
+        ("windowed, window-feature model", run_streaming(windowed)),
+    ]
+    baseline = None
+    for name, fn in results:
+        cost = cpu_per_patient_second(fn, stream, fs)
+        baseline = baseline or cost
+        print(f"{name:<44} {cost * 1000:9.2f} ms CPU / patient-second   {baseline / cost:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark: live EEG WebSocket messages, JSON "eeg_block" vs binary float32 frames
+(app/websockets/frames.py).
+
+Times serializing one flushed block per patient on one core (CPU time), as the
+ConnectionManager does once per flush, and reports messages/s, serialized MB/s and
+bytes per sample for each block size, plus a full flush through the manager to
+in-memory viewers of each kind.
+
+Usage:
+    python benchmark_ws_binary.py [--channels 8] [--rate 250] [--samples 13 64 256] [--repeat 2000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.websockets.frames import SUBPROTOCOL, decode_ws_frame, encode_ws_frame
+from app.websockets.manager import ConnectionManager
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def json_message(patient_id: int, start_us: int, rate: float, samples: np.ndarray) -> str:
+    # The manager's JSON path
+    return json.dumps({
+        "type": "eeg_block",
+        "patient_id": patient_id,
+        "timestamp": (EPOCH + timedelta(microseconds=start_us)).isoformat(),
+        "sample_rate": rate,
+        "samples": samples.tolist(),
+        "seizure_detected": False,
+        "model_version": None,
+    })
+
+
+def binary_message(patient_id: int, start_us: int, rate: float, samples: np.ndarray) -> bytes:
+    return encode_ws_frame(patient_id, start_us, rate, samples, False)
+
+
+class Viewer:
+    def __init__(self, binary: bool):
+        self.scope = {"subprotocols": [SUBPROTOCOL] if binary else []}
+        self.sent = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text: str):
+        self.sent += len(text)
+
+    async def send_bytes(self, data: bytes):
+        self.sent += len(data)
+
+
+async def manager_flushes(binary: bool, samples: np.ndarray, rate: float, repeat: int, patients: int, viewers: int):
+    manager = ConnectionManager()
+    sockets = [Viewer(binary) for _ in range(patients * viewers)]
+    for i, viewer in enumerate(sockets):
+        await manager.connect_patient(viewer, i // viewers)
+    manager._flusher.cancel()  # flushed by hand below
+    start = datetime.now(timezone.utc)
+    cpu = time.process_time()
+    for r in range(repeat):
+        timestamp = start + timedelta(seconds=r * len(samples) / rate)
+        for patient_id in range(patients):
+            manager.publish(patient_id, timestamp, rate, samples, False)
+        await manager.flush()
+        await asyncio.sleep(0)  # let the connections' writer tasks send
+    return time.process_time() - cpu, sum(v.sent for v in sockets)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=250.0)
+    parser.add_argument("--samples", type=int, nargs="+", default=[13, 64, 256],
+                        help="samples per message (13 ~ one 20 Hz flush at 250 Hz)")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--patients", type=int, default=10, help="for the manager flush case")
+    parser.add_argument("--viewers", type=int, default=4, help="per patient, for the manager flush case")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    rng = np.random.default_rng(0)
+    start_us = (datetime.now(timezone.utc) - EPOCH) // timedelta(microseconds=1)
+    print(f"{args.channels} channels at {args.rate:.0f} Hz; rates are per core (CPU time)")
+    print(f"{'format':<8}{'samples':>9}{'bytes':>9}{'bytes/smp':>11}{'msg/s':>11}{'MB/s':>9}"
+          f"{'flush CPU s':>13}{'MB sent':>10}")
+    for n in args.samples:
+        # float32-decoded device samples, as the binary MQTT frames deliver them
+        samples = rng.normal(scale=50.0, size=(n, args.channels)).astype(np.float32)
+        frame = binary_message(1, start_us, args.rate, samples)
+        assert np.array_equal(decode_ws_frame(frame)["samples"], samples)
+        for name, encode, binary in (("json", json_message, False), ("binary", binary_message, True)):
+            size = len(encode(1, start_us, args.rate, samples))
+            cpu = time.process_time()
+            for _ in range(args.repeat):
+                encode(1, start_us, args.rate, samples)
+            cpu = time.process_time() - cpu
+            flush_cpu, sent = asyncio.run(
+                manager_flushes(binary, samples, args.rate, args.repeat // 10, args.patients, args.viewers)
+            )
+            print(f"{name:<8}{n:>9}{size:>9,}{size / n:>11.1f}{args.repeat / cpu:>11,.0f}"
+                  f"{args.repeat * size / cpu / 1e6:>9.1f}{flush_cpu:>13.2f}{sent / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
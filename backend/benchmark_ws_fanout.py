@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: live EEG WebSocket fan-out, one message per sample or per ingested block vs
+the coalescing ConnectionManager (publish() + flush at --flush-hz), for 1-sample and
+block input.
+
+Viewers are in-memory sockets that encode like Starlette's send_json / send_text, so
+the CPU time (one core) is serialization and fan-out work only. Simulated time is
+advanced by calling flush() every 1 / flush_hz seconds of samples.
+
+Usage:
+    python benchmark_ws_fanout.py [--seconds 10] [--patients 10] [--viewers 4] [--block 32] [--flush-hz 20]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.websockets.manager import ConnectionManager
+
+
+class CountingWebSocket:
+    scope = {"subprotocols": []}
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+    async def send_text(self, text: str):
+        self.messages += 1
+        self.bytes += len(text)
+
+
+async def per_message(args, samples, start, block: int):
+    """The pre-coalescing path: send_json to every viewer, concurrently, for every sample or block."""
+    viewers = {patient_id: [CountingWebSocket() for _ in range(args.viewers)] for patient_id in range(args.patients)}
+    sockets = [s for group in viewers.values() for s in group]
+    for i in range(0, len(samples), block):
+        timestamp = (start + timedelta(seconds=i / args.rate)).isoformat()
+        for patient_id in range(args.patients):
+            if block == 1:
+                message = {"patient_id": patient_id, "timestamp": timestamp, "channel_data": samples[i].tolist()}
+            else:
+                message = {"type": "eeg_block", "patient_id": patient_id, "timestamp": timestamp,
+                           "sample_rate": args.rate, "samples": samples[i: i + block].tolist()}
+            message["seizure_detected"] = False
+            message["model_version"] = None
+            await asyncio.gather(*(s.send_json(message) for s in viewers[patient_id]), return_exceptions=True)
+    return sockets
+
+
+async def coalesced(args, samples, start, block: int):
+    manager = ConnectionManager(flush_hz=args.flush_hz)
+    sockets = [CountingWebSocket() for _ in range(args.patients * args.viewers)]
+    for i, socket in enumerate(sockets):
+        await manager.connect_patient(socket, i // args.viewers)
+    manager._flusher.cancel()  # flushed by hand below
+    per_flush = args.rate / args.flush_hz
+    next_flush = per_flush
+    for i in range(0, len(samples), block):
+        timestamp = start + timedelta(seconds=i / args.rate)
+        for patient_id in range(args.patients):
+            manager.publish(patient_id, timestamp, args.rate, samples[i: i + block], False)
+        if i + block >= next_flush:
+            await manager.flush()
+            await asyncio.sleep(0)  # let the connections' writer tasks send
+            next_flush += per_flush
+    await manager.flush()
+    await asyncio.sleep(0)
+    return sockets
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10.0, help="simulated seconds of EEG")
+    parser.add_argument("--patients", type=int, default=10)
+    parser.add_argument("--viewers", type=int, default=4, help="viewers per patient")
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=250.0)
+    parser.add_argument("--block", type=int, default=32, help="samples per ingested block")
+    parser.add_argument("--flush-hz", type=float, default=20.0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    samples = np.random.default_rng(0).normal(scale=50.0, size=(int(args.seconds * args.rate), args.channels))
+    start = datetime.now(timezone.utc)
+    cases = [
+        ("per sample", per_message, 1),
+        ("coalesced, 1-smp in", coalesced, 1),
+        (f"per {args.block}-smp block", per_message, args.block),
+        (f"coalesced, {args.block}-smp in", coalesced, args.block),
+    ]
+
+    print(f"{args.patients} patients x {args.viewers} viewers, {args.seconds:g} s at {args.rate:.0f} Hz, "
+          f"{args.channels} channels; CPU time on one core")
+    print(f"{'path':<22}{'messages':>12}{'msg/s/viewer':>14}{'MB sent':>10}{'CPU s':>8}{'CPU per EEG s':>15}")
+    for name, run, block in cases:
+        started = time.process_time()
+        sockets = asyncio.run(run(args, samples, start, block))
+        cpu = time.process_time() - started
+        messages = sum(s.messages for s in sockets)
+        sent = sum(s.bytes for s in sockets)
+        print(f"{name:<22}{messages:>12,}{messages / len(sockets) / args.seconds:>14,.1f}{sent / 1e6:>10.1f}"
+              f"{cpu:>8.2f}{cpu / args.seconds * 1000:>13.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark: delivery latency of healthy live EEG viewers and alert subscribers while
+some viewers of the same patient are slow or stalled (per-connection send queues in
+app/websockets/manager.py).
+
+In-memory sockets: healthy ones send instantly, slow ones take --slow-send seconds per
+message, stalled ones never finish. Reports the healthy viewers' latency percentiles
+from publish() to send, and what happened to the slow and stalled ones.
+
+Usage:
+    python benchmark_ws_slow_consumer.py [--seconds 10] [--healthy 8] [--slow 2] [--stalled 2]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.websockets.manager import ConnectionManager
+
+
+class Viewer:
+    scope = {"subprotocols": []}
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.latencies = []
+        self.closed = None
+        self.published = None  # set by the benchmark: when the latest flush's data was published
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.latencies.append(time.monotonic() - self.published[0])
+
+    async def close(self, code: int = 1000):
+        self.closed = code
+
+
+async def run(args):
+    manager = ConnectionManager(flush_hz=args.flush_hz, max_lag_seconds=args.max_lag)
+    published = [time.monotonic()]
+    healthy = [Viewer() for _ in range(args.healthy)]
+    slow = [Viewer(args.slow_send) for _ in range(args.slow)]
+    stalled = [Viewer(1e9) for _ in range(args.stalled)]
+    alerts = [Viewer() for _ in range(2)]
+    for viewer in healthy + slow + stalled + alerts:
+        viewer.published = published
+    for viewer in healthy + slow + stalled:
+        await manager.connect_patient(viewer, 1)
+    for viewer in alerts:
+        await manager.connect_alert(viewer)
+
+    block = 32
+    start = datetime.now(timezone.utc)
+    samples = np.zeros((block, 8))
+    for i in range(int(args.seconds * 250 / block)):
+        published[0] = time.monotonic()
+        manager.publish(1, start + timedelta(seconds=i * block / 250), 250.0, samples, False)
+        if i % 16 == 0:
+            await manager.broadcast_alert('{"type": "seizure_start"}')
+        await asyncio.sleep(block / 250)
+    return manager, healthy, slow, stalled, alerts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--healthy", type=int, default=8)
+    parser.add_argument("--slow", type=int, default=2)
+    parser.add_argument("--stalled", type=int, default=2)
+    parser.add_argument("--slow-send", type=float, default=0.2, help="seconds per message for slow viewers")
+    parser.add_argument("--flush-hz", type=float, default=20.0)
+    parser.add_argument("--max-lag", type=float, default=2.0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    manager, healthy, slow, stalled, alerts = asyncio.run(run(args))
+    latencies = np.array([t for v in healthy for t in v.latencies]) * 1000
+    alert_latencies = np.array([t for v in alerts for t in v.latencies]) * 1000
+    print(f"healthy viewers: {len(latencies):,} messages, latency p50 {np.percentile(latencies, 50):.1f} ms, "
+          f"p99 {np.percentile(latencies, 99):.1f} ms, max {latencies.max():.1f} ms")
+    print(f"alerts: {len(alert_latencies)} delivered, max latency {alert_latencies.max():.1f} ms")
+    print(f"slow viewers: {sum(len(v.latencies) for v in slow)} sent, "
+          f"{sum(v.closed is not None for v in slow)} of {len(slow)} evicted")
+    print(f"stalled viewers: {sum(v.closed is not None for v in stalled)} of {len(stalled)} evicted")
+    queue_lag = max(c.max_lag_seen for c in manager.patient_connections.get(1, []) if c.websocket in healthy)
+    print(f"evicted {manager.stats()['evicted']}; healthy viewers' max send-queue lag {queue_lag * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
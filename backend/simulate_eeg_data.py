@@ -1,21 +1,88 @@
+"""
+Publish simulated EEG to the MQTT broker, like the ESP32 firmware does.
+
+By default samples are sent as binary frames (app/services/eeg_frames.py) of
+--samples-per-frame samples each; --format json sends the same blocks as JSON
+({"patient_id", "timestamp", "sample_rate", "samples"}), or the legacy
+one-message-per-sample payload with --samples-per-frame 1.
+
+Usage:
+    python simulate_eeg_data.py [--patient-id 1] [--rate 250] [--samples-per-frame 32]
+                                [--encoding float32|int24] [--format binary|json]
+"""
+import argparse
 import json
 import random
 import time
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
 import paho.mqtt.client as mqtt
 
-client = mqtt.Client()
-client.connect("localhost", 1883)
-
-try:
-    while True:
-        data = {
-            "patient_id": 1,
-            "timestamp": datetime.now().isoformat(),
-            "channel_data": [random.uniform(-100.0, 100.0) for _ in range(8)]
-        }
-        client.publish("eeg/data", json.dumps(data))
-        print(f"Published: {data['timestamp']}")
-        time.sleep(0.5)  # ~0.0039 seconds between readings
-except KeyboardInterrupt:
-    client.disconnect()
\ No newline at end of file
+from app.services.eeg_frames import FLOAT32, INT24, encode_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish simulated EEG over MQTT")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--topic", default="eeg/data")
+    parser.add_argument("--per-patient-topic", action="store_true",
+                        help='publish to "<topic>/<patient_id>", so sharded ingest workers can skip it unread')
+    parser.add_argument("--patient-id", type=int, default=1)
+    parser.add_argument("--device-id", type=int, default=1)
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=250.0, help="samples per second")
+    parser.add_argument("--format", choices=["binary", "json"], default="binary")
+    parser.add_argument("--samples-per-frame", type=int, default=32)
+    parser.add_argument("--encoding", choices=["float32", "int24"], default="float32")
+    args = parser.parse_args()
+
+    topic = f"{args.topic}/{args.patient_id}" if args.per_patient_topic else args.topic
+    client = mqtt.Client()
+    client.connect(args.host, args.port)
+    client.loop_start()
+    rng = np.random.default_rng()
+    per_message = max(1, args.samples_per_frame)
+    encoding = INT24 if args.encoding == "int24" else FLOAT32
+    sequence = 0
+    started = time.monotonic()
+    first = datetime.now(timezone.utc)
+
+    try:
+        while True:
+            timestamp = first + timedelta(seconds=sequence * per_message / args.rate)
+            if args.format == "binary":
+                samples = rng.uniform(-100.0, 100.0, size=(per_message, args.channels))
+                payload = encode_frame(
+                    args.patient_id, samples, timestamp, args.rate,
+                    sequence=sequence, device_id=args.device_id, encoding=encoding,
+                )
+            elif per_message > 1:
+                payload = json.dumps({
+                    "patient_id": args.patient_id,
+                    "timestamp": timestamp.isoformat(),
+                    "sample_rate": args.rate,
+                    "samples": np.round(rng.uniform(-100.0, 100.0, size=(per_message, args.channels)), 4).tolist(),
+                })
+            else:
+                payload = json.dumps({
+                    "patient_id": args.patient_id,
+                    "timestamp": timestamp.isoformat(),
+                    "channel_data": [random.uniform(-100.0, 100.0) for _ in range(args.channels)],
+                })
+            client.publish(topic, payload)
+            sequence += 1
+            if sequence % max(1, int(args.rate / per_message)) == 0:
+                print(f"Published {sequence} messages ({sequence * per_message} samples), last at {timestamp.isoformat()}")
+            # Pace in real time against the start, so publishing overhead does not accumulate
+            wait = started + sequence * per_message / args.rate - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+    except KeyboardInterrupt:
+        client.loop_stop()
+        client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Parity check of the inference backends against sklearn's own predictions.
+Uses random_forest_model.pkl when present, plus synthetic forests of several shapes.
+"""
+import os
+import pickle
+
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from app.services.inference_backends import AutoBackend, NumpyForestBackend, OnnxBackend, SklearnBackend
+
+
+def synthetic_models(rng):
+    X = rng.normal(size=(3000, 20)) * 50
+    y = (X[:, 0] + X[:, 1] ** 2 / 50 > 10).astype(int)
+    y3 = np.digitize(X[:, 2], [-20, 20])
+    yield "forest, 20 raw channels", RandomForestClassifier(100, random_state=0).fit(X, y), X
+    yield "forest, depth 6", RandomForestClassifier(50, max_depth=6, random_state=0).fit(X, y), X
+    yield "extra trees, 3 classes", ExtraTreesClassifier(50, random_state=0).fit(X, y3), X
+    yield "single tree", DecisionTreeClassifier(random_state=0).fit(X, y), X
+    X80 = rng.normal(size=(2000, 80)).astype(np.float32)
+    yield "forest, 80 window features", RandomForestClassifier(100, random_state=0).fit(X80, X80[:, 5] > 0), X80
+
+
+def check(name, model, X, rng):
+    probe = np.vstack([X[:500], rng.normal(size=(500, X.shape[1])) * X.std(axis=0)])
+    expected = model.predict(probe)
+    expected_proba = model.predict_proba(probe)
+
+    numpy_backend = NumpyForestBackend.from_sklearn(model)
+    assert np.array_equal(numpy_backend.predict(probe), expected), f"{name}: numpy labels differ"
+    assert np.allclose(numpy_backend.predict_proba(probe), expected_proba), f"{name}: numpy probabilities differ"
+    print(f"{name:<32} numpy: {len(probe)} rows identical")
+
+    auto_backend = AutoBackend(numpy_backend, SklearnBackend(model), min_rows=256)
+    for rows in (1, 255, 256, len(probe)):
+        assert np.array_equal(auto_backend.predict(probe[:rows]), expected[:rows]), f"{name}: auto labels differ"
+
+    try:
+        onnx_backend = OnnxBackend.from_sklearn(model)
+    except ImportError:
+        return
+    agreement = np.mean(onnx_backend.predict(probe) == expected)
+    assert agreement >= 0.999, f"{name}: onnx agrees on only {agreement:.2%}"
+    assert np.allclose(onnx_backend.predict_proba(probe), expected_proba, atol=1e-5), f"{name}: onnx probabilities"
+    print(f"{name:<32} onnx: {agreement:.2%} labels identical")
+
+
+def test_parity():
+    rng = np.random.default_rng(0)
+    models = list(synthetic_models(rng))
+    if os.path.exists("random_forest_model.pkl"):
+        with open("random_forest_model.pkl", "rb") as f:
+            model = pickle.load(f)
+        X = rng.normal(size=(1000, model.n_features_in_)) * 2
+        models.insert(0, ("random_forest_model.pkl", model, X))
+    for name, model, X in models:
+        check(name, model, X, rng)
+    print("Parity check passed")
+
+
+def test_auto_loads_large_backend_lazily():
+    rng = np.random.default_rng(0)
+    _, model, X = next(synthetic_models(rng))
+    loads = []
+
+    def load_large():
+        loads.append(1)
+        return SklearnBackend(model)
+
+    auto_backend = AutoBackend(NumpyForestBackend.from_sklearn(model), load_large=load_large, min_rows=256)
+    assert auto_backend.n_features_in_ == model.n_features_in_
+    auto_backend.predict(X[:255])
+    assert not loads, "auto loaded the large backend for a small batch"
+    for _ in range(2):
+        assert np.array_equal(auto_backend.predict(X[:256]), model.predict(X[:256]))
+    assert loads == [1]
+
+
+if __name__ == "__main__":
+    test_parity()
+    test_auto_loads_large_backend_lazily()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests for the seizure event state machine (app/services/seizure_events.py):
+onset hysteresis, confirmation, merging across short dips, closing on a stream
+pause, and the state()/restore() round trip offline re-scoring checkpoints with.
+"""
+import json
+
+from app.services.seizure_events import END, START, SeizureSegmenter
+
+HOP = 0.5
+
+
+def segmenter():
+    return SeizureSegmenter(on_windows=2, off_windows=2, min_seconds=2.0, merge_gap_seconds=1.5)
+
+
+def feed(seg, decisions, first=0, patient_id=1):
+    """Feed window decisions (window i's hop spans [i * HOP, (i + 1) * HOP]); returns (kind, start, end) tuples."""
+    out = []
+    for i, positive in enumerate(decisions, start=first):
+        for kind, event in seg.update(patient_id, i * HOP, (i + 1) * HOP, bool(positive), "v1"):
+            out.append((kind, event.start, event.end))
+    return out
+
+
+def test_single_positive_does_not_open_an_event():
+    seg = segmenter()
+    assert feed(seg, [1, 0, 1, 0, 0, 0, 0, 0]) == []
+    assert seg.active() == []
+
+
+def test_onset_starts_at_the_first_window_of_the_run():
+    seg = segmenter()
+    feed(seg, [0, 0, 1, 1])
+    assert seg.active() == [1]
+    assert seg.state(1)["start"] == 2 * HOP
+
+
+def test_confirmed_only_after_min_duration():
+    seg = segmenter()
+    # The event spans [1.0, 2.5] after five positives: shorter than min_seconds
+    assert feed(seg, [0, 0, 1, 1, 1]) == []
+    assert feed(seg, [1], first=5) == [(START, 1.0, 3.0)]
+    # Confirmed once only
+    assert feed(seg, [1, 1], first=6) == []
+
+
+def test_unconfirmed_event_ends_silently():
+    seg = segmenter()
+    assert feed(seg, [1, 1, 0, 0, 0, 0, 0, 0]) == []
+    assert seg.active() == []
+
+
+def test_ends_at_last_positive_after_off_windows_and_merge_gap():
+    seg = segmenter()
+    transitions = feed(seg, [1, 1, 1, 1, 1, 0, 0, 0, 0])
+    assert transitions == [(START, 0.0, 2.0), (END, 0.0, 2.5)]
+    # Two negatives are not enough until merge_gap has passed since the last positive
+    seg = segmenter()
+    assert feed(seg, [1, 1, 1, 1, 1, 0, 0]) == [(START, 0.0, 2.0)]
+    assert seg.active() == [1]
+
+
+def test_short_dip_merges_into_one_event():
+    seg = segmenter()
+    transitions = feed(seg, [1, 1, 1, 1, 1, 0, 0, 1, 1, 0, 0, 0, 0, 0])
+    assert transitions == [(START, 0.0, 2.0), (END, 0.0, 4.5)]
+
+
+def test_long_gap_splits_events():
+    seg = segmenter()
+    transitions = feed(seg, [1, 1, 1, 1, 1, 0, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 0])
+    assert [kind for kind, _, _ in transitions] == [START, END, START, END]
+    assert transitions[1] == (END, 0.0, 2.5)
+    assert transitions[2][1] == 9 * HOP
+
+
+def test_stream_pause_closes_the_event():
+    seg = segmenter()
+    assert feed(seg, [1, 1, 1, 1, 1]) == [(START, 0.0, 2.0)]
+    # The next window arrives 10 s later, well past the merge gap
+    transitions = feed(seg, [1], first=25)
+    assert transitions == [(END, 0.0, 2.5)]
+    assert seg.state(1)["start"] is None
+
+
+def test_finish_closes_an_open_event():
+    seg = segmenter()
+    feed(seg, [1, 1, 1, 1, 1, 1])
+    assert [(kind, event.start, event.end) for kind, event in seg.finish(1)] == [(END, 0.0, 3.0)]
+    assert seg.finish(1) == []
+
+
+def test_patients_are_independent():
+    seg = segmenter()
+    feed(seg, [1, 1, 1, 1, 1], patient_id=1)
+    feed(seg, [0, 0, 0, 0, 0], patient_id=2)
+    assert seg.active() == [1]
+
+
+def test_state_restore_round_trip():
+    decisions = [0, 1, 1, 1, 1, 1, 0, 1, 1, 0, 0, 0, 0, 0, 1, 0, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0]
+    expected = feed(segmenter(), decisions)
+    assert expected
+    for split in range(len(decisions) + 1):
+        first = segmenter()
+        transitions = feed(first, decisions[:split])
+        # What re-scoring writes to its JSON checkpoint and reads back into a new segmenter
+        state = json.loads(json.dumps(first.state(1)))
+        second = segmenter()
+        second.restore(1, state)
+        transitions += feed(second, decisions[split:], first=split)
+        assert transitions == expected, f"split at {split}"
+
+
+def test_restore_none_forgets_the_patient():
+    seg = segmenter()
+    feed(seg, [1, 1, 1])
+    seg.restore(1, None)
+    assert seg.state(1) is None
+    assert seg.active() == []
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
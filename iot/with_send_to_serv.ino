@@ -2,6 +2,7 @@
 #include <PubSubClient.h>
 #include <SPI.h>
 #include <time.h>
+#include <sys/time.h>
 /*
 ESP pin - ADS1299
 3.3V - J4, 9
@@ -30,6 +31,14 @@ const char* mqtt_topic = "eeg/data"; // MQTT Topic to publish to
 
 // --- Patient Details ---
 const int patient_id = 1; // Set your patient ID here
+const int device_id = 1;  // Distinguishes devices of the same patient
+
+// --- Wire Format ---
+// Binary frames (see backend/app/services/eeg_frames.py) batch FRAME_SAMPLES samples per
+// MQTT message with no text formatting; false sends the legacy JSON message per sample.
+const bool use_binary_frames = true;
+const int FRAME_SAMPLES = 32;
+const float SAMPLE_RATE = 250.0; // CONFIG1 0x96 = 250 SPS
 
 // --- NTP Configuration for Timestamp ---
 const char* ntpServer = "pool.ntp.org";
@@ -55,6 +64,13 @@ const byte CH1SET_REG = 0x05, MISC1_REG = 0x15;
 WiFiClient espClient;
 PubSubClient client(espClient);
 char json_payload[512]; // Buffer to hold the JSON payload
+
+// --- Binary frame: 36-byte header + FRAME_SAMPLES x 8 float32, little-endian like the ESP32 ---
+const int FRAME_HEADER_SIZE = 36;
+uint8_t frame_buffer[FRAME_HEADER_SIZE + FRAME_SAMPLES * 8 * sizeof(float)];
+int frame_count = 0;          // samples in the frame being filled
+int64_t frame_start_us = 0;   // timestamp of its first sample
+uint32_t frame_sequence = 0;
 const bool debug_no_wifi = false; // Set to 'true' to run without WiFi and MQTT.
 
 // --- ADS1299 & Data ---
@@ -83,6 +99,7 @@ void setup() {
     configTime(gmtOffset_sec, daylightOffset_sec, ntpServer);
     // --- 2. Configure MQTT Client ---
     client.setServer(mqtt_server, mqtt_port);
+    client.setBufferSize(sizeof(frame_buffer) + 64);
   }
 
   // --- 3. Initialize ADS1299 Hardware (Your existing logic) ---
@@ -140,8 +157,10 @@ void loop() {
                     i + 1, rawValue, voltage_uV, normalized_values[i]);
     }
 
-    // --- 4. Get Timestamp and Format JSON Payload ---
-    if (!debug_no_wifi) {
+    // --- 4. Publish: batched binary frame, or one JSON payload per sample ---
+    if (!debug_no_wifi && use_binary_frames) {
+      appendToFrame(normalized_values);
+    } else if (!debug_no_wifi) {
       char timestamp[30];
       getTimestamp(timestamp);
       snprintf(json_payload, sizeof(json_payload),
@@ -198,6 +217,42 @@ void reconnect() {
   }
 }
 
+int64_t epochMicros() {
+  struct timeval tv;
+  gettimeofday(&tv, NULL); // UTC, synced by configTime()
+  return (int64_t)tv.tv_sec * 1000000LL + tv.tv_usec;
+}
+
+void appendToFrame(const float* values) {
+  if (frame_count == 0) {
+    frame_start_us = epochMicros();
+  }
+  memcpy(frame_buffer + FRAME_HEADER_SIZE + frame_count * 8 * sizeof(float), values, 8 * sizeof(float));
+  if (++frame_count < FRAME_SAMPLES) {
+    return;
+  }
+
+  uint8_t* h = frame_buffer;
+  const uint8_t version = 1, encoding = 1, channels = 8, reserved = 0;
+  const uint32_t pid = patient_id, did = device_id;
+  const uint16_t n_samples = frame_count;
+  const float rate = SAMPLE_RATE, scale = 1.0;
+  h[0] = 'E'; h[1] = 'G';
+  h[2] = version; h[3] = encoding;
+  memcpy(h + 4, &pid, 4);
+  memcpy(h + 8, &did, 4);
+  memcpy(h + 12, &frame_sequence, 4);
+  memcpy(h + 16, &frame_start_us, 8);
+  memcpy(h + 24, &rate, 4);
+  memcpy(h + 28, &n_samples, 2);
+  h[30] = channels; h[31] = reserved;
+  memcpy(h + 32, &scale, 4);
+
+  client.publish(mqtt_topic, frame_buffer, FRAME_HEADER_SIZE + frame_count * 8 * sizeof(float));
+  frame_sequence++;
+  frame_count = 0;
+}
+
 void getTimestamp(char* buffer) {
   struct tm timeinfo;
   if (!getLocalTime(&timeinfo)) {
@@ -24,6 +24,7 @@ statistics: {
     max?: number;
     unique?: number;
     frequent?: Record<string, number>;
+    approximate?: boolean;
     }>;
 };
 visualizations: {
@@ -4,7 +4,8 @@ import { LineChart, Line, XAxis, YAxis, Tooltip, CartesianGrid, ResponsiveContai
 import { Card, CardHeader, CardTitle, CardContent } from '@/components/ui/card';
 
 export interface EEGSeriesPoint { x: number; value: number | null }
-export interface EEGSeries { column: string; points: EEGSeriesPoint[] }
+// Columnar series as returned by /analyze-eeg-lines
+export interface EEGSeries { column: string; x: number[]; values: (number | null)[] }
 
 interface EEGLineChartProps {
 series: EEGSeries;
@@ -13,6 +14,10 @@ color?: string;
 }
 
 export const EEGLineChart: React.FC<EEGLineChartProps> = ({ series, height = 280, color = '#6366f1' }) => {
+const points = React.useMemo<EEGSeriesPoint[]>(
+    () => series.x.map((x, i) => ({ x, value: series.values[i] })),
+    [series]
+);
 return (
     <Card className="w-full">
     <CardHeader className="pb-2">
@@ -21,7 +26,7 @@ return (
     <CardContent>
         <div style={{ width: '100%', height }}>
         <ResponsiveContainer width="100%" height="100%">
-            <LineChart data={series.points} margin={{ top: 10, left: 0, right: 10, bottom: 0 }}>
+            <LineChart data={points} margin={{ top: 10, left: 0, right: 10, bottom: 0 }}>
             <CartesianGrid strokeDasharray="3 3" />
             <XAxis dataKey="x" tick={{ fontSize: 10 }} tickLine={false} axisLine={false} />
             <YAxis tick={{ fontSize: 10 }} tickLine={false} axisLine={false} domain={[ 'auto', 'auto' ]} />
@@ -10,7 +10,59 @@ interface EEGDataMessage {
   voltage?: number[];
 }
 
-export function useWebSocket(patientId: number | null, enabled: boolean = true) {
+// A block of consecutive samples from the backend: one message per MQTT packet
+interface EEGBlockMessage {
+  type: "eeg_block";
+  patient_id: number;
+  timestamp: string; // first sample
+  sample_rate: number;
+  samples: number[][];
+  seizure_detected?: boolean;
+  model_version?: string | null;
+}
+
+// Opt-in binary live EEG frames (backend/app/websockets/frames.py): a 28-byte
+// little-endian header, then float32 samples, sample-major
+const EEG_SUBPROTOCOL = "insmos.eeg.f32.v1";
+const FRAME_HEADER_SIZE = 28;
+
+function decodeFrame(buffer: ArrayBuffer): EEGBlockMessage {
+  const view = new DataView(buffer);
+  if (view.getUint8(0) !== 0x45 || view.getUint8(1) !== 0x57 || view.getUint8(2) !== 1) {
+    throw new Error("Not a live EEG frame");
+  }
+  const flags = view.getUint8(3);
+  const nSamples = view.getUint32(20, true);
+  const nChannels = view.getUint16(24, true);
+  const values = new Float32Array(buffer, FRAME_HEADER_SIZE, nSamples * nChannels);
+  const samples: number[][] = [];
+  for (let i = 0; i < nSamples; i++) {
+    samples.push(Array.from(values.subarray(i * nChannels, (i + 1) * nChannels)));
+  }
+  return {
+    type: "eeg_block",
+    patient_id: view.getUint32(4, true),
+    timestamp: new Date(view.getFloat64(8, true)).toISOString(),
+    sample_rate: view.getFloat32(16, true),
+    samples,
+    seizure_detected: (flags & 0x01) !== 0,
+  };
+}
+
+// Expand a block into per-sample messages; sample i is at timestamp + i / sample_rate
+function expandBlock(block: EEGBlockMessage): EEGDataMessage[] {
+  const start = new Date(block.timestamp).getTime();
+  const periodMs = 1000 / block.sample_rate;
+  return block.samples.map((channel_data, i) => ({
+    patient_id: block.patient_id,
+    timestamp: new Date(start + i * periodMs).toISOString(),
+    channel_data,
+    seizure_detected: block.seizure_detected,
+  }));
+}
+
+// `binary` asks the server for packed float32 frames instead of JSON
+export function useWebSocket(patientId: number | null, enabled: boolean = true, binary: boolean = false) {
   const [data, setData] = useState<EEGDataMessage[]>([]);
   const [isConnected, setIsConnected] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -110,7 +162,8 @@ export function useWebSocket(patientId: number | null, enabled: boolean = true)
       
       try {
         console.log(`Attempting to connect to: ${wsUrl}`);
-        const ws = new WebSocket(wsUrl);
+        const ws = binary ? new WebSocket(wsUrl, [EEG_SUBPROTOCOL]) : new WebSocket(wsUrl);
+        ws.binaryType = "arraybuffer";
         wsRef.current = ws;
 
         ws.onopen = () => {
@@ -127,28 +180,33 @@ export function useWebSocket(patientId: number | null, enabled: boolean = true)
         ws.onmessage = (event) => {
           console.log('📩 RAW WebSocket message received:', event.data);
           try {
-            const message: EEGDataMessage = JSON.parse(event.data);
-            console.log('✅ Parsed message:', message);
+            const parsed: EEGDataMessage | EEGBlockMessage =
+              event.data instanceof ArrayBuffer ? decodeFrame(event.data) : JSON.parse(event.data);
+            console.log('✅ Parsed message:', parsed);
             
             // Update seizure detection status
-            if (message.seizure_detected !== undefined) {
-              seizureDetectedRef.current = message.seizure_detected;
-              console.log('🚨 Seizure status:', message.seizure_detected);
+            if (parsed.seizure_detected !== undefined) {
+              seizureDetectedRef.current = parsed.seizure_detected;
+              console.log('🚨 Seizure status:', parsed.seizure_detected);
             }
             
+            const messages = "samples" in parsed ? expandBlock(parsed) : [parsed];
+
             // Limit buffer size to prevent memory issues
             const maxBufferSize = 50;
-            if (bufferRef.current.length < maxBufferSize) {
-              bufferRef.current.push(message);
-              console.log('📦 Added to buffer. Buffer size:', bufferRef.current.length);
-            } else {
-              // If buffer is getting full, skip some messages to prevent overflow
-              if (bufferRef.current.length % 2 === 0) {
-                bufferRef.current.shift();
+            for (const message of messages) {
+              if (bufferRef.current.length < maxBufferSize) {
                 bufferRef.current.push(message);
-                console.log('♻️ Buffer full, replaced oldest. Buffer size:', bufferRef.current.length);
+                console.log('📦 Added to buffer. Buffer size:', bufferRef.current.length);
               } else {
-                console.log('⚠️ Buffer full, message skipped');
+                // If buffer is getting full, skip some messages to prevent overflow
+                if (bufferRef.current.length % 2 === 0) {
+                  bufferRef.current.shift();
+                  bufferRef.current.push(message);
+                  console.log('♻️ Buffer full, replaced oldest. Buffer size:', bufferRef.current.length);
+                } else {
+                  console.log('⚠️ Buffer full, message skipped');
+                }
               }
             }
           } catch (err) {
@@ -204,7 +262,7 @@ export function useWebSocket(patientId: number | null, enabled: boolean = true)
       }
       bufferRef.current = []; // Clear buffer
     };
-  }, [patientId, enabled]);
+  }, [patientId, enabled, binary]);
 
   const clearData = () => setData([]);
 